@@ -0,0 +1,168 @@
+"""
+Offline accuracy and latency evaluation of the response pipeline.
+
+Replays the ground-truth labels and the recorded sessions through the conversation
+history, the LLM and the stiffness matrix extraction, and writes a JSON report with the
+matrix accuracy, the parse failure rate and per-stage latency percentiles.
+
+Label files that the evaluated role already has in its prompt as pre-knowledge (the lab
+labels for the built-in roles) are not scored: the model would answer every case with its
+own image and reference reply in context.
+
+    # Against the local stand-in, started in-process with 400 ms to the first token
+    python evaluate_pipeline.py --stand-in --first-token-ms 400 --output reports/stand_in.json
+
+    # Against the provider (or any OpenAI-compatible server set in OPEN_AI_BASE_URL)
+    python evaluate_pipeline.py --labels experiment_data/labels/ground_truth_messages_home.json --sessions
+
+The process exits with status 1 when the accuracy is below --min-accuracy or the parse
+failure rate above --max-parse-failure-rate, so it can gate regressions, and with status 2
+when --role is not defined in the roles file.
+"""
+import os
+import sys
+import glob
+import json
+import asyncio
+import logging
+import argparse
+import tempfile
+from pathlib import Path
+
+# Ensure `functions/` is discoverable
+sys.path.append(str(Path(__file__).resolve().parent / "functions"))
+
+logging.basicConfig(level="WARNING", format="%(asctime)s - %(levelname)s - %(message)s")
+
+import llm_stand_in_server
+
+DEFAULT_LABELS = [
+    os.path.join("experiment_data", "labels", "ground_truth_messages_home.json"),
+]
+DEFAULT_SESSIONS = os.path.join("messages", "*.json")
+
+
+async def passthrough_image_url(image_url):
+    """
+    Sends image URLs to the LLM unchanged, so that no image has to be reachable.
+    """
+    return image_url
+
+
+async def main(args):
+    runner = None
+    if args.stand_in:
+        runner = await llm_stand_in_server.start(
+            "127.0.0.1", args.stand_in_port,
+            llm_stand_in_server.load_answers(args.answers),
+            llm_stand_in_server.options_from_arguments(args),
+        )
+        os.environ["OPEN_AI_BASE_URL"] = f"http://127.0.0.1:{args.stand_in_port}/v1"
+        os.environ.setdefault("OPEN_AI_KEY", "stand-in")
+        os.environ.setdefault("OPEN_AI_ORG", "stand-in")
+
+    # Imported here so that the client picks up the stand-in's base URL
+    from functions.speech_processor import SpeechProcessor
+    from functions.stiffness_matrix_processor import StiffnessMatrixProcessor
+    from functions.image_processor import ImageProcessor
+    from functions.role_registry_processor import RoleRegistryProcessor
+    from functions.evaluation_processor import EvaluationProcessor
+    from functions.conversation_history_processor import ConversationHistoryProcessor
+
+    if args.inline_images:
+        image_processor = ImageProcessor()
+
+        async def resolve_image_url(image_url):
+            return await asyncio.to_thread(image_processor.encode_image_data_url, image_url) or image_url
+    else:
+        resolve_image_url = passthrough_image_url
+
+    session_files = sorted(path for pattern in args.sessions for path in glob.glob(pattern)) if args.sessions else []
+    role = args.role or RoleRegistryProcessor.BUILTIN_ROLE
+    roles = RoleRegistryProcessor(roles_file=args.roles_file, default_role=role, image_resolver=resolve_image_url)
+    if roles.default_role != role:
+        # The registry falls back to another role, which would make the report misleading
+        logging.error(f"Role {role} is not defined in {args.roles_file}; defined roles: {', '.join(roles.roles)}")
+        if runner is not None:
+            await runner.cleanup()
+        return 2
+
+    # Cases shown to the role as few-shot examples would inflate its accuracy
+    pre_knowledge_file = os.path.abspath(roles.get().pre_knowledge_file)
+    label_files = []
+    for path in args.labels:
+        if os.path.abspath(path) == pre_knowledge_file:
+            logging.warning(f"Skipping {path}: it is the pre-knowledge of role {roles.default_role}.")
+        else:
+            label_files.append(path)
+
+    # The replay journals its conversations to a scratch directory, never to messages/
+    with tempfile.TemporaryDirectory(prefix="evaluation-") as journal_dir:
+        speech_processor = SpeechProcessor(
+            image_resolver=resolve_image_url,
+            conversation_history_processor=ConversationHistoryProcessor(
+                journal_file=os.path.join(journal_dir, "unused.jsonl"),
+                legacy_file=None,
+            ),
+        )
+        evaluation = EvaluationProcessor(
+            speech_processor,
+            StiffnessMatrixProcessor(),
+            prompt_processor=roles.get().prompt_processor,
+            concurrency=args.concurrency,
+            tolerance=args.tolerance,
+            journal_dir=journal_dir,
+        )
+        try:
+            report = await evaluation.run(label_files=label_files, session_files=session_files)
+        finally:
+            if runner is not None:
+                await runner.cleanup()
+
+    report["config"]["role"] = roles.default_role
+    report["config"]["base_url"] = os.environ.get("OPEN_AI_BASE_URL")
+    if args.stand_in:
+        report["config"]["stand_in"] = {
+            "first_token_ms": args.first_token_ms,
+            "token_ms": args.token_ms,
+            "jitter_ms": args.jitter_ms,
+            "chunk_chars": args.chunk_chars,
+            "wrong_rate": args.wrong_rate,
+            "malformed_rate": args.malformed_rate,
+            "seed": args.seed,
+        }
+
+    if args.output:
+        os.makedirs(os.path.dirname(args.output) or ".", exist_ok=True)
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+    print(json.dumps({key: report[key] for key in ("summary", "latency_ms", "wall_time_s", "throughput_cases_per_s")}, indent=2))
+
+    summary = report["summary"]
+    failed = (
+        (args.min_accuracy is not None and (summary["accuracy"] or 0.0) < args.min_accuracy)
+        or (args.max_parse_failure_rate is not None and (summary["parse_failure_rate"] or 0.0) > args.max_parse_failure_rate)
+    )
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Evaluate stiffness matrix accuracy and pipeline latency offline.")
+    parser.add_argument("--labels", nargs="*", default=DEFAULT_LABELS, help="Ground-truth label files; every turn is an independent case")
+    parser.add_argument("--sessions", nargs="*", default=None,
+                        help=f"Recorded session files (glob patterns) replayed turn by turn; without a value {DEFAULT_SESSIONS}")
+    parser.add_argument("--roles-file", default="experiment_data/system_roles/roles.yaml")
+    parser.add_argument("--role", default=None, help="Role whose prompt is evaluated; the built-in prompt by default")
+    parser.add_argument("--concurrency", type=int, default=8, help="Cases or sessions evaluated at the same time")
+    parser.add_argument("--tolerance", type=float, default=1e-6, help="Largest element difference of a matching matrix")
+    parser.add_argument("--inline-images", action="store_true", help="Send images found in images/ as data URLs")
+    parser.add_argument("--output", default=os.path.join("reports", "evaluation.json"), help="Report file")
+    parser.add_argument("--min-accuracy", type=float, default=None, help="Fail below this accuracy")
+    parser.add_argument("--max-parse-failure-rate", type=float, default=None, help="Fail above this parse failure rate")
+    parser.add_argument("--stand-in", action="store_true", help="Run the LLM stand-in server in-process")
+    parser.add_argument("--stand-in-port", type=int, default=8010)
+    llm_stand_in_server.add_options_arguments(parser)
+    args = parser.parse_args()
+    if args.sessions == []:
+        args.sessions = [DEFAULT_SESSIONS]
+    sys.exit(asyncio.run(main(args)))
@@ -0,0 +1,142 @@
+import os
+import json
+import uuid
+import hashlib
+import logging
+from collections import OrderedDict
+
+import aiofiles
+
+
+class AudioCacheProcessor:
+    """
+    A class to cache synthesized speech on disk, keyed by a hash of (text, model, voice).
+
+    Repeated phrases, such as the fallback sentence spoken for matrix-only answers, are
+    served from disk without a TTS call. The cache is capped in size and evicts the least
+    recently used entries; file modification times carry the LRU order across restarts.
+    """
+
+    CACHE_DIR = "audio_cache"
+    EXTENSION = ".mp3"
+
+    def __init__(self, cache_dir=CACHE_DIR, max_bytes=100 * 1024 * 1024):
+        """
+        Initializes the cache and indexes the files already on disk.
+
+        Parameters:
+            cache_dir (str): Directory holding the cached audio files.
+            max_bytes (int): Total size above which the least recently used files are evicted.
+        """
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.index = OrderedDict()  # key -> size in bytes, least recently used first
+        self.total_bytes = 0
+        self.hits = 0
+        self.misses = 0
+
+        os.makedirs(self.cache_dir, exist_ok=True)
+        self.load_index()
+
+    def load_index(self):
+        """
+        Rebuilds the in-memory LRU index from the cache directory.
+        """
+        entries = []
+        for filename in os.listdir(self.cache_dir):
+            if not filename.endswith(self.EXTENSION):
+                continue
+            stat = os.stat(os.path.join(self.cache_dir, filename))
+            entries.append((stat.st_mtime, filename[:-len(self.EXTENSION)], stat.st_size))
+
+        for _, key, size in sorted(entries):
+            self.index[key] = size
+            self.total_bytes += size
+        logging.info(f"Audio cache loaded with {len(self.index)} entries ({self.total_bytes} bytes).")
+
+    @staticmethod
+    def make_key(text, model, voice):
+        """
+        Returns the content address of a synthesized phrase.
+        """
+        return hashlib.sha256(json.dumps([text, model, voice]).encode("utf-8")).hexdigest()
+
+    def path_for(self, key):
+        """
+        Returns the file path of a cache entry.
+        """
+        return os.path.join(self.cache_dir, f"{key}{self.EXTENSION}")
+
+    async def get(self, key):
+        """
+        Returns the cached audio for a key, or None on a miss.
+        """
+        if key not in self.index:
+            self.misses += 1
+            return None
+
+        path = self.path_for(key)
+        try:
+            async with aiofiles.open(path, "rb") as audio_file:
+                audio = await audio_file.read()
+        except FileNotFoundError:
+            # Removed behind our back; forget it
+            self.total_bytes -= self.index.pop(key)
+            self.misses += 1
+            return None
+
+        self.index.move_to_end(key)
+        os.utime(path)
+        self.hits += 1
+        return audio
+
+    async def put(self, key, audio):
+        """
+        Stores audio under a key and evicts least recently used entries above the size cap.
+        Storing a key that is already cached, for instance by a concurrent miss on the same
+        phrase, only marks it as recently used.
+        """
+        path = self.path_for(key)
+        if key in self.index and os.path.exists(path):
+            self.index.move_to_end(key)
+            return
+
+        # Unique per writer, so that concurrent misses on the same phrase never share a temp file
+        temp_path = f"{path}.{uuid.uuid4().hex}.tmp"
+        async with aiofiles.open(temp_path, "wb") as audio_file:
+            await audio_file.write(audio)
+        os.replace(temp_path, path)
+
+        if key in self.index:
+            self.total_bytes -= self.index[key]
+        self.index[key] = len(audio)
+        self.index.move_to_end(key)
+        self.total_bytes += len(audio)
+        self.evict()
+
+    def evict(self):
+        """
+        Removes least recently used entries until the cache fits its size cap.
+        """
+        while self.total_bytes > self.max_bytes and len(self.index) > 1:
+            key, size = self.index.popitem(last=False)
+            self.total_bytes -= size
+            try:
+                os.remove(self.path_for(key))
+            except FileNotFoundError:
+                pass
+            logging.info(f"Evicted cached audio {key}")
+
+    def get_stats(self):
+        """
+        Returns the size and hit rate of the cache.
+        """
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self.index),
+            "bytes": self.total_bytes,
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 3) if lookups else None,
+        }
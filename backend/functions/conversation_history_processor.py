@@ -1,6 +1,8 @@
 import json
 import os
 import logging
+import threading
+from collections import deque
 
 # Set up logging configuration
 # logging.basicConfig(level=logging.INFO)
@@ -8,9 +10,17 @@ import logging
 class ConversationHistoryProcessor:
     """
     A class to manage conversation history for a torque-controlled robot interface.
+
+    The recent messages are kept in memory in a ring buffer. Every update is also appended
+    as one line to a JSONL journal, which is replayed on startup and compacted to the
+    buffered messages every COMPACT_EVERY appends. A torn last line from a crash is skipped
+    during replay.
     """
 
-    CONVERSATION_HISTORY_FILE = "messages/conversation_history.json"
+    CONVERSATION_HISTORY_FILE = "messages/conversation_history.json"  # Legacy format, imported once
+    CONVERSATION_JOURNAL_FILE = "messages/conversation_history.jsonl"
+    HISTORY_LENGTH = 10  # Messages sent to the LLM after the system role and pre-knowledge
+    COMPACT_EVERY = 50  # Journal appends between compactions
     SYSTEM_ROLE_CONTENT = (
         """
     "You are able to analyse and process images."
@@ -74,15 +84,24 @@ class ConversationHistoryProcessor:
     """
     )
 
-    def __init__(self):
+    def __init__(self, journal_file=CONVERSATION_JOURNAL_FILE, legacy_file=CONVERSATION_HISTORY_FILE):
         """
-        Initializes the ConversationHistoryProcessor and ensures the conversation history file exists.
+        Initializes the ConversationHistoryProcessor and replays the conversation journal.
+
+        :param journal_file: The JSONL journal of this conversation.
+        :param legacy_file: JSON history imported when the journal does not exist yet, or None.
         """
-        self.conversation_history_file = self.CONVERSATION_HISTORY_FILE
+        self.conversation_history_file = legacy_file
+        self.conversation_journal_file = journal_file
         self.system_role_content = self.SYSTEM_ROLE_CONTENT
-        self.ensure_history_file()
         self.pre_knowledge_messages = self.load_pre_knowledge_messages()
 
+        self.history = deque(maxlen=self.HISTORY_LENGTH)
+        self.appends_since_compaction = 0
+        self.lock = threading.Lock()  # Guards the buffer; held only briefly, as reads run on the event loop
+        self.journal_lock = threading.Lock()  # Orders journal writes
+        self.replay_journal()
+
     def load_pre_knowledge_messages(self):
         """Loads the pre-knowledge messages from a JSON file."""
         gt_path = os.path.join("experiment_data", "labels", "ground_truth_messages_lab.json")
@@ -96,14 +115,60 @@ class ConversationHistoryProcessor:
             print(f"Error: Failed to decode JSON from {gt_path}. Returning empty dictionary.")
             return {}
 
-    def ensure_history_file(self):
+    def replay_journal(self):
+        """
+        Rebuilds the in-memory history from the journal, importing the legacy JSON history
+        file if no journal exists yet, and compacts the journal.
+        """
+        os.makedirs(os.path.dirname(self.conversation_journal_file), exist_ok=True)
+
+        if os.path.exists(self.conversation_journal_file):
+            with open(self.conversation_journal_file, 'r', encoding='utf-8') as f:
+                for line_number, line in enumerate(f, start=1):
+                    try:
+                        entry = json.loads(line)
+                    except json.JSONDecodeError:
+                        logging.warning(f"Skipping unreadable line {line_number} of {self.conversation_journal_file}")
+                        continue
+                    self.history.extend(entry["messages"])
+        elif self.conversation_history_file is not None:
+            try:
+                with open(self.conversation_history_file, 'r') as f:
+                    self.history.extend(json.load(f) or [])
+                logging.info(f"Imported conversation history from {self.conversation_history_file}")
+            except FileNotFoundError:
+                pass
+            except json.JSONDecodeError as e:
+                logging.error(f"Error reading conversation history: {e}")
+
+        self.compact_journal()
+        logging.info(f"Conversation history replayed with {len(self.history)} messages.")
+
+    def compact_journal(self):
+        """
+        Rewrites the journal to hold only the buffered messages. The new journal replaces the
+        old one atomically, so a crash leaves either of them intact.
+        """
+        temp_file = f"{self.conversation_journal_file}.tmp"
+        with open(temp_file, 'w', encoding='utf-8') as f:
+            if self.history:
+                f.write(json.dumps({"messages": list(self.history)}) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temp_file, self.conversation_journal_file)
+        self.appends_since_compaction = 0
+
+    def append_to_journal(self, messages):
         """
-        Ensures that the conversation history file exists.
+        Appends messages to the journal as a single line.
         """
-        if not os.path.exists(self.conversation_history_file):
-            os.makedirs(os.path.dirname(self.conversation_history_file), exist_ok=True)
-            with open(self.conversation_history_file, 'w') as f:
-                json.dump([], f)
+        with open(self.conversation_journal_file, 'a', encoding='utf-8') as f:
+            f.write(json.dumps({"messages": messages}) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+        self.appends_since_compaction += 1
+        if self.appends_since_compaction >= self.COMPACT_EVERY:
+            self.compact_journal()
 
     def get_recent_conversation_history(self):
         """
@@ -117,34 +182,28 @@ class ConversationHistoryProcessor:
             "content": [{"type": "text", "text": self.system_role_content}]
         }
         messages.append(system_role)
-        
-        # 2) Append optional pre-knowledge messages  # <-- NEW BLOCK
-        for msg in self.pre_knowledge_messages:
-            messages.append(msg)
 
-        # Load conversation history
-        try:
-            with open(self.conversation_history_file, 'r') as f:
-                data = json.load(f) or []
-        except json.JSONDecodeError as e:
-            logging.error(f"Error reading conversation history: {e}")
-            data = []
+        # Append optional pre-knowledge messages
+        messages.extend(self.pre_knowledge_messages)
 
-        # Append last 10 items of data to messages
-        messages.extend(data[-10:])
+        # Append the recent conversation
+        with self.lock:
+            messages.extend(self.history)
 
         return messages
 
+    def get_conversation_tail(self):
+        """
+        Retrieves the recent conversation messages, without the system role and pre-knowledge.
+        """
+        with self.lock:
+            return list(self.history)
+
     def update_conversation_history(self, transcription, response, image_url=None):
         """
         Updates the conversation history with a new transcription and response.
         If image_url is provided, it includes the image in the message.
         """
-        skip_count = 1 + len(self.pre_knowledge_messages)  # <-- NEW
-
-        # Get recent conversation history excluding the system role
-        recent_conversation_history = self.get_recent_conversation_history()[1:]
-
         # Create new message entry
         content = [{"type": "text", "text": transcription}]
         if image_url:
@@ -159,19 +218,20 @@ class ConversationHistoryProcessor:
             "content": [{"type": "text", "text": response}]
         }
 
-        # Append new messages to the conversation history
-        recent_conversation_history.extend([transcription_entry, response_entry])
-
-        # Save updated conversation history
-        with open(self.conversation_history_file, 'w') as f:
-            json.dump(recent_conversation_history, f)
+        # Append the new messages to the buffer and the journal
+        with self.journal_lock:
+            with self.lock:
+                self.history.extend([transcription_entry, response_entry])
+            self.append_to_journal([transcription_entry, response_entry])
 
     def reset_conversation_history(self):
         """
-        Resets the conversation history by clearing the conversation history file.
+        Resets the conversation history by clearing the buffer and the journal.
         """
-        with open(self.conversation_history_file, 'w') as f:
-            json.dump([], f)
+        with self.journal_lock:
+            with self.lock:
+                self.history.clear()
+            self.compact_journal()
         logging.info("Conversation history has been reset.")
         return "Conversation history has been reset."
 
@@ -0,0 +1,142 @@
+import os
+import asyncio
+import logging
+from collections import OrderedDict
+
+from stiffness_matrix_processor import StiffnessMatrixProcessor
+
+
+class EllipsoidCacheProcessor:
+    """
+    A class to reuse rendered ellipsoid plots, keyed by the content of their stiffness matrix.
+
+    The LLM only produces a handful of distinct matrices, so a plot is rendered once and
+    saved as ellipsoids/<matrix key>.png; later requests with the same (rounded) matrix get
+    the existing URL without rendering or writing a file. Concurrent requests for the same
+    matrix share one render. The number of plots is capped and the least recently used are
+    evicted; file modification times carry the LRU order across restarts.
+    """
+
+    EXTENSION = ".png"
+
+    def __init__(self, ellipsoids_dir, ellipsoids_base_url, max_entries=256):
+        """
+        Initializes the cache and indexes the plots already on disk.
+
+        Parameters:
+            ellipsoids_dir (str): Directory where the ellipsoid plots are saved.
+            ellipsoids_base_url (str): Base URL of the static server serving that directory.
+            max_entries (int): Number of plots above which the least recently used are evicted.
+        """
+        self.ellipsoids_dir = ellipsoids_dir
+        self.ellipsoids_base_url = ellipsoids_base_url.rstrip('/')
+        self.max_entries = max_entries
+        self.index = OrderedDict()  # key -> None, least recently used first
+        self.pending = {}  # key -> Future of a render in progress
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+        os.makedirs(self.ellipsoids_dir, exist_ok=True)
+        self.load_index()
+
+    def load_index(self):
+        """
+        Rebuilds the in-memory LRU index from the content-addressed plots on disk.
+        """
+        entries = []
+        for filename in os.listdir(self.ellipsoids_dir):
+            key = filename[:-len(self.EXTENSION)]
+            # Plots named by request (uuid4) are not cache entries
+            if not filename.endswith(self.EXTENSION) or not StiffnessMatrixProcessor.is_matrix_key(key):
+                continue
+            entries.append((os.stat(os.path.join(self.ellipsoids_dir, filename)).st_mtime, key))
+
+        for _, key in sorted(entries):
+            self.index[key] = None
+        self.evict()
+        logging.info(f"Ellipsoid cache loaded with {len(self.index)} entries.")
+
+    def filename_for(self, key):
+        return f"{key}{self.EXTENSION}"
+
+    def path_for(self, key):
+        return os.path.join(self.ellipsoids_dir, self.filename_for(key))
+
+    def url_for(self, key):
+        return f"{self.ellipsoids_base_url}/{self.ellipsoids_dir}/{self.filename_for(key)}"
+
+    async def get_url(self, stiffness_matrix, render):
+        """
+        Returns the URL of the ellipsoid plot of a stiffness matrix, rendering it on a miss.
+
+        Parameters:
+            stiffness_matrix (list): The 3x3 stiffness matrix.
+            render (callable): Async callable (stiffness_matrix, filename) returning the URL of
+                the plot it saved under that file name in the ellipsoids directory, or None.
+
+        Returns:
+            str: The URL to the ellipsoid plot image, or None on error.
+        """
+        key = StiffnessMatrixProcessor.matrix_key(stiffness_matrix)
+        if key in self.index:
+            if os.path.exists(self.path_for(key)):
+                self.index.move_to_end(key)
+                os.utime(self.path_for(key))
+                self.hits += 1
+                return self.url_for(key)
+            # Removed behind our back; render it again
+            del self.index[key]
+
+        pending = self.pending.get(key)
+        if pending is not None:
+            self.hits += 1
+            return await asyncio.shield(pending)
+
+        self.misses += 1
+        future = asyncio.get_running_loop().create_future()
+        self.pending[key] = future
+        try:
+            url = await render(stiffness_matrix, self.filename_for(key))
+            if url is not None:
+                self.index[key] = None
+                self.evict()
+            future.set_result(url)
+            return url
+        except Exception as e:
+            logging.error(f"Error rendering cached ellipsoid plot: {e}")
+            future.set_result(None)
+            return None
+        finally:
+            # Cancelled: the requests sharing this render get no plot rather than waiting forever
+            if not future.done():
+                future.set_result(None)
+            del self.pending[key]
+
+    def evict(self):
+        """
+        Removes least recently used plots until the cache fits its entry cap.
+        """
+        while len(self.index) > self.max_entries:
+            key, _ = self.index.popitem(last=False)
+            try:
+                os.remove(self.path_for(key))
+            except FileNotFoundError:
+                pass
+            self.evictions += 1
+            logging.info(f"Evicted cached ellipsoid plot {key}")
+
+    def get_stats(self):
+        """
+        Returns the size and hit rate of the cache.
+        """
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self.index),
+            "max_entries": self.max_entries,
+            "rendering": len(self.pending),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 3) if lookups else None,
+            "evictions": self.evictions,
+        }
@@ -0,0 +1,273 @@
+import os
+import time
+import uuid
+import asyncio
+import logging
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from multiprocessing import get_context
+
+import numpy as np
+
+from speech_engine_processor import SpeechEngineProcessor
+
+# Renderer of a worker process, set once by init_worker
+worker_renderer = None
+
+
+class EllipsoidRenderer:
+    """
+    Draws stiffness ellipsoids on one persistent Agg canvas.
+
+    The figure, its 3D axes and the unit-sphere mesh are built once; a render only scales
+    and rotates the mesh, swaps the surface and the principal-axis arrows, and writes the PNG.
+    Not thread-safe: every process keeps its own renderer.
+    """
+
+    def __init__(self, resolution=(100, 50), figsize=(8, 8)):
+        """
+        Builds the canvas and the unit-sphere mesh.
+
+        Parameters:
+            resolution (tuple): Mesh points along the azimuth and the polar angle.
+            figsize (tuple): Figure size in inches.
+        """
+        # Imported here so that only the rendering processes load matplotlib's 3D toolkit
+        from matplotlib.figure import Figure
+        from matplotlib.backends.backend_agg import FigureCanvasAgg
+
+        u = np.linspace(0, 2 * np.pi, resolution[0])
+        v = np.linspace(0, np.pi, resolution[1])
+        self.unit_sphere = np.array([
+            np.outer(np.cos(u), np.sin(v)),
+            np.outer(np.sin(u), np.sin(v)),
+            np.outer(np.ones_like(u), np.cos(v)),
+        ])  # shape = (3, 100, 50)
+
+        self.figure = Figure(figsize=figsize)
+        self.canvas = FigureCanvasAgg(self.figure)
+        self.ax = self.figure.add_subplot(111, projection='3d')
+        self.ax.set_xlabel('X-axis')
+        self.ax.set_ylabel('Y-axis')
+        self.ax.set_zlabel('Z-axis')
+        self.ax.set_title("Stiffness Ellipsoid")
+        self.ax.set_box_aspect([1, 1, 1])
+        self.artists = []
+
+    def render(self, eigenvalues, eigenvectors, file_path):
+        """
+        Draws the ellipsoid of the given principal axes and saves it as a PNG.
+
+        Parameters:
+            eigenvalues (np.ndarray): Principal stiffnesses in descending order.
+            eigenvectors (np.ndarray): Matching principal directions as columns.
+            file_path (str): Where the PNG is written.
+        """
+        for artist in self.artists:
+            artist.remove()
+
+        # Scale the unit sphere by the eigenvalues and rotate it into global coordinates
+        ellipsoid_global = np.einsum('ij,jkl->ikl', eigenvectors * eigenvalues, self.unit_sphere)
+
+        surface = self.ax.plot_surface(
+            ellipsoid_global[0],
+            ellipsoid_global[1],
+            ellipsoid_global[2],
+            color='b',
+            alpha=0.2,
+            rstride=4,
+            cstride=4,
+            linewidth=0.5
+        )
+        self.artists = [surface]
+
+        # Plot the principal axes as quivers from the origin
+        colors = ['r', 'g', 'b']  # X=red, Y=green, Z=blue
+        for i in range(3):
+            self.artists.append(self.ax.quiver(
+                0, 0, 0,
+                eigenvalues[i] * eigenvectors[0, i],
+                eigenvalues[i] * eigenvectors[1, i],
+                eigenvalues[i] * eigenvectors[2, i],
+                color=colors[i],
+                arrow_length_ratio=0.1,
+                linewidth=3
+            ))
+
+        # Enforce equal scaling on all axes
+        max_radius = np.max(eigenvalues)
+        self.ax.auto_scale_xyz(
+            [-max_radius, max_radius],
+            [-max_radius, max_radius],
+            [-max_radius, max_radius]
+        )
+        # Write under a temporary name so that a plot is never served half-written
+        temp_path = f"{file_path}.tmp"
+        self.figure.savefig(temp_path, format='png')
+        os.replace(temp_path, file_path)
+
+
+def init_worker():
+    """
+    Builds the renderer once per worker process.
+    """
+    global worker_renderer
+    import matplotlib
+    from stiffness_matrix_processor import StiffnessMatrixProcessor
+
+    matplotlib.rcParams.update(StiffnessMatrixProcessor.PLOT_PARAMS)
+    worker_renderer = EllipsoidRenderer()
+
+
+def worker_ready():
+    """
+    Returns the worker's pid once its renderer is built; used to pre-warm the pool.
+    """
+    return os.getpid()
+
+
+def render_in_worker(stiffness_matrix, file_path):
+    """
+    Renders the ellipsoid of a stiffness matrix to a PNG file.
+
+    Returns:
+        float: Seconds spent in the worker.
+    """
+    from stiffness_matrix_processor import StiffnessMatrixProcessor
+
+    started = time.perf_counter()
+    eigenvalues, eigenvectors = StiffnessMatrixProcessor.principal_axes(stiffness_matrix)
+    worker_renderer.render(eigenvalues, eigenvectors, file_path)
+    return time.perf_counter() - started
+
+
+class EllipsoidRendererProcessor:
+    """
+    A class to render stiffness ellipsoids on worker processes.
+
+    Matplotlib holds the GIL for the whole render, so drawing in a thread of the backend
+    stalls the event loop that streams the audio. Each worker keeps an EllipsoidRenderer
+    with a persistent canvas and precomputed mesh, and the backend only awaits the result.
+    """
+
+    LATENCY_WINDOW = 200
+
+    def __init__(self, ellipsoids_dir, ellipsoids_base_url, workers=1):
+        """
+        Initializes the renderer; the worker processes are started by start().
+
+        Parameters:
+            ellipsoids_dir (str): Directory where the ellipsoid plots are saved.
+            ellipsoids_base_url (str): Base URL of the static server serving that directory.
+            workers (int): Number of worker processes.
+        """
+        self.ellipsoids_dir = ellipsoids_dir
+        self.ellipsoids_base_url = ellipsoids_base_url.rstrip('/')
+        self.workers = workers
+        self.pool = None
+        self.restart_lock = asyncio.Lock()
+
+        self.submitted = 0
+        self.completed = 0
+        self.failed = 0
+        self.restarts = 0
+        self.latencies = deque(maxlen=self.LATENCY_WINDOW)
+        self.processing_times = deque(maxlen=self.LATENCY_WINDOW)
+
+        os.makedirs(self.ellipsoids_dir, exist_ok=True)
+
+    async def start(self):
+        """
+        Starts the worker processes and waits until every worker has built its canvas.
+        """
+        self.pool = self.create_pool()
+        loop = asyncio.get_running_loop()
+        # Submitting one job per worker at once makes the pool spawn all of them now
+        pids = await asyncio.gather(*[loop.run_in_executor(self.pool, worker_ready) for _ in range(self.workers)])
+        logging.info(f"Ellipsoid renderer started with {len(set(pids))} pre-warmed workers.")
+
+    def create_pool(self):
+        return ProcessPoolExecutor(
+            max_workers=self.workers,
+            mp_context=get_context("spawn"),
+            initializer=init_worker,
+        )
+
+    async def restart(self, broken_pool):
+        """
+        Replaces a pool whose worker died, unless a concurrent render already replaced it.
+        """
+        async with self.restart_lock:
+            if self.pool is not broken_pool:
+                return
+            broken_pool.shutdown(wait=False, cancel_futures=True)
+            self.pool = self.create_pool()
+            self.restarts += 1
+            logging.warning("Ellipsoid rendering worker died; worker pool restarted.")
+
+    async def stop(self):
+        """
+        Shuts the worker processes down.
+        """
+        if self.pool is not None:
+            self.pool.shutdown(wait=False, cancel_futures=True)
+            self.pool = None
+            logging.info("Ellipsoid renderer stopped.")
+
+    async def render(self, stiffness_matrix, filename=None):
+        """
+        Renders the ellipsoid of a stiffness matrix on one of the workers.
+
+        Parameters:
+            stiffness_matrix (list): The 3x3 stiffness matrix.
+            filename (str): File name of the plot in the ellipsoids directory; a new uuid4 name by default.
+
+        Returns:
+            str: The URL to the saved ellipsoid plot image, or None on error.
+        """
+        filename = filename or f"{uuid.uuid4()}.png"
+        file_path = os.path.join(self.ellipsoids_dir, filename)
+
+        self.submitted += 1
+        started = time.perf_counter()
+        try:
+            loop = asyncio.get_running_loop()
+            pool = self.pool
+            try:
+                processing_time = await loop.run_in_executor(pool, render_in_worker, stiffness_matrix, file_path)
+            except BrokenProcessPool:
+                await self.restart(pool)
+                processing_time = await loop.run_in_executor(self.pool, render_in_worker, stiffness_matrix, file_path)
+            self.latencies.append(time.perf_counter() - started)
+            self.processing_times.append(processing_time)
+            logging.info(f"Ellipsoid plot saved as {file_path}")
+            return f"{self.ellipsoids_base_url}/{self.ellipsoids_dir}/{filename}"
+
+        except Exception as e:
+            self.failed += 1
+            logging.error(f"Error generating ellipsoid plot: {e}")
+            return None
+
+        finally:
+            self.completed += 1
+
+    def get_stats(self):
+        """
+        Returns queue depth and latency statistics of the renderer.
+
+        Returns:
+            dict: Job counters, queue depth and latency percentiles in milliseconds.
+        """
+        in_flight = self.submitted - self.completed
+        return {
+            "workers": self.workers,
+            "in_flight": in_flight,
+            "queue_depth": max(0, in_flight - self.workers),
+            "submitted": self.submitted,
+            "completed": self.completed,
+            "failed": self.failed,
+            "restarts": self.restarts,
+            "latency_ms": SpeechEngineProcessor.summarize(self.latencies),
+            "processing_ms": SpeechEngineProcessor.summarize(self.processing_times),
+        }
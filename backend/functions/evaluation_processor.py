@@ -0,0 +1,273 @@
+import os
+import json
+import time
+import asyncio
+import logging
+import tempfile
+from urllib.parse import urlparse
+
+import numpy as np
+
+from conversation_history_processor import ConversationHistoryProcessor
+from response_cache_processor import ResponseCacheProcessor
+
+
+class EvaluationCase:
+    """
+    One labelled turn: the user's text and image, and the reference reply.
+    """
+
+    def __init__(self, source, index, transcript, image_url, reply):
+        self.source = source
+        self.index = index
+        self.transcript = transcript
+        self.image_url = image_url
+        self.reply = reply
+
+    @property
+    def key(self):
+        return EvaluationProcessor.case_key(self.transcript, self.image_url)
+
+    @property
+    def turn_id(self):
+        return f"{self.source}#{self.index}"
+
+
+class EvaluationProcessor:
+    """
+    A class to measure the accuracy and latency of the response pipeline offline.
+
+    Labelled conversations (ground-truth label files and recorded sessions in messages/)
+    are replayed through a ConversationHistoryProcessor, the LLM and the stiffness matrix
+    extraction, and every predicted matrix is compared to the matrix of the reference reply.
+    Turns of a label file are independent cases; the turns of a recorded session are
+    replayed in order on one conversation history, which receives the recorded replies so
+    that every turn sees the context it had in the session. Cases and sessions run
+    concurrently, up to a limit.
+
+    The report holds the matrix accuracy, the parse failure rate and latency percentiles of
+    every stage, overall and per source, so that runs can be compared for regressions.
+    """
+
+    STAGES = ("llm_first_token", "llm_total", "extract", "history_update", "case_total")
+    # Identifies the replayed turn to the LLM stand-in, whose recorded sessions repeat turns with different replies
+    CASE_HEADER = "x-evaluation-case"
+    PERCENTILES = (50, 90, 95, 99)
+
+    def __init__(self, speech_processor, stiffness_matrix_processor, prompt_processor=None, concurrency=8, tolerance=1e-6, journal_dir=None):
+        """
+        Initializes the harness.
+
+        Parameters:
+            speech_processor (SpeechProcessor): Streams the LLM responses.
+            stiffness_matrix_processor (StiffnessMatrixProcessor): Extracts the matrices.
+            prompt_processor (PromptProcessor): Optional prompt processor of the evaluated role.
+            concurrency (int): Cases or sessions evaluated at the same time.
+            tolerance (float): Largest absolute element difference of a matching matrix.
+            journal_dir (str): Directory for the conversation journals of the replay; a
+                temporary directory by default.
+        """
+        self.speech_processor = speech_processor
+        self.stiffness_matrix_processor = stiffness_matrix_processor
+        self.prompt_processor = prompt_processor
+        self.concurrency = concurrency
+        self.tolerance = tolerance
+        self.journal_dir = journal_dir
+
+    @staticmethod
+    def case_key(transcript, image_url):
+        """
+        Identifies a turn by its normalized text and image file name.
+        """
+        image_name = os.path.basename(urlparse(image_url).path) if image_url else ""
+        return ResponseCacheProcessor.normalize_transcript(transcript), image_name
+
+    @staticmethod
+    def load_cases(path):
+        """
+        Reads the user/reply turns of a conversation file.
+
+        Returns:
+            list: The EvaluationCase of every user message followed by a reply.
+        """
+        with open(path, 'r', encoding='utf-8') as f:
+            messages = json.load(f)
+
+        cases = []
+        source = os.path.basename(path)
+        for message, reply in zip(messages, messages[1:]):
+            if message.get("role") != "user" or reply.get("role") == "user":
+                continue
+            transcript, image_url = EvaluationProcessor.split_message(message)
+            reply_text, _ = EvaluationProcessor.split_message(reply)
+            cases.append(EvaluationCase(source, len(cases), transcript, image_url, reply_text))
+        return cases
+
+    @staticmethod
+    def split_message(message):
+        """
+        Returns the text and the first image URL of a chat message.
+        """
+        content = message.get("content") or []
+        if isinstance(content, str):
+            return content, None
+        text = " ".join(part.get("text", "") for part in content if part.get("type") == "text")
+        image_url = next((part["image_url"]["url"] for part in content if part.get("type") == "image_url"), None)
+        return text, image_url
+
+    async def run(self, label_files=(), session_files=()):
+        """
+        Evaluates the cases of the label files and the recorded sessions.
+
+        Returns:
+            dict: The report.
+        """
+        if self.journal_dir is None:
+            with tempfile.TemporaryDirectory(prefix="evaluation-") as journal_dir:
+                return await self.run_in(journal_dir, label_files, session_files)
+        os.makedirs(self.journal_dir, exist_ok=True)
+        return await self.run_in(self.journal_dir, label_files, session_files)
+
+    async def run_in(self, journal_dir, label_files, session_files):
+        slots = asyncio.Semaphore(self.concurrency)
+
+        units = []  # Lists of cases that share one conversation history
+        for path in label_files:
+            units.extend([case] for case in self.load_cases(path))
+        for path in session_files:
+            cases = self.load_cases(path)
+            if cases:
+                units.append(cases)
+
+        async def run_unit(number, cases):
+            async with slots:
+                history = ConversationHistoryProcessor(
+                    journal_file=os.path.join(journal_dir, f"unit_{number}.jsonl"),
+                    legacy_file=None,
+                )
+                return [await self.evaluate_case(case, history) for case in cases]
+
+        started = time.perf_counter()
+        unit_results = await asyncio.gather(*(run_unit(number, cases) for number, cases in enumerate(units)))
+        wall_time = time.perf_counter() - started
+
+        results = [result for unit in unit_results for result in unit]
+        by_source = {}
+        for result in results:
+            by_source.setdefault(result["source"], []).append(result)
+
+        return {
+            "generated_at": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+            "config": {
+                "label_files": list(label_files),
+                "session_files": list(session_files),
+                "concurrency": self.concurrency,
+                "tolerance": self.tolerance,
+            },
+            "wall_time_s": round(wall_time, 3),
+            "throughput_cases_per_s": round(len(results) / wall_time, 3) if wall_time > 0 else None,
+            "summary": self.summarize(results),
+            "latency_ms": self.latency_percentiles(results),
+            "by_source": {source: self.summarize(source_results) for source, source_results in sorted(by_source.items())},
+            "cases": results,
+        }
+
+    async def evaluate_case(self, case, history):
+        """
+        Runs one case through the pipeline and compares the result with the reference.
+        """
+        timings = {}
+        expected, _ = self.stiffness_matrix_processor.extract_stiffness_matrix_2(case.reply)
+        result = {
+            "source": case.source,
+            "index": case.index,
+            "transcript": case.transcript,
+            "image_url": case.image_url,
+            "expected": expected,
+            "predicted": None,
+            "match": False,
+            "max_abs_error": None,
+            "error": None,
+            "timings_ms": timings,
+        }
+
+        started = time.perf_counter()
+        response = ""
+        try:
+            async for token in self.speech_processor.stream_gpt_response_vlm(
+                case.transcript, case.image_url, history, self.prompt_processor, extra_headers={self.CASE_HEADER: case.turn_id}
+            ):
+                if not response:
+                    timings["llm_first_token"] = self.elapsed_ms(started)
+                response += token
+            timings["llm_total"] = self.elapsed_ms(started)
+        except Exception as e:
+            logging.error(f"LLM request of {case.source}#{case.index} failed: {e}")
+            result["error"] = f"llm: {e}"
+            timings["case_total"] = self.elapsed_ms(started)
+            return result
+
+        stage_started = time.perf_counter()
+        predicted, _ = self.stiffness_matrix_processor.extract_stiffness_matrix_2(response)
+        timings["extract"] = self.elapsed_ms(stage_started)
+
+        stage_started = time.perf_counter()
+        history.update_conversation_history(case.transcript, case.reply, case.image_url)
+        timings["history_update"] = self.elapsed_ms(stage_started)
+        timings["case_total"] = self.elapsed_ms(started)
+
+        result["predicted"] = predicted
+        if expected is None:
+            # Turns without a reference matrix are timed but not scored
+            result["match"] = predicted is None
+        elif predicted is None:
+            result["error"] = "parse"
+        else:
+            max_abs_error = float(np.max(np.abs(np.array(predicted, dtype=float) - np.array(expected, dtype=float))))
+            result["max_abs_error"] = max_abs_error
+            result["match"] = max_abs_error <= self.tolerance
+        return result
+
+    @staticmethod
+    def elapsed_ms(started):
+        return round((time.perf_counter() - started) * 1000.0, 3)
+
+    @staticmethod
+    def summarize(results):
+        """
+        Returns the accuracy and failure counts of a set of case results.
+        """
+        scored = [result for result in results if result["expected"] is not None]
+        matches = sum(result["match"] for result in scored)
+        parse_failures = sum(result["error"] == "parse" for result in results)
+        llm_errors = sum(str(result["error"]).startswith("llm") for result in results)
+        errors = [result["max_abs_error"] for result in scored if result["max_abs_error"] is not None]
+        return {
+            "cases": len(results),
+            "scored_cases": len(scored),
+            "matches": matches,
+            "accuracy": round(matches / len(scored), 4) if scored else None,
+            "parse_failures": parse_failures,
+            "parse_failure_rate": round(parse_failures / len(results), 4) if results else None,
+            "llm_errors": llm_errors,
+            "mean_max_abs_error": round(float(np.mean(errors)), 3) if errors else None,
+        }
+
+    @classmethod
+    def latency_percentiles(cls, results):
+        """
+        Returns the latency percentiles of every stage in milliseconds.
+        """
+        latencies = {}
+        for stage in cls.STAGES:
+            values = np.array([result["timings_ms"][stage] for result in results if stage in result["timings_ms"]])
+            if not len(values):
+                latencies[stage] = None
+                continue
+            latencies[stage] = {f"p{p}": round(float(np.percentile(values, p)), 3) for p in cls.PERCENTILES}
+            latencies[stage].update({
+                "mean": round(float(values.mean()), 3),
+                "max": round(float(values.max()), 3),
+                "count": int(len(values)),
+            })
+        return latencies
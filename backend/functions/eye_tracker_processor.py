@@ -1,12 +1,12 @@
-import aiohttp
 import logging
 import io
 from fastapi import HTTPException
 from fastapi.responses import StreamingResponse
 
 class EyeTrackerProcessor:
-    def __init__(self, eye_tracker_url: str):
+    def __init__(self, eye_tracker_url: str, http_client):
         self.eye_tracker_url = eye_tracker_url
+        self.http_client = http_client  # Shared HttpClientProcessor
         logging.info(f"EyeTrackerProcessor initialized with URL: {self.eye_tracker_url}")
 
     async def calibrate(self):
@@ -15,16 +15,16 @@ class EyeTrackerProcessor:
         """
         logging.info("Starting calibration with the eye tracker service.")
         try:
-            async with aiohttp.ClientSession() as session:
-                async with session.get(f"{self.eye_tracker_url}/calibrate") as response:
-                    if response.status == 200:
-                        data = await response.json()
-                        logging.info("Calibration successful.")
-                        return data
-                    else:
-                        detail = await response.text()
-                        logging.error(f"Calibration failed with status {response.status}: {detail}")
-                        raise HTTPException(status_code=response.status, detail=detail)
+            # Calibration runs while the operator follows the targets, far longer than a normal read
+            async with self.http_client.request("GET", f"{self.eye_tracker_url}/calibrate", read_timeout=self.http_client.LONG_READ_TIMEOUT) as response:
+                if response.status == 200:
+                    data = await response.json()
+                    logging.info("Calibration successful.")
+                    return data
+                else:
+                    detail = await response.text()
+                    logging.error(f"Calibration failed with status {response.status}: {detail}")
+                    raise HTTPException(status_code=response.status, detail=detail)
         except Exception as e:
             logging.error(f"Calibration failed: {str(e)}")
             raise HTTPException(status_code=500, detail="Calibration failed")
@@ -35,19 +35,18 @@ class EyeTrackerProcessor:
         """
         logging.info("Starting snapshot capture from the eye tracker service.")
         try:
-            async with aiohttp.ClientSession() as session:
-                async with session.get(f"{self.eye_tracker_url}/capture_snapshot") as response:
-                    if response.status == 200:
-                        content = await response.read()
-                        logging.info("Snapshot capture successful.")
-                        return StreamingResponse(
-                            io.BytesIO(content),
-                            media_type=response.content_type
-                        )
-                    else:
-                        detail = await response.text()
-                        logging.error(f"Snapshot capture failed with status {response.status}: {detail}")
-                        raise HTTPException(status_code=response.status, detail=detail)
+            async with self.http_client.request("GET", f"{self.eye_tracker_url}/capture_snapshot") as response:
+                if response.status == 200:
+                    content = await response.read()
+                    logging.info("Snapshot capture successful.")
+                    return StreamingResponse(
+                        io.BytesIO(content),
+                        media_type=response.content_type
+                    )
+                else:
+                    detail = await response.text()
+                    logging.error(f"Snapshot capture failed with status {response.status}: {detail}")
+                    raise HTTPException(status_code=response.status, detail=detail)
         except Exception as e:
             logging.error(f"Snapshot capture failed: {str(e)}")
             raise HTTPException(status_code=500, detail="Snapshot capture failed")
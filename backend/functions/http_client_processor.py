@@ -0,0 +1,218 @@
+import time
+import asyncio
+import logging
+from contextlib import asynccontextmanager
+from urllib.parse import urlparse
+
+import aiohttp
+
+
+class CircuitOpenError(Exception):
+    """
+    Raised when a request is refused because the upstream's circuit breaker is open.
+    """
+
+
+class CircuitBreaker:
+    """
+    A per-upstream circuit breaker.
+
+    After `failure_threshold` consecutive failures the circuit opens and requests fail
+    immediately for `reset_timeout` seconds. Then a single trial request is let through;
+    its outcome closes the circuit again or re-opens it.
+    """
+
+    def __init__(self, failure_threshold=5, reset_timeout=10.0):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.consecutive_failures = 0
+        self.opened_at = None
+        self.trial_in_flight = False
+
+        self.requests = 0
+        self.failures = 0
+        self.rejected = 0
+
+    @property
+    def state(self):
+        """
+        "closed", "open" or "half_open".
+        """
+        if self.opened_at is None:
+            return "closed"
+        if time.monotonic() - self.opened_at >= self.reset_timeout:
+            return "half_open"
+        return "open"
+
+    def allow(self):
+        """
+        Returns whether a request may be sent now.
+        """
+        state = self.state
+        if state == "closed":
+            return True
+        if state == "half_open" and not self.trial_in_flight:
+            self.trial_in_flight = True
+            return True
+        self.rejected += 1
+        return False
+
+    def record_success(self):
+        self.requests += 1
+        self.consecutive_failures = 0
+        self.opened_at = None
+        self.trial_in_flight = False
+
+    def record_failure(self):
+        self.requests += 1
+        self.failures += 1
+        self.consecutive_failures += 1
+        self.trial_in_flight = False
+        if self.opened_at is not None or self.consecutive_failures >= self.failure_threshold:
+            self.opened_at = time.monotonic()
+
+    def get_stats(self):
+        return {
+            "state": self.state,
+            "requests": self.requests,
+            "failures": self.failures,
+            "consecutive_failures": self.consecutive_failures,
+            "rejected": self.rejected,
+        }
+
+
+class HttpClientProcessor:
+    """
+    A class to hold the application-lifetime HTTP client for outbound traffic to the
+    Sigma7 server, the eye tracker and the webhooks.
+
+    A single aiohttp session keeps per-host pools of keep-alive connections, so repeated
+    commands reuse open connections instead of paying a TCP handshake each time. Every
+    request has explicit connect and read timeouts, and each upstream (scheme and host)
+    has its own circuit breaker so that an unreachable device fails fast.
+    """
+
+    # Read timeout of long-running commands (calibration, haptic device initialization); aiohttp's default
+    LONG_READ_TIMEOUT = 300.0
+
+    def __init__(self, connect_timeout=2.0, read_timeout=10.0, limit_per_host=8, keepalive_timeout=75.0, failure_threshold=5, reset_timeout=10.0):
+        """
+        Initializes the client; the session is created by start().
+
+        Parameters:
+            connect_timeout (float): Seconds to establish a connection.
+            read_timeout (float): Seconds to wait for data on an established connection.
+            limit_per_host (int): Connections kept per upstream.
+            keepalive_timeout (float): Seconds an idle connection stays in the pool.
+            failure_threshold (int): Consecutive failures that open an upstream's circuit.
+            reset_timeout (float): Seconds an open circuit waits before a trial request.
+        """
+        self.connect_timeout = connect_timeout
+        self.read_timeout = read_timeout
+        self.limit_per_host = limit_per_host
+        self.keepalive_timeout = keepalive_timeout
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+
+        self.session = None
+        self.breakers = {}
+
+    async def start(self):
+        """
+        Creates the pooled session. Must run inside the event loop that will use it.
+        """
+        connector = aiohttp.TCPConnector(limit_per_host=self.limit_per_host, keepalive_timeout=self.keepalive_timeout)
+        timeout = aiohttp.ClientTimeout(total=None, sock_connect=self.connect_timeout, sock_read=self.read_timeout)
+        self.session = aiohttp.ClientSession(connector=connector, timeout=timeout)
+        logging.info("HTTP client started.")
+
+    async def close(self):
+        """
+        Closes the session and all pooled connections.
+        """
+        if self.session is not None:
+            await self.session.close()
+            self.session = None
+            logging.info("HTTP client closed.")
+
+    def breaker_for(self, url):
+        """
+        Returns the circuit breaker of the upstream a URL belongs to.
+        """
+        parsed = urlparse(url)
+        upstream = f"{parsed.scheme}://{parsed.netloc}"
+        if upstream not in self.breakers:
+            self.breakers[upstream] = CircuitBreaker(self.failure_threshold, self.reset_timeout)
+        return self.breakers[upstream]
+
+    @asynccontextmanager
+    async def request(self, method, url, use_breaker=True, read_timeout=None, **kwargs):
+        """
+        Sends a request through the pooled session.
+
+        Usage:
+            async with http_client.request("POST", url, data="stop", use_breaker=False) as response:
+                ...
+
+        Responses with a 5xx status and connection errors count as upstream failures.
+
+        Parameters:
+            use_breaker (bool): False for control commands such as stop, which must always be
+                sent: they bypass the upstream's circuit breaker and do not affect it.
+            read_timeout (float): Read timeout of this request instead of the client's, for
+                commands that take long to answer (see LONG_READ_TIMEOUT).
+
+        Raises:
+            CircuitOpenError: If the upstream's circuit is open.
+        """
+        if self.session is None:
+            raise RuntimeError("HTTP client is not started")
+
+        if read_timeout is not None:
+            kwargs["timeout"] = aiohttp.ClientTimeout(total=None, sock_connect=self.connect_timeout, sock_read=read_timeout)
+
+        if not use_breaker:
+            async with self.session.request(method, url, **kwargs) as response:
+                yield response
+            return
+
+        breaker = self.breaker_for(url)
+        if not breaker.allow():
+            raise CircuitOpenError(f"Circuit open for {url}; upstream failed {breaker.consecutive_failures} times in a row")
+
+        recorded = False
+        try:
+            async with self.session.request(method, url, **kwargs) as response:
+                if response.status >= 500:
+                    breaker.record_failure()
+                else:
+                    breaker.record_success()
+                recorded = True
+                yield response
+        except (aiohttp.ClientError, OSError, asyncio.TimeoutError):
+            if not recorded:
+                breaker.record_failure()
+                recorded = True
+            raise
+        finally:
+            if not recorded:
+                # Cancelled before an outcome; let the next request be the trial
+                breaker.trial_in_flight = False
+
+    async def warm_up(self, url):
+        """
+        Opens a pooled connection to an upstream ahead of its first command. Any response
+        will do; failures are only logged.
+        """
+        try:
+            async with self.request("GET", url) as response:
+                await response.read()
+            logging.info(f"Connection to {url} warmed up.")
+        except Exception as e:
+            logging.warning(f"Could not warm up connection to {url}: {e}")
+
+    def get_stats(self):
+        """
+        Returns the circuit state and request counters of every upstream.
+        """
+        return {upstream: breaker.get_stats() for upstream, breaker in self.breakers.items()}
@@ -1,6 +1,11 @@
 import os
+import io
+import base64
 import logging
+import threading
+import urllib
 import uuid
+from collections import OrderedDict
 from fastapi import UploadFile
 from PIL import Image
 import cv2
@@ -11,10 +16,71 @@ class ImageProcessor:
     A class to handle image processing tasks such as smart cropping and image uploading.
     """
 
+    # Inline delivery: longest side and JPEG quality of images sent as data URLs
+    INLINE_MAX_SIDE = 1024
+    INLINE_JPEG_QUALITY = 85
+    INLINE_CACHE_SIZE = 64
+
     def __init__(self, images_dir="images"):
         self.images_dir = images_dir
         os.makedirs(self.images_dir, exist_ok=True)
 
+        # Encoded data URLs keyed by (path, mtime), least recently used first
+        self.inline_cache = OrderedDict()
+        self.inline_cache_lock = threading.Lock()
+
+    def local_path_for(self, image_url):
+        """
+        Returns the path in the images directory that an image URL points to.
+        """
+        filename = os.path.basename(urllib.parse.urlparse(image_url).path)
+        return os.path.join(self.images_dir, filename)
+
+    def encode_image_data_url(self, image_url):
+        """
+        Reads the image behind an image URL from the images directory, downsizes and
+        re-encodes it as JPEG, and returns it as an inline data URL. Encodings are cached,
+        so images that stay in the conversation history are encoded once.
+
+        Blocking; run it in an executor.
+
+        Parameters:
+            image_url (str): Local or public URL of an image saved in the images directory.
+
+        Returns:
+            str: The data URL, or None if the image is not available locally.
+        """
+        image_path = self.local_path_for(image_url)
+        try:
+            key = (image_path, os.path.getmtime(image_path))
+        except OSError:
+            return None
+
+        with self.inline_cache_lock:
+            data_url = self.inline_cache.get(key)
+            if data_url is not None:
+                self.inline_cache.move_to_end(key)
+                return data_url
+
+        try:
+            with Image.open(image_path) as img:
+                img = img.convert("RGB")
+                img.thumbnail((self.INLINE_MAX_SIDE, self.INLINE_MAX_SIDE))
+                buffer = io.BytesIO()
+                img.save(buffer, format="JPEG", quality=self.INLINE_JPEG_QUALITY)
+        except OSError as e:
+            logging.error(f"Failed to encode image {image_path}: {e}")
+            return None
+
+        data_url = f"data:image/jpeg;base64,{base64.b64encode(buffer.getvalue()).decode('ascii')}"
+        logging.info(f"Encoded {image_path} inline ({len(data_url)} characters)")
+
+        with self.inline_cache_lock:
+            self.inline_cache[key] = data_url
+            while len(self.inline_cache) > self.INLINE_CACHE_SIZE:
+                self.inline_cache.popitem(last=False)
+        return data_url
+
     def smart_crop(self, image_path, output_path):
         """
         Smartly crop the image to focus on the prominent object without resizing to a fixed size.
@@ -0,0 +1,105 @@
+import os
+import json
+import base64
+import logging
+
+from PIL import Image
+
+
+class PreKnowledgeImageProcessor:
+    """
+    A class to serve the images of the pre-knowledge (few-shot) messages from a local,
+    pre-shrunk mirror instead of their public URLs.
+
+    The mirror is created by mirror_pre_knowledge_images.py, which writes the shrunk JPEGs
+    and a manifest mapping each original URL to its file and vision detail level. At
+    startup the mirrored images are encoded once as data URLs; the prompt prefix then
+    inlines them with the detail level chosen by the manifest or by a fixed override.
+    """
+
+    IMAGES_DIR = os.path.join("experiment_data", "pre_knowledge_images")
+    MANIFEST_FILE = "manifest.json"
+    DETAIL_POLICIES = ("auto", "low", "high")
+    # Longest side up to which an image is sent at low detail under the "auto" policy;
+    # low detail renders the image at 512 x 512, so larger images would lose information
+    LOW_DETAIL_MAX_SIDE = 512
+
+    def __init__(self, images_dir=IMAGES_DIR, detail="auto"):
+        """
+        Loads the manifest and encodes the mirrored images.
+
+        Parameters:
+            images_dir (str): Directory holding the mirrored images and their manifest.
+            detail (str): "auto" to use the manifest's detail per image, or "low"/"high" for all images.
+        """
+        if detail not in self.DETAIL_POLICIES:
+            raise ValueError(f"Unknown detail policy: {detail}")
+
+        self.images_dir = images_dir
+        self.detail = detail
+        self.images = {}  # original URL -> {"url": data URL, "detail": detail}
+        self.load()
+
+    @classmethod
+    def choose_detail(cls, width, height):
+        """
+        The "auto" policy: low detail for images small enough to lose nothing at 512 x 512.
+        """
+        return "low" if max(width, height) <= cls.LOW_DETAIL_MAX_SIDE else "high"
+
+    def load(self):
+        """
+        Reads the manifest and encodes every mirrored image as a data URL.
+        """
+        manifest_path = os.path.join(self.images_dir, self.MANIFEST_FILE)
+        try:
+            with open(manifest_path, 'r', encoding='utf-8') as f:
+                manifest = json.load(f)
+        except FileNotFoundError:
+            logging.info(f"No pre-knowledge image mirror at {manifest_path}; using the original image URLs.")
+            return
+        except json.JSONDecodeError as e:
+            logging.error(f"Error reading pre-knowledge image manifest: {e}")
+            return
+
+        for original_url, entry in manifest.items():
+            image_path = os.path.join(self.images_dir, entry["file"])
+            try:
+                with Image.open(image_path) as img:
+                    img_format = img.format or "JPEG"
+                with open(image_path, 'rb') as f:
+                    encoded = base64.b64encode(f.read()).decode('ascii')
+            except OSError as e:
+                logging.error(f"Failed to load mirrored pre-knowledge image {image_path}: {e}")
+                continue
+
+            detail = entry.get("detail", "high") if self.detail == "auto" else self.detail
+            self.images[original_url] = {
+                "url": f"data:{Image.MIME.get(img_format, 'image/jpeg')};base64,{encoded}",
+                "detail": detail,
+            }
+        logging.info(f"Loaded {len(self.images)} mirrored pre-knowledge images.")
+
+    def resolve(self, image_url):
+        """
+        Returns the inline replacement of a pre-knowledge image.
+
+        Parameters:
+            image_url (dict): The "image_url" part of a message, with "url" and optional "detail".
+
+        Returns:
+            dict: The replacement "image_url" part, or None if the image is not mirrored.
+        """
+        return self.images.get(image_url["url"])
+
+    def get_stats(self):
+        """
+        Returns the number of mirrored images per detail level.
+        """
+        details = [image["detail"] for image in self.images.values()]
+        return {
+            "images": len(self.images),
+            "policy": self.detail,
+            "low_detail": details.count("low"),
+            "high_detail": details.count("high"),
+        }
@@ -0,0 +1,237 @@
+import io
+import math
+import base64
+import hashlib
+import logging
+from collections import OrderedDict
+
+from PIL import Image
+
+
+class PromptProcessor:
+    """
+    A class to assemble the messages sent to the vision LLM.
+
+    The static prefix (system role and pre-knowledge messages) is built once and reused
+    unchanged, so every request starts with byte-identical messages and provider-side
+    prompt caching can hit. The dynamic tail (recent conversation) is trimmed, oldest
+    messages first, so that the whole prompt stays within a token budget.
+
+    Token counts are estimates: about four characters per text token, and the tile-based
+    cost of images (85 tokens plus 170 per 512 px tile at high detail).
+    """
+
+    CHARS_PER_TOKEN = 4
+    MESSAGE_OVERHEAD_TOKENS = 4
+    IMAGE_BASE_TOKENS = 85
+    IMAGE_TILE_TOKENS = 170
+    # Assumed size of images whose dimensions are unknown (remote URLs)
+    DEFAULT_IMAGE_SIZE = (1024, 1024)
+    IMAGE_SIZE_CACHE = 256
+
+    def __init__(self, system_role_content, pre_knowledge_messages, token_budget=24000, image_resolver=None, pre_knowledge_images=None):
+        """
+        Initializes the processor; the prefix is built on first use.
+
+        Parameters:
+            system_role_content (str): The system role.
+            pre_knowledge_messages (list): Example messages that follow the system role.
+            token_budget (int): Maximum estimated size of a prompt in tokens.
+            image_resolver (callable): Optional async callable returning the URL under which
+                an image in the prefix or the conversation is sent to the LLM.
+            pre_knowledge_images (PreKnowledgeImageProcessor): Optional local mirror that
+                replaces the pre-knowledge images with pre-shrunk inline copies.
+        """
+        self.system_role_content = system_role_content
+        self.pre_knowledge_messages = pre_knowledge_messages
+        self.token_budget = token_budget
+        self.image_resolver = image_resolver
+        self.pre_knowledge_images = pre_knowledge_images
+
+        self.prefix = None
+        self.prefix_tokens = 0
+        self.image_sizes = OrderedDict()  # SHA-1 of the data URL -> (width, height)
+
+        self.prompts = 0
+        self.trimmed_messages = 0
+        self.last_prompt = None
+
+    def reset_prefix(self, system_role_content=None, pre_knowledge_messages=None):
+        """
+        Replaces the system role and/or pre-knowledge; the prefix is rebuilt on next use.
+        """
+        if system_role_content is not None:
+            self.system_role_content = system_role_content
+        if pre_knowledge_messages is not None:
+            self.pre_knowledge_messages = pre_knowledge_messages
+        self.prefix = None
+
+    async def get_prefix(self):
+        """
+        Returns the static prefix, building it on first use.
+
+        Returns:
+            tuple: The system message followed by the pre-knowledge messages.
+        """
+        if self.prefix is None:
+            system_role = {
+                "role": "system",
+                "content": [{"type": "text", "text": self.system_role_content}]
+            }
+            pre_knowledge = [self.mirror_images(message) for message in self.pre_knowledge_messages]
+            messages = [system_role] + [await self.resolve_images(message) for message in pre_knowledge]
+            self.prefix = tuple(messages)
+            self.prefix_tokens = sum(self.estimate_message_tokens(message) for message in self.prefix)
+            logging.info(f"Prompt prefix built with {len(self.prefix)} messages (~{self.prefix_tokens} tokens).")
+        return self.prefix
+
+    async def assemble(self, conversation, user_message):
+        """
+        Builds the prompt for a request.
+
+        Parameters:
+            conversation (list): Recent conversation messages, oldest first.
+            user_message (dict): The new user message, sent as is.
+
+        Returns:
+            list: The messages to send.
+        """
+        prefix = await self.get_prefix()
+        tail = [await self.resolve_images(message) for message in conversation]
+        tail_tokens = [self.estimate_message_tokens(message) for message in tail]
+        user_tokens = self.estimate_message_tokens(user_message)
+
+        # Drop the oldest messages until the prompt fits; a turn is a user message and its reply
+        dropped = 0
+        available = self.token_budget - self.prefix_tokens - user_tokens
+        while tail and sum(tail_tokens) > available:
+            drop = 2 if len(tail) > 1 and tail[0].get("role") == "user" else 1
+            del tail[:drop], tail_tokens[:drop]
+            dropped += drop
+
+        total = self.prefix_tokens + sum(tail_tokens) + user_tokens
+        self.prompts += 1
+        self.trimmed_messages += dropped
+        self.last_prompt = {
+            "prefix_tokens": self.prefix_tokens,
+            "conversation_tokens": sum(tail_tokens),
+            "user_tokens": user_tokens,
+            "total_tokens": total,
+            "conversation_messages": len(tail),
+            "trimmed_messages": dropped,
+        }
+        logging.info(
+            f"Prompt size ~{total} tokens (prefix {self.prefix_tokens}, conversation {sum(tail_tokens)} in "
+            f"{len(tail)} messages, user {user_tokens}), {dropped} messages trimmed."
+        )
+        if total > self.token_budget:
+            logging.warning(f"Prompt exceeds the token budget of {self.token_budget} even without conversation history.")
+
+        return list(prefix) + tail + [user_message]
+
+    def mirror_images(self, message):
+        """
+        Returns a pre-knowledge message with its images replaced by their local mirror.
+        """
+        content = message.get("content")
+        if self.pre_knowledge_images is None or not isinstance(content, list):
+            return message
+
+        mirrored = []
+        for part in content:
+            if part.get("type") == "image_url":
+                replacement = self.pre_knowledge_images.resolve(part["image_url"])
+                if replacement is not None:
+                    part = {"type": "image_url", "image_url": replacement}
+            mirrored.append(part)
+        return {**message, "content": mirrored}
+
+    async def resolve_images(self, message):
+        """
+        Returns a message with its image URLs passed through the image resolver, copying
+        the message only if it contains images.
+        """
+        content = message.get("content")
+        if self.image_resolver is None or not isinstance(content, list) or not any(part.get("type") == "image_url" for part in content):
+            return message
+
+        resolved = []
+        for part in content:
+            if part.get("type") == "image_url" and not part["image_url"]["url"].startswith("data:"):
+                url = await self.image_resolver(part["image_url"]["url"])
+                part = {"type": "image_url", "image_url": {**part["image_url"], "url": url}}
+            resolved.append(part)
+        return {**message, "content": resolved}
+
+    def estimate_message_tokens(self, message):
+        """
+        Estimates the tokens of one message.
+        """
+        content = message.get("content")
+        if isinstance(content, str):
+            content = [{"type": "text", "text": content}]
+
+        tokens = self.MESSAGE_OVERHEAD_TOKENS
+        for part in content or []:
+            if part.get("type") == "text":
+                tokens += math.ceil(len(part.get("text", "")) / self.CHARS_PER_TOKEN)
+            elif part.get("type") == "image_url":
+                image_url = part["image_url"]
+                tokens += self.estimate_image_tokens(image_url["url"], image_url.get("detail", "auto"))
+        return tokens
+
+    def estimate_image_tokens(self, url, detail="auto"):
+        """
+        Estimates the tokens of an image from its dimensions and detail level.
+        """
+        if detail == "low":
+            return self.IMAGE_BASE_TOKENS
+
+        width, height = self.image_size(url)
+        # Fit within 2048 x 2048, then scale the shortest side down to 768
+        scale = min(1.0, 2048 / max(width, height))
+        width, height = width * scale, height * scale
+        scale = min(1.0, 768 / min(width, height))
+        width, height = width * scale, height * scale
+
+        tiles = math.ceil(width / 512) * math.ceil(height / 512)
+        return self.IMAGE_BASE_TOKENS + self.IMAGE_TILE_TOKENS * tiles
+
+    def image_size(self, url):
+        """
+        Returns the dimensions of an inline image, or DEFAULT_IMAGE_SIZE for remote images.
+        """
+        if not url.startswith("data:"):
+            return self.DEFAULT_IMAGE_SIZE
+
+        # Keyed by a digest so that the cache does not keep the encoded images alive
+        key = hashlib.sha1(url.encode()).digest()
+        size = self.image_sizes.get(key)
+        if size is None:
+            try:
+                encoded = url.split(",", 1)[1]
+                with Image.open(io.BytesIO(base64.b64decode(encoded))) as img:
+                    size = img.size
+            except Exception as e:
+                logging.warning(f"Cannot read the size of an inline image: {e}")
+                size = self.DEFAULT_IMAGE_SIZE
+            self.image_sizes[key] = size
+            while len(self.image_sizes) > self.IMAGE_SIZE_CACHE:
+                self.image_sizes.popitem(last=False)
+        else:
+            self.image_sizes.move_to_end(key)
+        return size
+
+    def get_stats(self):
+        """
+        Returns the prefix size, token budget and the size of the last prompt.
+        """
+        return {
+            "token_budget": self.token_budget,
+            "prefix_messages": len(self.prefix) if self.prefix is not None else None,
+            "prefix_tokens": self.prefix_tokens if self.prefix is not None else None,
+            "prompts": self.prompts,
+            "trimmed_messages": self.trimmed_messages,
+            "last_prompt": self.last_prompt,
+            "pre_knowledge_images": self.pre_knowledge_images.get_stats() if self.pre_knowledge_images is not None else None,
+        }
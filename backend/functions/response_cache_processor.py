@@ -0,0 +1,198 @@
+import os
+import re
+import json
+import time
+import hashlib
+import logging
+import urllib
+from collections import OrderedDict
+
+import numpy as np
+from PIL import Image
+
+
+class ResponseCacheProcessor:
+    """
+    A class to cache vision-LLM responses for repeated questions about the same scene.
+
+    Entries are keyed on the normalized transcript, a fingerprint of the image and a hash
+    of the system role and pre-knowledge messages. Snapshots of the same groove segment
+    taken moments apart never match byte for byte, so the fingerprint is a perceptual
+    difference hash (dHash), matched within HASH_DISTANCE bits, plus the grid cell of the
+    red circle that marks the segment, matched exactly. The grayscale dHash barely sees
+    the circle, so without the marker a snapshot of another segment of the same groove
+    would replay an answer (and stiffness matrix) meant for a different segment. Entries
+    expire after a TTL and the least recently used ones are evicted above the size cap.
+    """
+
+    HASH_SIZE = 8  # dHash of 8x8 = 64 bits
+    HASH_DISTANCE = 4  # Maximum number of differing bits for two images to match
+
+    # Red circle marker: located on a MARKER_SIZE² thumbnail, keyed by its cell in a MARKER_GRID² grid
+    MARKER_SIZE = 64
+    MARKER_GRID = 16
+    MARKER_MIN_RED = 120  # Minimum red channel of a marker pixel
+    MARKER_MIN_MARGIN = 60  # Minimum excess of red over green and blue
+    MARKER_MIN_PIXELS = 4  # Fewer red pixels than this means there is no marker
+
+    def __init__(self, ttl_seconds=3600, max_entries=256, images_dir="images"):
+        """
+        Initializes an empty cache.
+
+        Parameters:
+            ttl_seconds (float): Lifetime of an entry.
+            max_entries (int): Number of entries above which the least recently used one is evicted.
+            images_dir (str): Directory holding the uploaded images that image URLs point to.
+        """
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.images_dir = images_dir
+        self.entries = OrderedDict()  # (context, transcript, image hash) -> (created, response), least recently used first
+
+        self.hits = 0
+        self.misses = 0
+        self.expired = 0
+        self.evictions = 0
+
+    @staticmethod
+    def normalize_transcript(transcript):
+        """
+        Lowercases a transcript and strips punctuation and repeated whitespace.
+        """
+        text = re.sub(r"[^\w\s]", " ", transcript.lower())
+        return " ".join(text.split())
+
+    @staticmethod
+    def context_hash(system_role_content, pre_knowledge_messages):
+        """
+        Returns a hash of the prompt context, so that editing the role or the pre-knowledge
+        invalidates all cached responses.
+        """
+        context = json.dumps([system_role_content, pre_knowledge_messages], sort_keys=True)
+        return hashlib.sha256(context.encode("utf-8")).hexdigest()
+
+    def image_path_for(self, image_url):
+        """
+        Returns the local path of the uploaded image an image URL points to.
+        """
+        filename = os.path.basename(urllib.parse.urlparse(image_url).path)
+        return os.path.join(self.images_dir, filename)
+
+    def image_hash(self, image_url):
+        """
+        Computes the fingerprint of the image behind an image URL.
+
+        Blocking; run it in an executor.
+
+        Returns:
+            tuple: (dhash, marker_cell), the 64-bit dHash and the (row, column) grid cell of
+            the red circle, None when there is no circle; or None if the image is not
+            available locally.
+        """
+        image_path = self.image_path_for(image_url)
+        try:
+            with Image.open(image_path) as image:
+                pixels = list(image.convert("L").resize((self.HASH_SIZE + 1, self.HASH_SIZE), Image.LANCZOS).getdata())
+                thumbnail = np.asarray(image.convert("RGB").resize((self.MARKER_SIZE, self.MARKER_SIZE), Image.BILINEAR), dtype=int)
+        except (FileNotFoundError, OSError) as e:
+            logging.warning(f"Cannot hash image {image_path} for the response cache: {e}")
+            return None
+
+        return self.difference_hash(pixels), self.marker_cell(thumbnail)
+
+    def difference_hash(self, pixels):
+        """
+        Returns the dHash of a (HASH_SIZE + 1) x HASH_SIZE grayscale thumbnail, row-major.
+        """
+
+        value = 0
+        for row in range(self.HASH_SIZE):
+            for col in range(self.HASH_SIZE):
+                left = pixels[row * (self.HASH_SIZE + 1) + col]
+                right = pixels[row * (self.HASH_SIZE + 1) + col + 1]
+                value = (value << 1) | (left > right)
+        return value
+
+    def marker_cell(self, thumbnail):
+        """
+        Returns the (row, column) grid cell of the centroid of the red marker pixels of an
+        RGB thumbnail, or None if it has no red marker.
+        """
+        red, green, blue = thumbnail[..., 0], thumbnail[..., 1], thumbnail[..., 2]
+        mask = (red >= self.MARKER_MIN_RED) & (red - np.maximum(green, blue) >= self.MARKER_MIN_MARGIN)
+        if mask.sum() < self.MARKER_MIN_PIXELS:
+            return None
+        rows, cols = np.nonzero(mask)
+        scale = self.MARKER_GRID / self.MARKER_SIZE
+        return int(rows.mean() * scale), int(cols.mean() * scale)
+
+    def get(self, context, transcript, image_hash):
+        """
+        Returns the cached response for a question, or None on a miss.
+
+        Parameters:
+            context (str): Hash of the system role and pre-knowledge, see context_hash().
+            transcript (str): The normalized transcript.
+            image_hash (tuple): The fingerprint of the image, see image_hash().
+        """
+        now = time.monotonic()
+        match = None
+        for key, (created, response) in list(self.entries.items()):
+            if now - created > self.ttl_seconds:
+                del self.entries[key]
+                self.expired += 1
+                continue
+            if match is None and key[:2] == (context, transcript) and self.images_match(key[2], image_hash):
+                match = key
+
+        if match is None:
+            self.misses += 1
+            return None
+
+        self.entries.move_to_end(match)
+        self.hits += 1
+        return self.entries[match][1]
+
+    def put(self, context, transcript, image_hash, response):
+        """
+        Stores a response and evicts the least recently used entries above the size cap.
+        Callers only store responses whose stiffness matrix parsed and validated.
+        """
+        key = (context, transcript, image_hash)
+        self.entries[key] = (time.monotonic(), response)
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+            self.evictions += 1
+
+    def images_match(self, cached_hash, image_hash):
+        """
+        Whether two image fingerprints describe the same scene: the marker in the same cell and
+        nearly the same dHash. Questions without an image are never cached, so never match.
+        """
+        if cached_hash is None or image_hash is None:
+            return False
+        (cached_dhash, cached_marker), (dhash, marker) = cached_hash, image_hash
+        return cached_marker == marker and bin(cached_dhash ^ dhash).count("1") <= self.HASH_DISTANCE
+
+    def clear(self):
+        """
+        Drops all entries.
+        """
+        self.entries.clear()
+
+    def get_stats(self):
+        """
+        Returns the size and hit rate of the cache.
+        """
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self.entries),
+            "max_entries": self.max_entries,
+            "ttl_seconds": self.ttl_seconds,
+            "hits": self.hits,
+            "misses": self.misses,
+            "expired": self.expired,
+            "evictions": self.evictions,
+            "hit_rate": round(self.hits / lookups, 3) if lookups else None,
+        }
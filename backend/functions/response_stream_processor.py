@@ -0,0 +1,109 @@
+import re
+
+
+class ResponseStreamProcessor:
+    """
+    A class to cut a streamed GPT response into speakable sentences.
+
+    Tokens are fed in as they arrive. Complete sentences are released immediately so that
+    text-to-speech can start while the LLM is still generating. Everything from the
+    stiffness matrix header onwards is dropped on the fly, as it is never spoken.
+    """
+
+    # A sentence ends at . ! ? or : followed by whitespace, or at a blank line
+    SENTENCE_END = re.compile(r"[.!?:](?=\s)|\n\s*\n")
+
+    def __init__(self, stop_marker, fallback_text, min_sentence_chars=20):
+        """
+        Initializes the processor.
+
+        Parameters:
+            stop_marker (str): Text from which the rest of the response is not spoken.
+            fallback_text (str): Sentence spoken when the response contains nothing to speak.
+            min_sentence_chars (int): Shorter sentences are merged with the next one, which
+                avoids tiny TTS requests for list markers such as "1.".
+        """
+        self.stop_marker = stop_marker
+        self.fallback_text = fallback_text
+        self.min_sentence_chars = min_sentence_chars
+
+        self.text = ""
+        self.pending = ""
+        self.spoken = []
+        self.stopped = False
+
+    def feed(self, token):
+        """
+        Adds a streamed token to the response.
+
+        Parameters:
+            token (str): The next piece of the response.
+
+        Returns:
+            list: Sentences that became complete with this token.
+        """
+        self.text += token
+        if self.stopped:
+            return []
+
+        self.pending += token
+        marker_index = self.pending.find(self.stop_marker)
+        if marker_index != -1:
+            self.stopped = True
+            self.pending = self.pending[:marker_index]
+            return self.split(len(self.pending), final=True)
+
+        # Hold back a tail that could still turn into the stop marker
+        return self.split(len(self.pending) - self.partial_marker_length(), final=False)
+
+    def flush(self):
+        """
+        Ends the stream and releases the remaining text.
+
+        Returns:
+            list: The remaining sentences, or the fallback sentence if nothing was spoken at all.
+        """
+        sentences = self.split(len(self.pending), final=True)
+        if not self.spoken:
+            self.spoken.append(self.fallback_text)
+            return [self.fallback_text]
+        return sentences
+
+    def partial_marker_length(self):
+        """
+        Returns the length of the longest suffix of the pending text that starts the stop marker.
+        """
+        for length in range(min(len(self.stop_marker) - 1, len(self.pending)), 0, -1):
+            if self.pending.endswith(self.stop_marker[:length]):
+                return length
+        return 0
+
+    def split(self, limit, final):
+        """
+        Releases complete sentences from the first `limit` characters of the pending text.
+
+        Parameters:
+            limit (int): Number of pending characters that may be released.
+            final (bool): Whether to release the trailing text without a sentence end as well.
+
+        Returns:
+            list: The released sentences.
+        """
+        sentences = []
+        start = 0
+        for match in self.SENTENCE_END.finditer(self.pending, 0, limit):
+            sentence = self.pending[start:match.end()].strip()
+            if len(sentence) < self.min_sentence_chars:
+                continue
+            sentences.append(sentence)
+            start = match.end()
+
+        self.pending = self.pending[start:]
+        if final:
+            rest = self.pending.strip()
+            if rest:
+                sentences.append(rest)
+            self.pending = ""
+
+        self.spoken.extend(sentences)
+        return sentences
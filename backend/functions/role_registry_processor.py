@@ -0,0 +1,243 @@
+import os
+import json
+import time
+import logging
+
+import yaml
+
+from conversation_history_processor import ConversationHistoryProcessor
+from prompt_processor import PromptProcessor
+from response_cache_processor import ResponseCacheProcessor
+
+
+class Role:
+    """
+    One experiment condition: a system role, its pre-knowledge messages and the prompt
+    processor holding their compiled prefix. The context hash keys the role's cached
+    responses.
+    """
+
+    def __init__(self, name, system_role_content, pre_knowledge_file, pre_knowledge_messages, history_file, prompt_processor):
+        self.name = name
+        self.system_role_content = system_role_content
+        self.pre_knowledge_file = pre_knowledge_file
+        self.pre_knowledge_messages = pre_knowledge_messages
+        self.history_file = history_file  # Conversation history file of the role, or None
+        self.prompt_processor = prompt_processor
+        self.context_hash = ResponseCacheProcessor.context_hash(system_role_content, pre_knowledge_messages)
+
+
+class RoleRegistryProcessor:
+    """
+    A class to hold the system roles of roles.yaml, from which a request selects its role.
+
+    The file is parsed once and every role gets its own PromptProcessor, so the prefix of a
+    role is built once and reused by all its requests. When roles.yaml or a pre-knowledge
+    file changes on disk the registry reloads on the next lookup: roles whose content is
+    unchanged keep their compiled prefix, changed roles rebuild it. At most one stat per
+    RELOAD_CHECK_INTERVAL is spent on this, and a file that fails to parse leaves the
+    current roles in place.
+
+    The built-in "default" role, with the system role of ConversationHistoryProcessor, is
+    always defined unless the roles file defines a role of that name; without a readable
+    roles file it is the only role.
+    """
+
+    ROLES_FILE = os.path.join("experiment_data", "system_roles", "roles.yaml")
+    PRE_KNOWLEDGE_FILE = os.path.join("experiment_data", "labels", "ground_truth_messages_lab.json")
+    BUILTIN_ROLE = "default"
+    RELOAD_CHECK_INTERVAL = 1.0  # seconds
+
+    def __init__(self, roles_file=ROLES_FILE, default_role=BUILTIN_ROLE, token_budget=24000, image_resolver=None, pre_knowledge_images=None):
+        """
+        Loads the roles and compiles their prompt processors.
+
+        Parameters:
+            roles_file (str): YAML file mapping role names to "system_role_content" and the
+                optional "conversation_history_file" and "pre_knowledge_file".
+            default_role (str): Role used by requests that do not select one.
+            token_budget (int): Token budget of every role's prompts.
+            image_resolver (callable): Optional async callable passed to the prompt processors.
+            pre_knowledge_images (PreKnowledgeImageProcessor): Optional mirror of the pre-knowledge images.
+        """
+        self.roles_file = roles_file
+        self.default_role = default_role
+        self.token_budget = token_budget
+        self.image_resolver = image_resolver
+        self.pre_knowledge_images = pre_knowledge_images
+
+        self.roles = {}
+        self.mtimes = {}  # Path -> mtime of roles.yaml and the pre-knowledge files
+        self.last_check = 0.0
+        self.reloads = 0
+        self.reload_error = None
+        self.loaded_at = None
+        self.load()
+
+    def get(self, name=None):
+        """
+        Returns a role by name, or the default role.
+
+        Raises:
+            KeyError: If the role is not defined.
+        """
+        self.check_reload()
+        return self.roles[name or self.default_role]
+
+    def check_reload(self):
+        """
+        Reloads the roles if roles.yaml or one of the pre-knowledge files has been modified.
+        """
+        now = time.monotonic()
+        if now - self.last_check < self.RELOAD_CHECK_INTERVAL:
+            return
+        self.last_check = now
+        if any(self.get_mtime(path) != mtime for path, mtime in self.mtimes.items()):
+            logging.info(f"{self.roles_file} or its pre-knowledge changed; reloading the roles.")
+            self.load()
+
+    @staticmethod
+    def get_mtime(path):
+        try:
+            return os.stat(path).st_mtime_ns
+        except OSError:
+            return None
+
+    def load(self):
+        """
+        Parses the roles file and updates the registry, reusing unchanged roles.
+        """
+        mtimes = {self.roles_file: self.get_mtime(self.roles_file)}
+        error = None
+        try:
+            definitions = self.read_definitions()
+            definitions.setdefault(self.BUILTIN_ROLE, self.builtin_definition())
+            pre_knowledge = {}
+            for definition in definitions.values():
+                path = definition["pre_knowledge_file"]
+                if path not in pre_knowledge:
+                    mtimes[path] = self.get_mtime(path)
+                    pre_knowledge[path] = self.read_pre_knowledge(path)
+        except (OSError, ValueError, yaml.YAMLError) as e:
+            error = str(e)
+            logging.error(f"Failed to load roles from {self.roles_file}: {e}")
+            if self.roles:
+                # Keep the current roles and retry once the files change again
+                self.mtimes = mtimes
+                self.reload_error = error
+                return
+            definitions, pre_knowledge = self.builtin_definitions()
+
+        roles = {}
+        for name, definition in definitions.items():
+            messages = pre_knowledge[definition["pre_knowledge_file"]]
+            role = self.roles.get(name)
+            if role is None:
+                prompt_processor = PromptProcessor(
+                    definition["system_role_content"],
+                    messages,
+                    token_budget=self.token_budget,
+                    image_resolver=self.image_resolver,
+                    pre_knowledge_images=self.pre_knowledge_images,
+                )
+                role = Role(name, definition["system_role_content"], definition["pre_knowledge_file"], messages, definition["history_file"], prompt_processor)
+            elif role.system_role_content != definition["system_role_content"] or role.pre_knowledge_messages != messages:
+                role.system_role_content = definition["system_role_content"]
+                role.pre_knowledge_file = definition["pre_knowledge_file"]
+                role.pre_knowledge_messages = messages
+                role.context_hash = ResponseCacheProcessor.context_hash(role.system_role_content, messages)
+                role.prompt_processor.reset_prefix(role.system_role_content, messages)
+                logging.info(f"Role {name} changed; its prompt prefix will be rebuilt.")
+            role.history_file = definition["history_file"]
+            roles[name] = role
+
+        if self.default_role not in roles:
+            logging.warning(f"Default role {self.default_role} is not defined; using {next(iter(roles))}.")
+            self.default_role = next(iter(roles))
+
+        self.roles = roles
+        self.mtimes = mtimes
+        self.loaded_at = time.time()
+        self.reload_error = error
+        self.reloads += 1
+        logging.info(f"Loaded roles: {', '.join(roles)}")
+
+    def read_definitions(self):
+        """
+        Reads and validates the role definitions of the roles file.
+
+        Returns:
+            dict: Role name -> {"system_role_content", "pre_knowledge_file", "history_file"}
+        """
+        with open(self.roles_file, 'r', encoding='utf-8') as f:
+            data = yaml.safe_load(f)
+        if not isinstance(data, dict) or not data:
+            raise ValueError("The roles file must map role names to role definitions")
+
+        definitions = {}
+        for name, entry in data.items():
+            if not isinstance(entry, dict) or not isinstance(entry.get("system_role_content"), str):
+                raise ValueError(f"Role {name} has no system_role_content")
+            definitions[str(name)] = {
+                "system_role_content": entry["system_role_content"],
+                "pre_knowledge_file": entry.get("pre_knowledge_file", self.PRE_KNOWLEDGE_FILE),
+                "history_file": entry.get("conversation_history_file"),
+            }
+        return definitions
+
+    @staticmethod
+    def read_pre_knowledge(path):
+        """
+        Reads a pre-knowledge messages file; a missing file means no pre-knowledge.
+        """
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                messages = json.load(f)
+        except FileNotFoundError:
+            logging.warning(f"Pre-knowledge file not found at {path}.")
+            return []
+        if not isinstance(messages, list):
+            raise ValueError(f"{path} must contain a list of messages")
+        return messages
+
+    def builtin_definition(self):
+        """
+        Returns the definition of the built-in role: the original system role and pre-knowledge.
+        """
+        return {
+            "system_role_content": ConversationHistoryProcessor.SYSTEM_ROLE_CONTENT,
+            "pre_knowledge_file": self.PRE_KNOWLEDGE_FILE,
+            "history_file": None,
+        }
+
+    def builtin_definitions(self):
+        """
+        Returns the built-in role used when no roles file can be read.
+        """
+        try:
+            messages = self.read_pre_knowledge(self.PRE_KNOWLEDGE_FILE)
+        except ValueError as e:
+            logging.error(f"Error reading pre-knowledge: {e}")
+            messages = []
+        return {self.BUILTIN_ROLE: self.builtin_definition()}, {self.PRE_KNOWLEDGE_FILE: messages}
+
+    def get_stats(self):
+        """
+        Returns the defined roles, the default role and the reload state.
+        """
+        return {
+            "roles_file": self.roles_file,
+            "default_role": self.default_role,
+            "roles": {
+                name: {
+                    "pre_knowledge_file": role.pre_knowledge_file,
+                    "pre_knowledge_messages": len(role.pre_knowledge_messages),
+                    "conversation_history_file": role.history_file,
+                    "prefix_tokens": role.prompt_processor.prefix_tokens if role.prompt_processor.prefix is not None else None,
+                }
+                for name, role in self.roles.items()
+            },
+            "loaded_at": self.loaded_at,
+            "reloads": self.reloads,
+            "reload_error": self.reload_error,
+        }
@@ -0,0 +1,217 @@
+import os
+import re
+import time
+import asyncio
+import logging
+from functools import partial
+
+from conversation_history_processor import ConversationHistoryProcessor
+from webhook_processor import WebhookProcessor
+from stiffness_scheduler_processor import StiffnessSchedulerProcessor
+
+
+class Session:
+    """
+    The state of one operator station: its conversation history per role, webhook targets,
+    stiffness scheduler and the last commanded stiffness.
+    """
+
+    def __init__(self, session_id, history_factory, webhook_processor, stiffness_scheduler=None):
+        self.session_id = session_id
+        self.history_factory = history_factory
+        self.histories = {}  # Role name -> ConversationHistoryProcessor
+        self.webhook_processor = webhook_processor
+        self.stiffness_scheduler = stiffness_scheduler
+        self.stiffness_matrix = None  # Last stiffness matrix sent, in the end-effector frame
+        self.created = time.monotonic()
+        self.last_seen = self.created
+
+    def touch(self):
+        self.last_seen = time.monotonic()
+
+    def conversation_history(self, role):
+        """
+        Returns the session's conversation history under a role, loading it on first use.
+        """
+        history = self.histories.get(role.name)
+        if history is None:
+            history = self.histories[role.name] = self.history_factory(role)
+        return history
+
+    async def close(self):
+        """
+        Stops the session's background work; its history and webhooks stay on disk.
+        """
+        if self.stiffness_scheduler is not None:
+            await self.stiffness_scheduler.stop()
+        await self.webhook_processor.stop()
+
+    def get_stats(self):
+        return {
+            "idle_seconds": round(time.monotonic() - self.last_seen, 1),
+            "history_messages": {role: len(history.history) for role, history in self.histories.items()},
+            "webhooks": len(self.webhook_processor.webhook_urls),
+            "stiffness_matrix": self.stiffness_matrix,
+        }
+
+
+class SessionProcessor:
+    """
+    A class to hold the per-station sessions of the backend.
+
+    Requests carry their session id in the x-session-id header or the session_id cookie;
+    requests without one use the "default" session. It uses a role's history file when the
+    role names one, and otherwise keeps the original single-station files under the default
+    role (see create_history).
+    Other sessions journal their history to messages/sessions/<id>/<role>.jsonl and keep
+    their webhooks in webhooks/sessions/<id>.json, so a session evicted after being idle
+    is restored when its station returns. All session state is touched only from the event
+    loop, so sessions never contend for locks with each other.
+    """
+
+    DEFAULT_SESSION = "default"
+    SESSION_HEADER = "x-session-id"
+    SESSION_COOKIE = "session_id"
+    SESSION_ID_PATTERN = re.compile(r"[A-Za-z0-9_-]{1,64}")
+    HISTORY_DIR = os.path.join("messages", "sessions")
+    WEBHOOKS_DIR = os.path.join("webhooks", "sessions")
+    EVICTION_INTERVAL = 60  # seconds
+
+    def __init__(self, http_client, roles, idle_timeout=3600, stiffness_ramp_seconds=0, stiffness_ramp_rate_hz=200):
+        """
+        Initializes the store with the default session.
+
+        Parameters:
+            http_client (HttpClientProcessor): Shared client for the sessions' webhooks.
+            roles (RoleRegistryProcessor): The roles, whose history files the sessions use.
+            idle_timeout (float): Seconds without requests after which a session is evicted.
+            stiffness_ramp_seconds (float): Duration of stiffness transitions, 0 to switch instantly.
+            stiffness_ramp_rate_hz (float): Rate at which transition samples are sent.
+        """
+        self.http_client = http_client
+        self.roles = roles
+        self.idle_timeout = idle_timeout
+        self.stiffness_ramp_seconds = stiffness_ramp_seconds
+        self.stiffness_ramp_rate_hz = stiffness_ramp_rate_hz
+
+        self.sessions = {}
+        self.evictions = 0
+        self.eviction_task = None
+        self.default = self.get(self.DEFAULT_SESSION)
+
+    @classmethod
+    def session_id_from(cls, headers, cookies):
+        """
+        Returns the session id of a request.
+
+        Raises:
+            ValueError: If the session id is malformed.
+        """
+        session_id = headers.get(cls.SESSION_HEADER) or cookies.get(cls.SESSION_COOKIE) or cls.DEFAULT_SESSION
+        if not cls.SESSION_ID_PATTERN.fullmatch(session_id):
+            raise ValueError("Session ids consist of 1 to 64 letters, digits, '-' or '_'")
+        return session_id
+
+    def get(self, session_id):
+        """
+        Returns a session, creating or restoring it on first use.
+        """
+        session = self.sessions.get(session_id)
+        if session is None:
+            session = self.sessions[session_id] = self.create(session_id)
+            logging.info(f"Session {session_id} opened ({len(self.sessions)} active).")
+        session.touch()
+        return session
+
+    def create(self, session_id):
+        """
+        Builds the state of a session from its files.
+        """
+        if session_id == self.DEFAULT_SESSION:
+            webhooks = WebhookProcessor(http_client=self.http_client)
+        else:
+            webhooks = WebhookProcessor(
+                http_client=self.http_client,
+                webhooks_file=os.path.join(self.WEBHOOKS_DIR, f"{session_id}.json"),
+            )
+
+        scheduler = StiffnessSchedulerProcessor(
+            webhooks.dispatch,
+            rate_hz=self.stiffness_ramp_rate_hz,
+            duration=self.stiffness_ramp_seconds,
+        ) if self.stiffness_ramp_seconds > 0 else None
+        return Session(session_id, partial(self.create_history, session_id), webhooks, scheduler)
+
+    def create_history(self, session_id, role):
+        """
+        Loads the conversation history of a session under a role.
+
+        Other sessions always journal to HISTORY_DIR/<session>/<role>.jsonl. The default
+        session uses, in order of precedence: the role's conversation_history_file, the
+        original messages/conversation_history.json under the default role, and
+        messages/conversation_history_<role>.json under any other role.
+        """
+        if session_id != self.DEFAULT_SESSION:
+            return ConversationHistoryProcessor(
+                journal_file=os.path.join(self.HISTORY_DIR, session_id, f"{role.name}.jsonl"),
+                legacy_file=None,
+            )
+        if role.history_file is None and role.name == self.roles.default_role:
+            return ConversationHistoryProcessor()
+        history_file = role.history_file or os.path.join("messages", f"conversation_history_{role.name}.json")
+        return ConversationHistoryProcessor(
+            journal_file=f"{os.path.splitext(history_file)[0]}.jsonl",
+            legacy_file=history_file,
+        )
+
+    async def evict_idle(self):
+        """
+        Closes the sessions that have been idle for longer than the idle timeout. The default
+        session is kept.
+        """
+        now = time.monotonic()
+        idle = [
+            session for session in self.sessions.values()
+            if session.session_id != self.DEFAULT_SESSION and now - session.last_seen > self.idle_timeout
+        ]
+        for session in idle:
+            del self.sessions[session.session_id]
+            await session.close()
+            self.evictions += 1
+            logging.info(f"Session {session.session_id} evicted after {now - session.last_seen:.0f}s idle.")
+
+    async def evict_idle_forever(self):
+        while True:
+            await asyncio.sleep(self.EVICTION_INTERVAL)
+            try:
+                await self.evict_idle()
+            except Exception as e:
+                logging.error(f"Error evicting idle sessions: {e}")
+
+    def start(self):
+        """
+        Starts the periodic eviction of idle sessions.
+        """
+        self.eviction_task = asyncio.ensure_future(self.evict_idle_forever())
+
+    async def stop(self):
+        """
+        Stops the eviction task and closes all sessions.
+        """
+        if self.eviction_task is not None:
+            self.eviction_task.cancel()
+            await asyncio.gather(self.eviction_task, return_exceptions=True)
+            self.eviction_task = None
+        for session in list(self.sessions.values()):
+            await session.close()
+
+    def get_stats(self):
+        """
+        Returns the active sessions and the number of evictions.
+        """
+        return {
+            "active": len(self.sessions),
+            "idle_timeout": self.idle_timeout,
+            "evictions": self.evictions,
+            "sessions": {session_id: session.get_stats() for session_id, session in self.sessions.items()},
+        }
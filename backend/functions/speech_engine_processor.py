@@ -0,0 +1,212 @@
+import os
+import time
+import asyncio
+import logging
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from multiprocessing import get_context
+from multiprocessing.shared_memory import SharedMemory
+
+import numpy as np
+
+# State of a worker process, set once by init_worker
+worker_model = None
+worker_recognizer = None
+
+
+def init_worker(model_path, log_level):
+    """
+    Loads the Vosk model once per worker process and creates the recognizer it keeps warm.
+    """
+    global worker_model, worker_recognizer
+    from vosk import Model, KaldiRecognizer, SetLogLevel
+    from speech_processor import SpeechProcessor
+
+    SetLogLevel(log_level)
+    worker_model = Model(str(model_path))
+    worker_recognizer = KaldiRecognizer(worker_model, SpeechProcessor.SAMPLE_RATE)
+
+
+def worker_ready():
+    """
+    Returns the worker's pid once its model is loaded; used to pre-warm the pool.
+    """
+    return os.getpid()
+
+
+def transcribe_in_worker(shm_name, size):
+    """
+    Transcribes encoded audio that the parent placed in a shared-memory block.
+
+    Returns:
+        tuple: (transcript, seconds spent in the worker)
+    """
+    from speech_processor import SpeechProcessor
+
+    started = time.perf_counter()
+    # Spawned workers share the parent's resource tracker, so the parent's unlink releases the block
+    shm = SharedMemory(name=shm_name)
+    try:
+        audio_bytes = bytes(shm.buf[:size])
+    finally:
+        shm.close()
+
+    worker_recognizer.Reset()
+    transcript = SpeechProcessor.transcribe_encoded_audio(worker_recognizer, audio_bytes)
+    return transcript, time.perf_counter() - started
+
+
+class SpeechEngineProcessor:
+    """
+    A class to run speech-to-text on a pool of worker processes.
+
+    Each worker loads the Vosk model once and reuses a warm recognizer, so transcription
+    throughput scales with cores when several stations talk at the same time. Uploads
+    are handed to the workers through shared-memory buffers instead of being pickled.
+    If a worker dies the pool is broken; it is then replaced and the job retried once.
+    """
+
+    LATENCY_WINDOW = 200
+
+    def __init__(self, model_path, workers=2, log_level=-1):
+        """
+        Initializes the engine; the worker processes are started by start().
+
+        Parameters:
+            model_path (str): Path to the Vosk model directory.
+            workers (int): Number of worker processes.
+            log_level (int): Vosk log level inside the workers.
+        """
+        self.model_path = str(model_path)
+        self.workers = workers
+        self.log_level = log_level
+        self.pool = None
+        self.restart_lock = asyncio.Lock()
+
+        self.submitted = 0
+        self.completed = 0
+        self.failed = 0
+        self.restarts = 0
+        self.latencies = deque(maxlen=self.LATENCY_WINDOW)
+        self.processing_times = deque(maxlen=self.LATENCY_WINDOW)
+
+    async def start(self):
+        """
+        Starts the worker processes and waits until every worker has loaded the model.
+        """
+        self.pool = self.create_pool()
+        loop = asyncio.get_running_loop()
+        # Submitting one job per worker at once makes the pool spawn all of them now
+        pids = await asyncio.gather(*[loop.run_in_executor(self.pool, worker_ready) for _ in range(self.workers)])
+        logging.info(f"Speech engine started with {len(set(pids))} pre-warmed workers.")
+
+    def create_pool(self):
+        return ProcessPoolExecutor(
+            max_workers=self.workers,
+            mp_context=get_context("spawn"),
+            initializer=init_worker,
+            initargs=(self.model_path, self.log_level),
+        )
+
+    async def restart(self, broken_pool):
+        """
+        Replaces a broken pool with a new one, unless a concurrent job already replaced it.
+        """
+        async with self.restart_lock:
+            if self.pool is not broken_pool:
+                return
+            broken_pool.shutdown(wait=False, cancel_futures=True)
+            self.pool = self.create_pool()
+            self.restarts += 1
+            logging.warning("Speech engine worker died; worker pool restarted.")
+
+    async def stop(self):
+        """
+        Shuts the worker processes down.
+        """
+        if self.pool is not None:
+            self.pool.shutdown(wait=False, cancel_futures=True)
+            self.pool = None
+            logging.info("Speech engine stopped.")
+
+    async def transcribe(self, audio_bytes):
+        """
+        Transcribes an encoded audio upload on one of the workers.
+
+        Parameters:
+            audio_bytes (bytes): The encoded audio (webm, wav, ogg, ...).
+
+        Returns:
+            str: The transcribed text, or None if transcription failed.
+        """
+        if not audio_bytes:
+            return None
+
+        shm = SharedMemory(create=True, size=len(audio_bytes))
+        shm.buf[:len(audio_bytes)] = audio_bytes
+
+        self.submitted += 1
+        started = time.perf_counter()
+        try:
+            loop = asyncio.get_running_loop()
+            pool = self.pool
+            try:
+                transcript, processing_time = await loop.run_in_executor(
+                    pool, transcribe_in_worker, shm.name, len(audio_bytes)
+                )
+            except BrokenProcessPool:
+                await self.restart(pool)
+                transcript, processing_time = await loop.run_in_executor(
+                    self.pool, transcribe_in_worker, shm.name, len(audio_bytes)
+                )
+            self.latencies.append(time.perf_counter() - started)
+            self.processing_times.append(processing_time)
+            logging.info(f"Transcription completed: {transcript}")
+            return transcript
+
+        except Exception as e:
+            self.failed += 1
+            logging.error(f"Error in speech engine transcription: {e}")
+            return None
+
+        finally:
+            self.completed += 1
+            shm.close()
+            shm.unlink()
+
+    def get_stats(self):
+        """
+        Returns queue depth and latency statistics of the engine.
+
+        Returns:
+            dict: Job counters, queue depth and latency percentiles in milliseconds.
+        """
+        in_flight = self.submitted - self.completed
+        return {
+            "workers": self.workers,
+            "in_flight": in_flight,
+            "queue_depth": max(0, in_flight - self.workers),
+            "submitted": self.submitted,
+            "completed": self.completed,
+            "failed": self.failed,
+            "restarts": self.restarts,
+            "latency_ms": self.summarize(self.latencies),
+            "processing_ms": self.summarize(self.processing_times),
+        }
+
+    @staticmethod
+    def summarize(samples):
+        """
+        Summarizes a window of durations in seconds as millisecond percentiles.
+        """
+        if not samples:
+            return None
+        values = np.array(samples) * 1000.0
+        return {
+            "count": int(values.size),
+            "mean": round(float(values.mean()), 2),
+            "p50": round(float(np.percentile(values, 50)), 2),
+            "p95": round(float(np.percentile(values, 95)), 2),
+            "max": round(float(values.max()), 2),
+        }
@@ -1,14 +1,17 @@
 import os
 import sys
+import asyncio
 import json
 import uuid
 import time
 import logging
-import requests
 import re
+import threading
 from pathlib import Path
 import ffmpeg
 import urllib
+import aiohttp
+import aiofiles
 
 # Speech Recognition Imports
 from vosk import Model, KaldiRecognizer, SetLogLevel
@@ -18,6 +21,8 @@ from decouple import config, RepositoryEnv
 
 # Import the ConversationManager class
 from conversation_history_processor import ConversationHistoryProcessor
+from prompt_processor import PromptProcessor
+from tts_engine_processor import TTSEngineProcessor, OpenAITTSBackend, LocalTTSBackend
 
 class SpeechProcessor:
     """
@@ -25,17 +30,55 @@ class SpeechProcessor:
     """
     # Class variable for Vosk model path
     VOSK_MODEL_PATH = Path(__file__).resolve().parent.parent / "vosk-model-small-en-us-0.15"
+    # Recognizer input format and the size of the PCM chunks handed to it
+    SAMPLE_RATE = 16000
+    PCM_CHUNK_SIZE = 4000
+
+    # Text-to-speech settings and the part of a response that is never spoken
+    TTS_MODEL = "tts-1"
+    TTS_VOICE = "alloy"
+    STIFFNESS_HEADER = "### Stiffness Matrix"
+    STIFFNESS_PATTERN = r"### Stiffness Matrix(?: \(Recommended Values\))?(?:\n|.)*"
+    FALLBACK_SPEECH = "The stiffness matrix has been adjusted. These are the stiffness matrix and stiffness ellipsoid."
     
-    def __init__(self, log_level: int = -1):
-        # Initialize Vosk model for STT
+    def __init__(self, log_level: int = -1, audio_cache=None, tts_backend="openai", tts_latency_budget=None, tts_local_max_chars=0, image_resolver=None, conversation_history_processor=None, prompt_token_budget=24000, pre_knowledge_images=None, http_client=None):
+        # Vosk model for STT, loaded on first use so that processes that never transcribe
+        # (such as the offline evaluation) neither wait for it nor need it installed
         SetLogLevel(log_level)  # Suppress Vosk logs
-        self.model = self.load_vosk_model()
+        self.vosk_model = None
+        self.vosk_model_lock = threading.Lock()
 
         # Initialize OpenAI client
         self.initialize_openai_client()
 
-        # Initialize the ConversationManager
-        self.conversation_history_processor = ConversationHistoryProcessor()
+        # Share the application's ConversationHistoryProcessor, or create one when used standalone
+        self.conversation_history_processor = conversation_history_processor or ConversationHistoryProcessor()
+
+        # Optional async callable returning an inline data URL for an image URL, or None
+        # when the image is not available locally and has to be fetched by the provider
+        self.image_resolver = image_resolver
+
+        # Optional shared HttpClientProcessor for the reachability check of public image URLs
+        self.http_client = http_client
+
+        # Prompt assembly with a static prefix and a token budget for the conversation
+        self.prompt_processor = PromptProcessor(
+            self.conversation_history_processor.system_role_content,
+            self.conversation_history_processor.pre_knowledge_messages,
+            token_budget=prompt_token_budget,
+            image_resolver=self.resolve_history_image if image_resolver is not None else None,
+            pre_knowledge_images=pre_knowledge_images,
+        )
+
+        # Text-to-speech engine with an optional AudioCacheProcessor for synthesized speech
+        self.tts_engine = TTSEngineProcessor(
+            OpenAITTSBackend(self.client, model=self.TTS_MODEL, voice=self.TTS_VOICE),
+            LocalTTSBackend(),
+            primary=tts_backend,
+            latency_budget=tts_latency_budget,
+            local_max_chars=tts_local_max_chars,
+            audio_cache=audio_cache,
+        )
 
     def add_parent_to_sys_path():
         """
@@ -46,48 +89,23 @@ class SpeechProcessor:
             sys.path.append(str(parent_dir))
             logging.info(f"Added {parent_dir} to sys.path")
 
-    async def convert_audio_format(self, audio_file):
+    @property
+    def model(self):
         """
-        Converts the uploaded audio file to the required format using ffmpeg.
-
-        Parameters:
-            audio_file: An UploadFile object or similar file-like object supporting asynchronous reading.
+        The Vosk model, loaded on first access.
+        """
+        return self.load_model()
 
-        Returns:
-            str: Path to the converted audio file, or None if conversion failed.
+    def load_model(self):
         """
-        try:
-            # Ensure the audio_inputs directory exists
-            os.makedirs("audio_inputs", exist_ok=True)
-
-            original_file_path = f"audio_inputs/{audio_file.filename}"
-            converted_file_path = f"audio_inputs/converted_{audio_file.filename}"
-
-            # Read and save the original audio file asynchronously
-            with open(original_file_path, "wb") as buffer:
-                data = await audio_file.read()
-                buffer.write(data)
-            logging.info(f"Original audio file saved to {original_file_path}")
-
-            # Convert the audio file using ffmpeg
-            (
-                ffmpeg
-                .input(original_file_path)
-                .output(converted_file_path, ac=1, ar=16000)
-                .global_args('-loglevel', 'error', '-hide_banner')
-                .run()
-            )
-            logging.info(f"Audio file converted and saved to {converted_file_path}")
-
-            return converted_file_path
+        Loads the Vosk model unless it is already loaded, and returns it. Thread-safe.
+        """
+        if self.vosk_model is None:
+            with self.vosk_model_lock:
+                if self.vosk_model is None:
+                    self.vosk_model = self.load_vosk_model()
+        return self.vosk_model
 
-        except ffmpeg.Error as e:
-            logging.error(f"FFmpeg error during audio conversion: {e.stderr.decode()}")
-            return None
-        except Exception as e:
-            logging.error(f"Error converting audio file: {e}")
-            return None
-    
     def load_vosk_model(self):
         """
         Loads the Vosk speech recognition model.
@@ -102,12 +120,14 @@ class SpeechProcessor:
 
     def initialize_openai_client(self):
         """
-        Initializes the OpenAI API client.
+        Initializes the asynchronous OpenAI API client, so that LLM and TTS calls do not block the event loop.
+        OPEN_AI_BASE_URL points the client at an OpenAI-compatible server, such as llm_stand_in_server.py.
         """
         organization = config("OPEN_AI_ORG")
         api_key = config("OPEN_AI_KEY")
-        self.client = openai.OpenAI(api_key=api_key, organization=organization)
-        logging.info("OpenAI client initialized successfully.")
+        base_url = config("OPEN_AI_BASE_URL", default="") or None
+        self.client = openai.AsyncOpenAI(api_key=api_key, organization=organization, base_url=base_url)
+        logging.info(f"OpenAI client initialized successfully{f' for {base_url}' if base_url else ''}.")
 
     def speech_to_text(self, audio_file):
         """
@@ -121,23 +141,20 @@ class SpeechProcessor:
         """
         try:
             # Initialize the recognizer with the model
-            recognizer = KaldiRecognizer(self.model, 16000)
+            recognizer = KaldiRecognizer(self.model, self.SAMPLE_RATE)
 
             # Open the audio file
             with open(audio_file, "rb") as audio:
                 while True:
                     # Read a chunk of the audio file
-                    data = audio.read(4000)
+                    data = audio.read(self.PCM_CHUNK_SIZE)
                     if len(data) == 0:
                         break
                     # Recognize the speech in the chunk
                     recognizer.AcceptWaveform(data)
 
             # Get the final recognized result
-            result = recognizer.FinalResult()
-            transcript_data = json.loads(result)
-
-            transcript = transcript_data.get("text", "")
+            transcript = self.final_transcript(recognizer)
             logging.info(f"Transcription completed: {transcript}")
             return transcript
 
@@ -145,59 +162,109 @@ class SpeechProcessor:
             logging.error(f"Error in speech_to_text: {e}")
             return None
 
-    def get_gpt_response_vlm(self, transcript, image_url=None):
+    def speech_to_text_from_bytes(self, audio_bytes):
+        """
+        Converts speech in an in-memory audio upload to text using Vosk, without touching the disk.
+
+        Parameters:
+            audio_bytes (bytes): The encoded audio as uploaded by the client (webm, wav, ogg, ...).
+
+        Returns:
+            str: The transcribed text, or None if decoding failed.
+        """
+        try:
+            recognizer = KaldiRecognizer(self.model, self.SAMPLE_RATE)
+            transcript = self.transcribe_encoded_audio(recognizer, audio_bytes)
+            logging.info(f"Transcription completed: {transcript}")
+            return transcript
+
+        except ffmpeg.Error as e:
+            logging.error(f"FFmpeg error during audio decoding: {e.stderr.decode(errors='replace')}")
+            return None
+        except Exception as e:
+            logging.error(f"Error in speech_to_text_from_bytes: {e}")
+            return None
+
+    @classmethod
+    def transcribe_encoded_audio(cls, recognizer, audio_bytes):
+        """
+        Pipes encoded audio through ffmpeg and feeds the 16 kHz mono PCM it produces
+        into the recognizer as it arrives.
+
+        The upload is written to ffmpeg's stdin from a helper thread so that reading
+        stdout can never deadlock on a full pipe. Containers that need seeking
+        (e.g. mp4 with a trailing moov atom) cannot be decoded from a pipe.
+
+        Parameters:
+            recognizer (KaldiRecognizer): A recognizer created for SAMPLE_RATE.
+            audio_bytes (bytes): The encoded audio.
+
+        Returns:
+            str: The transcribed text.
+        """
+        process = (
+            ffmpeg
+            .input("pipe:0")
+            .output("pipe:1", format="s16le", acodec="pcm_s16le", ac=1, ar=cls.SAMPLE_RATE)
+            .global_args('-loglevel', 'error', '-hide_banner')
+            .run_async(pipe_stdin=True, pipe_stdout=True, pipe_stderr=True)
+        )
+
+        def feed_stdin():
+            try:
+                process.stdin.write(audio_bytes)
+            except BrokenPipeError:
+                # ffmpeg exited early; the error is reported through its return code
+                pass
+            finally:
+                process.stdin.close()
+
+        writer = threading.Thread(target=feed_stdin, daemon=True)
+        writer.start()
+        try:
+            while True:
+                data = process.stdout.read(cls.PCM_CHUNK_SIZE)
+                if not data:
+                    break
+                recognizer.AcceptWaveform(data)
+        finally:
+            writer.join()
+            stderr = process.stderr.read()
+            process.wait()
+
+        if process.returncode != 0:
+            raise ffmpeg.Error("ffmpeg", None, stderr)
+
+        return cls.final_transcript(recognizer)
+
+    @staticmethod
+    def final_transcript(recognizer):
+        """
+        Flushes the recognizer and returns the recognized text.
+        """
+        transcript_data = json.loads(recognizer.FinalResult())
+        return transcript_data.get("text", "")
+
+    async def get_gpt_response_vlm(self, transcript, image_url=None, conversation_history_processor=None, prompt_processor=None):
         """
         Generates a response using OpenAI's GPT model, optionally including an image.
 
         Parameters:
             transcript (str): The user's input text.
             image_url (str, optional): URL of the image to include in the prompt.
+            conversation_history_processor (ConversationHistoryProcessor, optional): The
+                session's conversation; defaults to the processor's own.
+            prompt_processor (PromptProcessor, optional): The role's prompt processor;
+                defaults to the processor's own.
 
         Returns:
             str: The generated response from GPT.
         """
         try:
-            # Get recent conversation history
-            history = self.conversation_history_processor.get_recent_conversation_history()
-
-            # Prepare user message
-            content = [{"type": "text", "text": transcript}]
-            if image_url:                
-                # Add a cache-busting parameter to ensure fresh requests
-                image_url_with_cache = f"{image_url}?cache_bust={int(time.time())}"
-
-                # Verify URL accessibility before proceeding
-                response = requests.get(image_url_with_cache, timeout=20)
-                if response.status_code != 200:
-                    logging.error(f"Image URL {image_url_with_cache} is inaccessible with status code {response.status_code}")
-                    return None
-
-                content.append({"type": "image_url", "image_url": {"url": image_url_with_cache, "detail": "high"}})
-
-            user_message = {
-                "role": "user",
-                "content": content
-            }
-
-            # Append the user message to the history
-            history.append(user_message)
-            logging.info("User message added to conversation history.")
-            client = self.client
-            
-            # Call the OpenAI API
-            stream = client.chat.completions.create(
-                model="gpt-4o",
-                messages=history,
-                stream=True,
-            )
             gpt_response = ""  # Initialize an empty string to accumulate the response
+            async for content in self.stream_gpt_response_vlm(transcript, image_url, conversation_history_processor, prompt_processor):
+                gpt_response += content  # Accumulate the streamed content
 
-            # Loop over the chunks from the stream
-            for chunk in stream:
-                if chunk.choices[0].delta.content is not None:
-                    content = chunk.choices[0].delta.content
-                    gpt_response += content  # Accumulate the streamed content
-            
             logging.info(f"GPT response received: {gpt_response}")
 
             return gpt_response
@@ -205,7 +272,93 @@ class SpeechProcessor:
         except Exception as e:
             logging.error(f"Error in get_gpt_response_vlm: {e}")
             return None
+
+    async def stream_gpt_response_vlm(self, transcript, image_url=None, conversation_history_processor=None, prompt_processor=None, extra_headers=None):
+        """
+        Streams a response from OpenAI's GPT model token by token, optionally including an image.
+
+        Parameters:
+            transcript (str): The user's input text.
+            image_url (str, optional): URL of the image to include in the prompt.
+            conversation_history_processor (ConversationHistoryProcessor, optional): The
+                session's conversation; defaults to the processor's own.
+            prompt_processor (PromptProcessor, optional): The role's prompt processor;
+                defaults to the processor's own.
+            extra_headers (dict, optional): Additional HTTP headers of the API request.
+
+        Yields:
+            str: The content of each streamed chunk.
+
+        Raises:
+            ValueError: If the image URL is not accessible.
+        """
+        # Prepare user message
+        content = [{"type": "text", "text": transcript}]
+        inline_image_url = await self.image_resolver(image_url) if image_url and self.image_resolver is not None else None
+        if inline_image_url:
+            content.append({"type": "image_url", "image_url": {"url": inline_image_url, "detail": "high"}})
+        elif image_url:
+            # The provider fetches the image through the public URL
+            image_url = self.convert_local_image_url_to_public(image_url)
+
+            # Add a cache-busting parameter to ensure fresh requests
+            image_url_with_cache = f"{image_url}?cache_bust={int(time.time())}"
+
+            # Verify URL accessibility before proceeding
+            status = await self.image_url_status(image_url_with_cache)
+            if status != 200:
+                logging.error(f"Image URL {image_url_with_cache} is inaccessible with status code {status}")
+                raise ValueError(f"Image URL is inaccessible (status {status})")
+
+            content.append({"type": "image_url", "image_url": {"url": image_url_with_cache, "detail": "high"}})
+
+        user_message = {
+            "role": "user",
+            "content": content
+        }
+
+        # Prefix, recent conversation within the token budget, and the user message
+        history = conversation_history_processor or self.conversation_history_processor
+        conversation = history.get_conversation_tail()
+        messages = await (prompt_processor or self.prompt_processor).assemble(conversation, user_message)
+        client = self.client
+
+        # Call the OpenAI API
+        stream = await client.chat.completions.create(
+            model="gpt-4o",
+            messages=messages,
+            stream=True,
+            extra_headers=extra_headers,
+        )
+
+        # Loop over the chunks from the stream
+        async for chunk in stream:
+            if chunk.choices and chunk.choices[0].delta.content is not None:
+                yield chunk.choices[0].delta.content
     
+    async def resolve_history_image(self, image_url):
+        """
+        Returns an image of the prompt prefix or conversation as an inline data URL where the
+        image is available locally, and as its public URL elsewhere.
+        """
+        return await self.image_resolver(image_url) or self.convert_local_image_url_to_public(image_url)
+
+    async def image_url_status(self, image_url):
+        """
+        Returns the HTTP status of a HEAD request for an image URL.
+
+        Goes through the shared HttpClientProcessor, so the check reuses its pooled
+        connections; a standalone SpeechProcessor opens a session for the check.
+        """
+        if self.http_client is not None:
+            async with self.http_client.request("HEAD", image_url) as response:
+                return response.status
+
+        timeout = aiohttp.ClientTimeout(total=20)
+        async with aiohttp.ClientSession(timeout=timeout) as session:
+            async with session.head(image_url) as response:
+                return response.status
+
     def convert_local_image_url_to_public(self, image_url):
         # Replace local URL with public Ngrok URL
         public_base_url = "https://images-sunbird-dashing.ngrok-free.app"
@@ -215,7 +368,35 @@ class SpeechProcessor:
         logging.info(f"Modified Image URL for public access: {public_image_url}")
         return public_image_url
 
-    def text_to_speech(self, text):
+    @classmethod
+    def filter_speech_text(cls, text):
+        """
+        Removes the stiffness matrix block from a response so that only the spoken part remains.
+
+        Parameters:
+            text (str): The full GPT response.
+
+        Returns:
+            str: The text to speak, or the fallback sentence if nothing remains.
+        """
+        filtered_text = re.sub(cls.STIFFNESS_PATTERN, "", text).strip()
+
+        # If nothing remains after filtering, set a default message
+        return filtered_text or cls.FALLBACK_SPEECH
+
+    async def synthesize_speech(self, text):
+        """
+        Synthesizes speech for a piece of text with the configured TTS engine.
+
+        Parameters:
+            text (str): The text to speak, already filtered.
+
+        Returns:
+            bytes: The MP3 encoded speech.
+        """
+        return await self.tts_engine.synthesize(text)
+
+    async def text_to_speech(self, text):
         """
         Converts text to speech and saves it as an audio file.
 
@@ -226,29 +407,18 @@ class SpeechProcessor:
             str: Path to the generated audio file, or False if an error occurred.
         """
         try:
-            # Define pattern to locate the stiffness matrix
-            stiffness_pattern = r"### Stiffness Matrix(?: \(Recommended Values\))?(?:\n|.)*"
-            
             # Filter out the stiffness matrix part from the response text
-            filtered_text = re.sub(stiffness_pattern, "", text).strip()
-
-            # If nothing remains after filtering, set a default message
-            if not filtered_text:
-                filtered_text = (
-                    "The stiffness matrix has been adjusted. These are the stiffness matrix and stiffness ellipsoid."
-                )
-
-            # Initiate OpenAI client to generate TTS audio with filtered text
-            client = self.client
-            response = client.audio.speech.create(
-                model="tts-1",
-                voice="alloy",
-                input=filtered_text,
-            )
+            filtered_text = self.filter_speech_text(text)
+
+            # Generate TTS audio with filtered text
+            audio = await self.synthesize_speech(filtered_text)
             
-            # Save the generated speech to an MP3 file
-            path = os.path.join(os.path.dirname(__file__), '..', 'audio_outputs', 'output.mp3')
-            response.stream_to_file(path)
+            # Save the generated speech to an MP3 file unique to this request
+            output_dir = os.path.join(os.path.dirname(__file__), '..', 'audio_outputs')
+            os.makedirs(output_dir, exist_ok=True)
+            path = os.path.join(output_dir, f"{uuid.uuid4()}.mp3")
+            async with aiofiles.open(path, "wb") as audio_file:
+                await audio_file.write(audio)
             return path
 
         except Exception as e:
@@ -265,6 +435,6 @@ if __name__ == "__main__":
     transcript = processor.speech_to_text(audio_file_path)
     # Test get_gpt_response_vlm
     image_url = "https://www.xenos.nl/pub/cdn/582043/800/582043.jpg"
-    gpt_response = processor.get_gpt_response_vlm(transcript, image_url=image_url)
+    gpt_response = asyncio.run(processor.get_gpt_response_vlm(transcript, image_url=image_url))
     # Test text_to_speech
-    processor.text_to_speech(gpt_response)
+    asyncio.run(processor.text_to_speech(gpt_response))
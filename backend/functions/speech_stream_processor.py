@@ -0,0 +1,148 @@
+import json
+import asyncio
+import logging
+import ffmpeg
+
+from vosk import KaldiRecognizer
+
+
+class SpeechStreamProcessor:
+    """
+    A class to run streaming speech recognition for a single WebSocket connection.
+
+    Audio frames are fed into a per-connection KaldiRecognizer built on the shared Vosk
+    model while the operator is still talking. Raw PCM frames go straight into the
+    recognizer; Opus frames (webm/ogg containers as produced by MediaRecorder) are
+    decoded on the fly by a long-running ffmpeg subprocess.
+    """
+
+    SUPPORTED_FORMATS = ("pcm", "webm", "ogg")
+    PCM_CHUNK_SIZE = 4000
+
+    def __init__(self, model, on_partial, audio_format="pcm", sample_rate=16000, executor=None):
+        """
+        Initializes the stream with the shared model.
+
+        Parameters:
+            model (vosk.Model): The shared Vosk model loaded by SpeechProcessor.
+            on_partial (callable): Coroutine function called with each new partial transcript.
+            audio_format (str): "pcm" for 16-bit little-endian mono PCM, or "webm"/"ogg" for Opus.
+            sample_rate (int): Sample rate of the PCM frames (ignored for Opus, which is resampled to 16 kHz).
+            executor (Executor): Executor used for the recognizer calls, None for the loop default.
+        """
+        if audio_format not in self.SUPPORTED_FORMATS:
+            raise ValueError(f"Unsupported audio format: {audio_format}")
+
+        self.model = model
+        self.on_partial = on_partial
+        self.audio_format = audio_format
+        self.sample_rate = sample_rate if audio_format == "pcm" else 16000
+        self.executor = executor
+
+        self.recognizer = None
+        self.segments = []
+        self.last_partial = ""
+        self.decoder = None
+        self.decoder_reader = None
+
+    async def start(self):
+        """
+        Creates the recognizer and, for Opus input, starts the ffmpeg decoder.
+        """
+        self.recognizer = KaldiRecognizer(self.model, self.sample_rate)
+        self.segments = []
+        self.last_partial = ""
+
+        if self.audio_format != "pcm":
+            ffmpeg_args = (
+                ffmpeg
+                .input("pipe:0", format=self.audio_format)
+                .output("pipe:1", format="s16le", acodec="pcm_s16le", ac=1, ar=self.sample_rate)
+                .global_args('-loglevel', 'error', '-hide_banner')
+                .compile()
+            )
+            self.decoder = await asyncio.create_subprocess_exec(
+                *ffmpeg_args,
+                stdin=asyncio.subprocess.PIPE,
+                stdout=asyncio.subprocess.PIPE,
+            )
+            self.decoder_reader = asyncio.ensure_future(self.read_decoder_output())
+
+        logging.info(f"Speech stream started (format={self.audio_format}, sample_rate={self.sample_rate}).")
+
+    async def feed(self, frame):
+        """
+        Feeds one audio frame into the stream.
+
+        Parameters:
+            frame (bytes): A PCM frame or a chunk of the Opus container.
+        """
+        if self.decoder is not None:
+            self.decoder.stdin.write(frame)
+            await self.decoder.stdin.drain()
+        else:
+            await self.accept_waveform(frame)
+
+    async def read_decoder_output(self):
+        """
+        Moves decoded PCM from ffmpeg's stdout into the recognizer until the decoder exits.
+        """
+        while True:
+            data = await self.decoder.stdout.read(self.PCM_CHUNK_SIZE)
+            if not data:
+                break
+            await self.accept_waveform(data)
+
+    async def accept_waveform(self, data):
+        """
+        Runs the recognizer on a PCM chunk and pushes changed partial transcripts to the client.
+        """
+        loop = asyncio.get_running_loop()
+        end_of_segment = await loop.run_in_executor(self.executor, self.recognizer.AcceptWaveform, data)
+
+        if end_of_segment:
+            # Vosk detected a pause; keep the finished segment and start a new partial
+            text = json.loads(self.recognizer.Result()).get("text", "")
+            if text:
+                self.segments.append(text)
+            partial = ""
+        else:
+            partial = json.loads(self.recognizer.PartialResult()).get("partial", "")
+
+        current = " ".join(self.segments + ([partial] if partial else []))
+        if current != self.last_partial:
+            self.last_partial = current
+            await self.on_partial(current)
+
+    async def finish(self):
+        """
+        Ends the utterance and returns the complete transcript.
+
+        Returns:
+            str: The final transcript of everything fed since start().
+        """
+        if self.decoder is not None:
+            self.decoder.stdin.close()
+            await self.decoder_reader
+            await self.decoder.wait()
+            if self.decoder.returncode != 0:
+                logging.warning(f"ffmpeg stream decoder exited with code {self.decoder.returncode}")
+            self.decoder, self.decoder_reader = None, None
+
+        text = json.loads(self.recognizer.FinalResult()).get("text", "")
+        if text:
+            self.segments.append(text)
+        transcript = " ".join(self.segments)
+        logging.info(f"Streaming transcription completed: {transcript}")
+        return transcript
+
+    async def close(self):
+        """
+        Stops the decoder if the connection ends before finish() was called.
+        """
+        if self.decoder is not None:
+            if self.decoder.returncode is None:
+                self.decoder.kill()
+                await self.decoder.wait()
+            self.decoder_reader.cancel()
+            self.decoder, self.decoder_reader = None, None
@@ -0,0 +1,264 @@
+import logging
+
+import numpy as np
+
+
+class StiffnessBatchProcessor:
+    """
+    A class to validate, rotate and analyse many stiffness matrices at once.
+
+    The matrices are held in one (N, 3, 3) array and every operation is a single
+    vectorized NumPy call (einsum, eigh) over the whole batch, so a trial log with a
+    matrix in every 200 Hz row is processed in milliseconds. The single-matrix methods of
+    StiffnessMatrixProcessor use the same code with N = 1.
+    """
+
+    # Rotation of +90° about Z from the camera frame to the end-effector frame:
+    #   Rz(90°) = [[ 0, -1,  0],
+    #              [ 1,  0,  0],
+    #              [ 0,  0,  1]]
+    CAMERA_TO_EE_ROTATION = np.array([
+        [0, -1,  0],
+        [1,  0,  0],
+        [0,  0,  1]
+    ], dtype=float)
+
+    # An eigenvector is "aligned" with X, Y or Z when that component exceeds this magnitude
+    AXIS_ALIGNMENT_THRESHOLD = 0.999
+
+    # Relative asymmetry |K - K^T| / max|K| still accepted as symmetric
+    SYMMETRY_TOLERANCE = 1e-6
+
+    # Columns 9-17 of an HRI_trial*.txt row hold its row-major stiffness matrix; rows are 200 Hz
+    TRIAL_STIFFNESS_COLUMNS = range(9, 18)
+    TRIAL_SAMPLE_RATE_HZ = 200
+
+    # Most frequent distinct matrices listed by summarize()
+    DISTINCT_MATRICES_REPORTED = 20
+
+    @staticmethod
+    def as_batch(matrices):
+        """
+        Converts matrices to a float array of shape (N, 3, 3).
+
+        Parameters:
+            matrices: A 3x3 matrix, N 3x3 matrices, or N rows of 9 row-major values.
+
+        Raises:
+            ValueError: If the input has another shape.
+        """
+        K = np.asarray(matrices, dtype=float)
+        if K.ndim == 2 and K.shape[1] == 9:
+            K = K.reshape(-1, 3, 3)
+        elif K.shape == (3, 3):
+            K = K[np.newaxis]
+        if K.ndim != 3 or K.shape[1:] != (3, 3):
+            raise ValueError(f"Expected 3x3 matrices, found an array of shape {K.shape}")
+        return K
+
+    @classmethod
+    def load_trial(cls, path):
+        """
+        Reads the stiffness matrices of an HRI trial log.
+
+        Returns:
+            np.ndarray: The (N, 3, 3) matrices, one per 200 Hz row.
+        """
+        rows = np.loadtxt(path, usecols=cls.TRIAL_STIFFNESS_COLUMNS, ndmin=2)
+        logging.info(f"Loaded {len(rows)} stiffness matrices from {path}")
+        return rows.reshape(-1, 3, 3)
+
+    @classmethod
+    def validate(cls, K):
+        """
+        Checks which matrices are valid stiffness matrices.
+
+        Parameters:
+            K (np.ndarray): Matrices of shape (N, 3, 3).
+
+        Returns:
+            dict: Boolean arrays of shape (N,): "finite", "symmetric", "positive_definite" and
+            "valid" (all three).
+        """
+        finite, symmetric = cls.check_symmetry(K)
+
+        # Smallest eigenvalue; eigvalsh only reads one triangle, which symmetry makes sufficient
+        K_safe = np.where(symmetric[:, None, None], K, np.eye(3))
+        positive_definite = symmetric & (np.linalg.eigvalsh(K_safe)[:, 0] > 0)
+        return {
+            "finite": finite,
+            "symmetric": symmetric,
+            "positive_definite": positive_definite,
+            "valid": positive_definite,
+        }
+
+    @classmethod
+    def check_symmetry(cls, K):
+        """
+        Returns the boolean arrays (finite, symmetric) of matrices of shape (N, 3, 3).
+        """
+        finite = np.isfinite(K).all(axis=(1, 2))
+        K_finite = np.where(finite[:, None, None], K, 0.0)
+
+        scale = np.maximum(np.abs(K_finite).max(axis=(1, 2)), 1.0)
+        asymmetry = np.abs(K_finite - K_finite.transpose(0, 2, 1)).max(axis=(1, 2))
+        return finite, finite & (asymmetry <= cls.SYMMETRY_TOLERANCE * scale)
+
+    @classmethod
+    def rotate_camera_to_ee(cls, K):
+        """
+        Rotates matrices from the camera frame to the end-effector frame: K_ee = R K_cam R^T.
+
+        Parameters:
+            K (np.ndarray): Camera-frame matrices of shape (N, 3, 3).
+
+        Returns:
+            np.ndarray: End-effector-frame matrices of shape (N, 3, 3).
+        """
+        R = cls.CAMERA_TO_EE_ROTATION
+        return np.einsum('ij,njk,lk->nil', R, K, R)
+
+    @classmethod
+    def principal_axes(cls, K):
+        """
+        Returns the principal stiffnesses and directions of symmetric matrices.
+
+        The eigenvalues are sorted in descending order. An eigenvector aligned with a
+        global axis is flipped to point along it, and the last eigenvector is flipped where
+        needed so that every basis is right-handed.
+
+        Parameters:
+            K (np.ndarray): Symmetric matrices of shape (N, 3, 3).
+
+        Returns:
+            tuple: (eigenvalues, eigenvectors) of shapes (N, 3) and (N, 3, 3), with the
+            eigenvectors as columns. Matrices that are not positive definite are included;
+            check them with validate().
+        """
+        eigenvalues, eigenvectors = np.linalg.eigh(K)
+
+        # Sort by descending eigenvalues; columns follow their eigenvalues
+        idx = np.argsort(eigenvalues, axis=1)[:, ::-1]
+        eigenvalues = np.take_along_axis(eigenvalues, idx, axis=1)
+        eigenvectors = np.take_along_axis(eigenvectors, idx[:, np.newaxis, :], axis=2)
+
+        # Flip eigenvectors that are aligned with a global axis but point against it
+        main_axis = np.argmax(np.abs(eigenvectors), axis=1)  # (N, 3): 0->X, 1->Y, 2->Z per column
+        main_component = np.take_along_axis(eigenvectors, main_axis[:, np.newaxis, :], axis=1)[:, 0, :]
+        flip = (np.abs(main_component) > cls.AXIS_ALIGNMENT_THRESHOLD) & (main_component < 0)
+        eigenvectors = np.where(flip[:, np.newaxis, :], -eigenvectors, eigenvectors)
+
+        # Ensure right-handed bases: flip the last eigenvector where the determinant is negative
+        left_handed = np.linalg.det(eigenvectors) < 0
+        eigenvectors[left_handed, :, 2] = -eigenvectors[left_handed, :, 2]
+
+        return eigenvalues, eigenvectors
+
+    @staticmethod
+    def anisotropy(eigenvalues):
+        """
+        Returns shape metrics of stiffness ellipsoids from their descending eigenvalues.
+
+        Parameters:
+            eigenvalues (np.ndarray): Eigenvalues of shape (N, 3), in descending order.
+
+        Returns:
+            dict: Arrays of shape (N,): "condition_number" (largest over smallest stiffness),
+            "fractional_anisotropy" (0 for isotropic, towards 1 for a single stiff axis), and
+            the Westin shape measures "linearity", "planarity" and "sphericity", which add up
+            to 1. NaN where a matrix is not positive definite.
+        """
+        l1, l2, l3 = eigenvalues[:, 0], eigenvalues[:, 1], eigenvalues[:, 2]
+        positive = l3 > 0
+        with np.errstate(divide='ignore', invalid='ignore'):
+            norm = np.sqrt(l1 ** 2 + l2 ** 2 + l3 ** 2)
+            metrics = {
+                "condition_number": l1 / l3,
+                "fractional_anisotropy": np.sqrt(0.5 * ((l1 - l2) ** 2 + (l2 - l3) ** 2 + (l3 - l1) ** 2)) / norm,
+                "linearity": (l1 - l2) / l1,
+                "planarity": (l2 - l3) / l1,
+                "sphericity": l3 / l1,
+            }
+        return {name: np.where(positive, values, np.nan) for name, values in metrics.items()}
+
+    @classmethod
+    def analyze(cls, matrices, rotate_to_ee=False):
+        """
+        Validates matrices and computes their principal axes and anisotropy in one pass.
+
+        Parameters:
+            matrices: Anything as_batch() accepts.
+            rotate_to_ee (bool): Rotate camera-frame matrices to the end-effector frame first.
+
+        Returns:
+            dict: "matrices" (N, 3, 3), the masks of validate(), "eigenvalues" (N, 3),
+            "eigenvectors" (N, 3, 3) and the metrics of anisotropy().
+        """
+        K = cls.as_batch(matrices)
+        if rotate_to_ee:
+            K = cls.rotate_camera_to_ee(K)
+        checks = cls.validate(K)
+
+        # Asymmetric matrices are decomposed as the identity; invalid ones are reported as NaN
+        K_safe = np.where(checks["symmetric"][:, None, None], K, np.eye(3))
+        eigenvalues, eigenvectors = cls.principal_axes(K_safe)
+        eigenvalues[~checks["valid"]] = np.nan
+        eigenvectors[~checks["valid"]] = np.nan
+
+        return {"matrices": K, **checks, "eigenvalues": eigenvalues, "eigenvectors": eigenvectors, **cls.anisotropy(eigenvalues)}
+
+    @classmethod
+    def summarize(cls, analysis, sample_rate_hz=None):
+        """
+        Summarizes an analysis: validity counts, the distinct matrices and when the commanded
+        matrix changed.
+
+        Parameters:
+            analysis (dict): The result of analyze().
+            sample_rate_hz (float): Rate of the matrices, to report the changes in seconds.
+
+        Returns:
+            dict: JSON-serializable summary.
+        """
+        K = analysis["matrices"]
+        flat = K.reshape(len(K), 9)
+        changes = np.flatnonzero(np.any(flat[1:] != flat[:-1], axis=1)) + 1
+        distinct, counts = np.unique(flat[analysis["finite"]], axis=0, return_counts=True)
+
+        valid = analysis["valid"]
+        summary = {
+            "count": int(len(K)),
+            "valid": int(valid.sum()),
+            "not_finite": int((~analysis["finite"]).sum()),
+            "not_symmetric": int((analysis["finite"] & ~analysis["symmetric"]).sum()),
+            "not_positive_definite": int((analysis["symmetric"] & ~analysis["positive_definite"]).sum()),
+            "distinct_count": int(len(distinct)),
+            "distinct_matrices": [
+                {"matrix": distinct[i].reshape(3, 3).tolist(), "count": int(counts[i])}
+                for i in np.argsort(-counts, kind="stable")[:cls.DISTINCT_MATRICES_REPORTED]
+            ],
+            "change_indices": changes.tolist(),
+        }
+        if sample_rate_hz:
+            summary["change_times_s"] = (changes / sample_rate_hz).round(4).tolist()
+        for name in ("condition_number", "fractional_anisotropy"):
+            values = analysis[name][valid]
+            summary[name] = {
+                "min": round(float(values.min()), 4),
+                "mean": round(float(values.mean()), 4),
+                "max": round(float(values.max()), 4),
+            } if len(values) else None
+        return summary
+
+    @staticmethod
+    def to_json(analysis):
+        """
+        Converts the per-matrix arrays of an analysis to lists, with None for NaN.
+        """
+        def to_list(values):
+            values = np.asarray(values)
+            if values.dtype == bool:
+                return values.tolist()
+            return np.where(np.isfinite(values), values.round(6), None).tolist()
+
+        return {name: to_list(values) for name, values in analysis.items()}
@@ -2,12 +2,17 @@ import os
 import re
 import json
 import uuid
+import hashlib
 import logging
 import numpy as np
 import matplotlib.pyplot as plt
+from matplotlib.figure import Figure
 import commentjson
+from functools import lru_cache
 from itertools import permutations
 
+from stiffness_batch_processor import StiffnessBatchProcessor
+
 
 class StiffnessMatrixProcessor:
     """
@@ -17,6 +22,24 @@ class StiffnessMatrixProcessor:
     - Generates an ellipsoid plot based on the stiffness matrix.
     """
 
+    # Decimals a matrix is rounded to before it is content-addressed
+    MATRIX_KEY_DECIMALS = 3
+    MATRIX_KEY_PATTERN = re.compile(r"^[0-9a-f]{32}$")
+
+    # Subdivisions of the icosahedron at the finest ellipsoid mesh level of detail
+    MAX_MESH_LOD = 5
+
+    # Matplotlib parameters of the ellipsoid plots
+    PLOT_PARAMS = {
+        'figure.figsize': (8, 8),   # Default figure size
+        'font.size': 14,            # Base font size
+        'axes.labelsize': 14,       # Axis label size
+        'axes.titlesize': 16,       # Title size
+        'xtick.labelsize': 12,      # Tick label size (x-axis)
+        'ytick.labelsize': 12,      # Tick label size (y-axis)
+        'legend.fontsize': 12,      # Legend font size (if used)
+    }
+
     def __init__(
         self,
         use_public_urls=False,
@@ -24,7 +47,8 @@ class StiffnessMatrixProcessor:
         ellipsoids_base_url=None,
         local_static_server_port=None,
         matrices_dir='matrices',
-        ellipsoids_dir='ellipsoids'
+        ellipsoids_dir='ellipsoids',
+        command_store=None
     ):
         """
         Initializes the processor with optional base URLs and directories.
@@ -35,8 +59,11 @@ class StiffnessMatrixProcessor:
             ellipsoids_base_url (str): The base URL used to construct ellipsoid plot URLs.
             matrices_dir (str): Directory where matrices are saved.
             ellipsoids_dir (str): Directory where ellipsoid plots are saved.
+            command_store (StiffnessStoreProcessor): Store that records extracted matrices and
+                resolves their URLs; without it they are saved as files in matrices_dir.
         """
         self.use_public_urls = use_public_urls
+        self.command_store = command_store
         self.matrices_dir = matrices_dir
         self.ellipsoids_dir = ellipsoids_dir
 
@@ -57,13 +84,7 @@ class StiffnessMatrixProcessor:
         self.ensure_directories()
 
         # --- SET GLOBAL MATPLOTLIB PARAMETERS HERE ---
-        plt.rcParams['figure.figsize'] = (8, 8)        # Default figure size
-        plt.rcParams['font.size'] = 14                 # Base font size
-        plt.rcParams['axes.labelsize'] = 14            # Axis label size
-        plt.rcParams['axes.titlesize'] = 16            # Title size
-        plt.rcParams['xtick.labelsize'] = 12           # Tick label size (x-axis)
-        plt.rcParams['ytick.labelsize'] = 12           # Tick label size (y-axis)
-        plt.rcParams['legend.fontsize'] = 12           # Legend font size (if used)
+        plt.rcParams.update(self.PLOT_PARAMS)
 
     def ensure_directories(self):
         """
@@ -72,12 +93,20 @@ class StiffnessMatrixProcessor:
         os.makedirs(self.matrices_dir, exist_ok=True)
         os.makedirs(self.ellipsoids_dir, exist_ok=True)
 
-    def extract_stiffness_matrix(self, response):
+    def matrix_url(self, command_id):
         """
-        Extracts the stiffness matrix from a response string and saves it to a file.
+        Returns the URL of a stiffness command recorded in the command store.
+        """
+        return f"{self.matrices_base_url}/{self.matrices_dir}/{command_id}.json"
+
+    def extract_stiffness_matrix(self, response, session_id="default"):
+        """
+        Extracts the stiffness matrix from a response string and records it in the command
+        store, or saves it to a file when there is none.
 
         Parameters:
             response (str): The response string containing the stiffness matrix in a JSON code block.
+            session_id (str): Session the command is recorded for.
 
         Returns:
             tuple: A tuple containing the stiffness matrix and the URL to the saved matrix file.
@@ -105,12 +134,20 @@ class StiffnessMatrixProcessor:
             if not self.validate_stiffness_matrix(stiffness_matrix):
                 return None, None
 
-            # Save stiffness matrix to a file
-            matrix_filename = f"{uuid.uuid4()}.json"
+            if self.command_store is not None:
+                command_id = self.command_store.record(
+                    session_id, stiffness_matrix, self.rotate_stiffness_camera_to_ee(stiffness_matrix), response=response
+                )
+                logging.info(f"Stiffness matrix extracted and recorded as {command_id}: {stiffness_matrix}")
+                return stiffness_matrix, self.matrix_url(command_id)
+
+            # Save stiffness matrix to a file named by its content, once per distinct matrix
+            matrix_filename = f"{self.matrix_key(stiffness_matrix)}.json"
             matrix_file_path = os.path.join(self.matrices_dir, matrix_filename)
 
-            with open(matrix_file_path, "w") as matrix_file:
-                json.dump(stiffness_matrix, matrix_file)
+            if not os.path.exists(matrix_file_path):
+                with open(matrix_file_path, "w") as matrix_file:
+                    json.dump(stiffness_matrix, matrix_file)
 
             # Generate URL for the matrix file
             matrix_file_url = f"{self.matrices_base_url}/{self.matrices_dir}/{matrix_filename}"
@@ -142,6 +179,23 @@ class StiffnessMatrixProcessor:
 
         json_code = match.group(1).strip()
 
+        stiffness_matrix = self.parse_stiffness_json(json_code)
+        if stiffness_matrix is None:
+            return None, None
+
+        logging.info(f"Extracted Stiffness Matrix: {stiffness_matrix}")
+        return stiffness_matrix, None  # Returning None for file URL for now
+
+    def parse_stiffness_json(self, json_code):
+        """
+        Parses and validates the contents of a stiffness matrix JSON code block.
+
+        Parameters:
+            json_code (str): The JSON text between the code fences.
+
+        Returns:
+            list: The validated 3x3 stiffness matrix, or None if the block is invalid.
+        """
         try:
             # Parse the extracted JSON
             data = json.loads(json_code)
@@ -149,18 +203,17 @@ class StiffnessMatrixProcessor:
 
             if stiffness_matrix is None:
                 logging.error("Key 'stiffness_matrix' not found in JSON data.")
-                return None, None
+                return None
 
             # Validate the stiffness matrix structure
             if not self.validate_stiffness_matrix(stiffness_matrix):
-                return None, None
+                return None
 
-            logging.info(f"Extracted Stiffness Matrix: {stiffness_matrix}")
-            return stiffness_matrix, None  # Returning None for file URL for now
+            return stiffness_matrix
 
-        except json.JSONDecodeError as e:
+        except (json.JSONDecodeError, AttributeError, TypeError) as e:
             logging.error(f"Error parsing extracted JSON: {e}")
-            return None, None
+            return None
     
     def rotate_stiffness_camera_to_ee(self, stiffness_matrix):
         """
@@ -173,21 +226,8 @@ class StiffnessMatrixProcessor:
         Returns:
             list: The transformed 3x3 stiffness matrix in end-effector frame.
         """
-        # Convert input to a NumPy array
-        K_cam = np.array(stiffness_matrix, dtype=float)
-
-        # Define the rotation matrix for +90° about Z:
-        #   Rz(90°) = [[ 0, -1,  0],
-        #              [ 1,  0,  0],
-        #              [ 0,  0,  1]]
-        Rz_90 = np.array([
-            [0, -1,  0],
-            [1,  0,  0],
-            [0,  0,  1]
-        ], dtype=float)
-
-        # Transform stiffness: K_ee = R * K_cam * R^T
-        K_ee = Rz_90 @ K_cam @ Rz_90.T
+        # Transform stiffness: K_ee = R * K_cam * R^T, with R = Rz(90°)
+        K_ee = StiffnessBatchProcessor.rotate_camera_to_ee(StiffnessBatchProcessor.as_batch(stiffness_matrix))[0]
 
         # Convert back to a Python list of lists
         return K_ee.tolist()
@@ -214,59 +254,156 @@ class StiffnessMatrixProcessor:
         return True
 
 
-    def generate_ellipsoid_plot(self, stiffness_matrix):
+    @classmethod
+    def matrix_key(cls, stiffness_matrix):
         """
-        Generates an ellipsoid plot based on the stiffness matrix and saves it to a file.
+        Returns the content address of a stiffness matrix: a hash of its values rounded to
+        MATRIX_KEY_DECIMALS, so that equal matrices share their artifacts.
+        """
+        rounded = np.round(np.array(stiffness_matrix, dtype=float), cls.MATRIX_KEY_DECIMALS) + 0.0  # + 0.0 folds -0.0 into 0.0
+        return hashlib.sha256(json.dumps(rounded.tolist()).encode("utf-8")).hexdigest()[:32]
+
+    @classmethod
+    def is_matrix_key(cls, name):
+        return bool(cls.MATRIX_KEY_PATTERN.match(name))
+
+    @staticmethod
+    def principal_axes(stiffness_matrix):
+        """
+        Returns the principal stiffnesses and directions of a stiffness matrix, as drawn by
+        the ellipsoid plot.
 
         Parameters:
             stiffness_matrix (list): The 3x3 stiffness matrix.
 
         Returns:
-            str: The URL to the saved ellipsoid plot image, or None on error.
+            tuple: (eigenvalues, eigenvectors) with the eigenvalues in descending order and the
+            matching eigenvectors as columns, sign-normalized and right-handed.
+
+        Raises:
+            ValueError: If the matrix is not positive definite.
         """
-        try:
-            # Convert input to NumPy array
-            K = np.array(stiffness_matrix, dtype=float)
+        # Same decomposition, sorting and sign rules as the batched analysis, for one matrix
+        eigenvalues, eigenvectors = StiffnessBatchProcessor.principal_axes(StiffnessBatchProcessor.as_batch(stiffness_matrix))
+        eigenvalues, eigenvectors = eigenvalues[0], eigenvectors[0]
 
-            # Perform eigen-decomposition (symmetric => use eigh)
-            eigenvalues, eigenvectors = np.linalg.eigh(K)
+        # Quick check: must be positive definite
+        if np.any(eigenvalues <= 0):
+            raise ValueError("Stiffness matrix must be positive definite.")
 
-            # Sort by descending eigenvalues
-            idx = eigenvalues.argsort()[::-1]
-            eigenvalues = eigenvalues[idx]
-            eigenvectors = eigenvectors[:, idx]  # columns match the sorted eigenvalues
+        return eigenvalues, eigenvectors
 
-            # Quick check: must be positive definite
-            if np.any(eigenvalues <= 0):
-                logging.error("Stiffness matrix must be positive definite.")
-                return None
+    def ellipsoid_geometry(self, stiffness_matrix):
+        """
+        Returns the ellipsoid of a stiffness matrix as data, for clients that draw it themselves.
 
-            # ----------------------------------------------------------------------
-            # 1) For each eigenvector (column), check if it's "aligned" with X, Y, or Z.
-            #    - If so, and it's negative along that axis, flip it.
-            #    - We do NOT reorder columns; we only do sign flips so the ellipsoid shape stays correct.
-            # ----------------------------------------------------------------------
+        Parameters:
+            stiffness_matrix (list): The 3x3 stiffness matrix.
 
-            # Threshold for "close to an axis" (could be 0.99, 0.999, etc.):
-            threshold = 0.999
+        Returns:
+            dict: "eigenvalues" in descending order (the radii of the ellipsoid as plotted) and
+            "eigenvectors", the matching unit principal directions, one per eigenvalue.
 
-            # eigenvectors.shape = (3,3) => eigenvectors[:,0] is the 1st eigenvector, etc.
-            for i in range(3):
-                vec = eigenvectors[:, i]
-                # Find which global axis has the largest absolute component
-                main_axis = np.argmax(np.abs(vec))  # 0->X, 1->Y, 2->Z
-                # Check if that largest component is "close" to 1 in magnitude:
-                if np.abs(vec[main_axis]) > threshold:
-                    # If it's negative, flip this entire eigenvector
-                    if vec[main_axis] < 0:
-                        eigenvectors[:, i] = -vec
+        Raises:
+            ValueError: If the matrix is not a positive definite 3x3 matrix.
+        """
+        if not self.validate_stiffness_matrix(stiffness_matrix):
+            raise ValueError("Stiffness matrix must be 3x3.")
+        eigenvalues, eigenvectors = self.principal_axes(stiffness_matrix)
+        return {
+            "matrix_key": self.matrix_key(stiffness_matrix),
+            "eigenvalues": eigenvalues.tolist(),
+            "eigenvectors": eigenvectors.T.tolist(),
+        }
+
+    def ellipsoid_mesh(self, stiffness_matrix, lod=2):
+        """
+        Returns a triangle mesh of the ellipsoid of a stiffness matrix.
 
-            # ----------------------------------------------------------------------
-            # 2) Ensure a right-handed coordinate system
-            #    If the determinant is negative, flip the last eigenvector
-            # ----------------------------------------------------------------------
-            if np.linalg.det(eigenvectors) < 0:
-                eigenvectors[:, 2] = -eigenvectors[:, 2]
+        The mesh is a subdivided icosahedron scaled and rotated like the plotted ellipsoid;
+        each level of detail has four times the triangles of the previous one (20 at lod 0).
+
+        Parameters:
+            stiffness_matrix (list): The 3x3 stiffness matrix.
+            lod (int): Level of detail, from 0 to MAX_MESH_LOD.
+
+        Returns:
+            tuple: (vertices, triangles): float32 array of shape (V, 3) and uint16 array of
+            shape (T, 3) indexing the vertices, counter-clockwise seen from outside.
+
+        Raises:
+            ValueError: If the matrix is not a positive definite 3x3 matrix or lod is out of range.
+        """
+        if not 0 <= lod <= self.MAX_MESH_LOD:
+            raise ValueError(f"Level of detail must be between 0 and {self.MAX_MESH_LOD}.")
+        if not self.validate_stiffness_matrix(stiffness_matrix):
+            raise ValueError("Stiffness matrix must be 3x3.")
+        eigenvalues, eigenvectors = self.principal_axes(stiffness_matrix)
+
+        unit_vertices, triangles = self.unit_icosphere(lod)
+        vertices = unit_vertices @ (eigenvectors * eigenvalues).T
+        return vertices.astype(np.float32), triangles
+
+    @staticmethod
+    @lru_cache(maxsize=None)
+    def unit_icosphere(lod):
+        """
+        Returns the vertices and triangles of a unit sphere made by subdividing an icosahedron
+        lod times. Computed once per level of detail.
+        """
+        t = (1.0 + np.sqrt(5.0)) / 2.0
+        vertices = [
+            [-1, t, 0], [1, t, 0], [-1, -t, 0], [1, -t, 0],
+            [0, -1, t], [0, 1, t], [0, -1, -t], [0, 1, -t],
+            [t, 0, -1], [t, 0, 1], [-t, 0, -1], [-t, 0, 1],
+        ]
+        triangles = [
+            [0, 11, 5], [0, 5, 1], [0, 1, 7], [0, 7, 10], [0, 10, 11],
+            [1, 5, 9], [5, 11, 4], [11, 10, 2], [10, 7, 6], [7, 1, 8],
+            [3, 9, 4], [3, 4, 2], [3, 2, 6], [3, 6, 8], [3, 8, 9],
+            [4, 9, 5], [2, 4, 11], [6, 2, 10], [8, 6, 7], [9, 8, 1],
+        ]
+
+        for _ in range(lod):
+            midpoints = {}
+
+            def midpoint(a, b):
+                edge = (min(a, b), max(a, b))
+                if edge not in midpoints:
+                    midpoints[edge] = len(vertices)
+                    vertices.append([(vertices[a][k] + vertices[b][k]) / 2.0 for k in range(3)])
+                return midpoints[edge]
+
+            subdivided = []
+            for a, b, c in triangles:
+                ab, bc, ca = midpoint(a, b), midpoint(b, c), midpoint(c, a)
+                subdivided.extend([[a, ab, ca], [b, bc, ab], [c, ca, bc], [ab, bc, ca]])
+            triangles = subdivided
+
+        vertices = np.array(vertices, dtype=float)
+        vertices /= np.linalg.norm(vertices, axis=1, keepdims=True)
+        vertices.flags.writeable = False
+        triangles = np.array(triangles, dtype=np.uint16)
+        triangles.flags.writeable = False
+        return vertices, triangles
+
+    def generate_ellipsoid_plot(self, stiffness_matrix, filename=None):
+        """
+        Generates an ellipsoid plot based on the stiffness matrix and saves it to a file.
+
+        Parameters:
+            stiffness_matrix (list): The 3x3 stiffness matrix.
+            filename (str): File name of the plot in the ellipsoids directory; a new uuid4 name by default.
+
+        Returns:
+            str: The URL to the saved ellipsoid plot image, or None on error.
+        """
+        try:
+            try:
+                eigenvalues, eigenvectors = self.principal_axes(stiffness_matrix)
+            except ValueError as e:
+                logging.error(str(e))
+                return None
 
             # ----------------------------------------------------------------------
             # 3) Construct the ellipsoid data using the (already sorted) eigenvalues
@@ -287,8 +424,9 @@ class StiffnessMatrixProcessor:
 
             # ----------------------------------------------------------------------
             # 4) Plot the ellipsoid
+            #    A standalone Figure (not pyplot) keeps this safe to run in a worker thread.
             # ----------------------------------------------------------------------
-            fig = plt.figure(figsize=(8, 8))
+            fig = Figure(figsize=(8, 8))
             ax = fig.add_subplot(111, projection='3d')
 
             ax.plot_surface(
@@ -332,10 +470,9 @@ class StiffnessMatrixProcessor:
             # ----------------------------------------------------------------------
             # 5) Save the figure
             # ----------------------------------------------------------------------
-            filename = f"{uuid.uuid4()}.png"
+            filename = filename or f"{uuid.uuid4()}.png"
             file_path = os.path.join(self.ellipsoids_dir, filename)
             fig.savefig(file_path)
-            plt.close(fig)
 
             file_url = f"{self.ellipsoids_base_url}/{self.ellipsoids_dir}/{filename}"
             logging.info(f"Ellipsoid plot saved as {file_path}")
@@ -348,6 +485,68 @@ class StiffnessMatrixProcessor:
 
 
 
+class StiffnessMatrixStreamParser:
+    """
+    A class to find the stiffness matrix in a GPT response while it is still streaming.
+
+    The ```json block is parsed and validated as soon as its closing fence arrives, so
+    the matrix can be dispatched to the robot before the rest of the response is generated.
+    """
+
+    OPEN_FENCE = "```json"
+    CLOSE_FENCE = "```"
+
+    def __init__(self, processor):
+        """
+        Initializes the parser.
+
+        Parameters:
+            processor (StiffnessMatrixProcessor): Used to parse and validate the JSON block.
+        """
+        self.processor = processor
+        self.buffer = ""
+        self.search_from = 0
+        self.block_start = None
+        self.stiffness_matrix = None
+
+    def feed(self, token):
+        """
+        Adds a streamed token to the response.
+
+        Parameters:
+            token (str): The next piece of the response.
+
+        Returns:
+            list: The stiffness matrix if it was completed by this token, otherwise None.
+                A matrix is returned at most once per response.
+        """
+        if self.stiffness_matrix is not None:
+            return None
+        self.buffer += token
+
+        while True:
+            if self.block_start is None:
+                open_index = self.buffer.find(self.OPEN_FENCE, self.search_from)
+                if open_index == -1:
+                    # Keep scanning from where a fence could still be completed
+                    self.search_from = max(0, len(self.buffer) - len(self.OPEN_FENCE) + 1)
+                    return None
+                self.block_start = open_index + len(self.OPEN_FENCE)
+                self.search_from = self.block_start
+
+            close_index = self.buffer.find(self.CLOSE_FENCE, self.search_from)
+            if close_index == -1:
+                self.search_from = max(self.block_start, len(self.buffer) - len(self.CLOSE_FENCE) + 1)
+                return None
+
+            stiffness_matrix = self.processor.parse_stiffness_json(self.buffer[self.block_start:close_index].strip())
+            self.search_from = close_index + len(self.CLOSE_FENCE)
+            self.block_start = None
+            if stiffness_matrix is not None:
+                self.stiffness_matrix = stiffness_matrix
+                logging.info(f"Stiffness matrix completed mid-stream: {stiffness_matrix}")
+                return stiffness_matrix
+
 
 if __name__ == "__main__":
     # Initialize the processor (can use local or public URLs)
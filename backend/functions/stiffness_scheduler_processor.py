@@ -0,0 +1,175 @@
+import asyncio
+import logging
+
+import numpy as np
+
+
+class StiffnessSchedulerProcessor:
+    """
+    A class to ramp the commanded stiffness smoothly instead of jumping to a new matrix.
+
+    A transition is interpolated in the log-Euclidean metric, K(s) = expm((1 - s) logm(K0)
+    + s logm(K1)), which keeps every intermediate matrix symmetric positive definite and
+    rotates the stiffness ellipsoid instead of collapsing it. The progress s follows a
+    minimum-jerk profile. The whole ramp is computed at once with batched eigendecompositions
+    and then streamed to the subscriber at the control rate. Sample deadlines are derived
+    from the ramp's start time, so timing does not drift; samples that are already overdue
+    are skipped rather than sent late.
+    """
+
+    def __init__(self, publish, rate_hz=200.0, duration=1.0):
+        """
+        Initializes the scheduler.
+
+        Parameters:
+            publish (callable): Called with each sample as a 3x3 list; must not block.
+            rate_hz (float): Samples per second, 200 Hz matches the Sigma7 control loop.
+            duration (float): Seconds a transition takes.
+        """
+        self.publish = publish
+        self.rate_hz = rate_hz
+        self.duration = duration
+
+        self.current = None  # Last published matrix
+        self.target = None
+        self.task = None
+
+        self.transitions = 0
+        self.samples_sent = 0
+        self.samples_skipped = 0
+        self.max_lateness = 0.0
+
+    @staticmethod
+    def spd_log(matrices):
+        """
+        Matrix logarithm of a stack of symmetric positive definite matrices.
+
+        Parameters:
+            matrices (np.ndarray): Array of shape (..., 3, 3).
+
+        Raises:
+            ValueError: If a matrix is not positive definite.
+        """
+        symmetric = (matrices + np.swapaxes(matrices, -1, -2)) / 2.0
+        eigenvalues, eigenvectors = np.linalg.eigh(symmetric)
+        if np.any(eigenvalues <= 0):
+            raise ValueError("Stiffness matrix is not positive definite")
+        return np.einsum("...ij,...j,...kj->...ik", eigenvectors, np.log(eigenvalues), eigenvectors)
+
+    @staticmethod
+    def sym_exp(matrices):
+        """
+        Matrix exponential of a stack of symmetric matrices of shape (..., 3, 3).
+        """
+        eigenvalues, eigenvectors = np.linalg.eigh(matrices)
+        return np.einsum("...ij,...j,...kj->...ik", eigenvectors, np.exp(eigenvalues), eigenvectors)
+
+    @classmethod
+    def interpolate(cls, start, target, steps):
+        """
+        Computes a log-Euclidean transition between two stiffness matrices.
+
+        Parameters:
+            start (array_like): The 3x3 stiffness matrix at the beginning.
+            target (array_like): The 3x3 stiffness matrix at the end.
+            steps (int): Number of samples; the last one equals the target.
+
+        Returns:
+            np.ndarray: Array of shape (steps, 3, 3).
+        """
+        logs = cls.spd_log(np.array([start, target], dtype=float))
+        t = np.arange(1, steps + 1) / steps
+        progress = t ** 3 * (10.0 - 15.0 * t + 6.0 * t ** 2)  # Minimum-jerk profile
+        blended = (1.0 - progress)[:, None, None] * logs[0] + progress[:, None, None] * logs[1]
+        return cls.sym_exp(blended)
+
+    def set_target(self, stiffness_matrix):
+        """
+        Starts a transition from the current stiffness to a new target, replacing any
+        transition in progress. The first target is published immediately.
+
+        Parameters:
+            stiffness_matrix (list): The 3x3 target stiffness matrix.
+        """
+        self.target = stiffness_matrix
+        if self.task is not None and not self.task.done():
+            self.task.cancel()
+
+        start = self.current
+        if start is None or self.duration <= 0:
+            self.send(stiffness_matrix)
+            return
+
+        steps = max(1, int(round(self.duration * self.rate_hz)))
+        try:
+            ramp = self.interpolate(start, stiffness_matrix, steps)
+        except (ValueError, np.linalg.LinAlgError) as e:
+            logging.warning(f"Cannot interpolate stiffness ({e}); switching directly.")
+            self.send(stiffness_matrix)
+            return
+
+        # The last sample is replaced by the exact target, free of round-off
+        samples = [sample.tolist() for sample in ramp[:-1]] + [stiffness_matrix]
+        self.transitions += 1
+        self.task = asyncio.ensure_future(self.stream(samples))
+
+    async def stream(self, samples):
+        """
+        Publishes the samples of a transition at the control rate.
+        """
+        loop = asyncio.get_running_loop()
+        period = 1.0 / self.rate_hz
+        started = loop.time()
+
+        index = 0
+        while index < len(samples):
+            deadline = started + (index + 1) * period
+            delay = deadline - loop.time()
+            if delay > 0:
+                await asyncio.sleep(delay)
+
+            # Skip samples whose deadline has already passed; the newest due sample wins
+            due = min(len(samples) - 1, int((loop.time() - started) / period) - 1)
+            if due > index:
+                self.samples_skipped += due - index
+                index = due
+            self.max_lateness = max(self.max_lateness, loop.time() - (started + (index + 1) * period))
+
+            self.send(samples[index])
+            index += 1
+
+    def send(self, stiffness_matrix):
+        """
+        Publishes one sample.
+        """
+        self.current = stiffness_matrix
+        self.samples_sent += 1
+        try:
+            self.publish(stiffness_matrix)
+        except Exception as e:
+            logging.error(f"Failed to publish stiffness sample: {e}")
+
+    async def stop(self):
+        """
+        Stops the transition in progress.
+        """
+        if self.task is not None:
+            self.task.cancel()
+            await asyncio.gather(self.task, return_exceptions=True)
+            self.task = None
+
+    def get_stats(self):
+        """
+        Returns the current matrix and transition counters.
+        """
+        return {
+            "rate_hz": self.rate_hz,
+            "duration": self.duration,
+            "in_transition": self.task is not None and not self.task.done(),
+            "current": self.current,
+            "target": self.target,
+            "transitions": self.transitions,
+            "samples_sent": self.samples_sent,
+            "samples_skipped": self.samples_skipped,
+            "max_lateness_ms": round(self.max_lateness * 1000.0, 3),
+        }
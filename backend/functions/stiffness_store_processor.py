@@ -0,0 +1,212 @@
+import os
+import json
+import time
+import uuid
+import sqlite3
+import logging
+import threading
+
+
+class StiffnessStoreProcessor:
+    """
+    A class to record every stiffness command in an embedded SQLite database.
+
+    Each command is stored once with its time, session, role, the LLM response it came
+    from and the matrix in the camera and end-effector frames, and is addressed by an id
+    that the matrix URLs resolve through. Indexes on time and session answer "what was the
+    stiffness at time t" and "the last N commands" without scanning. The database runs in
+    WAL mode, so the static server can read it while the backend writes. Commands older
+    than the retention period, or beyond the row cap, are deleted.
+    """
+
+    DB_FILE = os.path.join("matrices", "stiffness_commands.sqlite3")
+    PRUNE_EVERY = 100  # Records between two retention passes
+    MAX_QUERY_ROWS = 10000
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS commands (
+            seq INTEGER PRIMARY KEY AUTOINCREMENT,
+            command_id TEXT NOT NULL UNIQUE,
+            created_at REAL NOT NULL,
+            session_id TEXT NOT NULL,
+            role TEXT,
+            response TEXT,
+            matrix TEXT NOT NULL,
+            matrix_ee TEXT NOT NULL
+        );
+        CREATE INDEX IF NOT EXISTS commands_created_at ON commands (created_at);
+        CREATE INDEX IF NOT EXISTS commands_session_created_at ON commands (session_id, created_at);
+    """
+    COLUMNS = "command_id, created_at, session_id, role, response, matrix, matrix_ee"
+
+    def __init__(self, db_file=DB_FILE, retention_days=30, max_commands=100000, read_only=False):
+        """
+        Opens (and creates) the database.
+
+        Parameters:
+            db_file (str): Path of the SQLite database.
+            retention_days (float): Age after which commands are deleted, 0 to keep them.
+            max_commands (int): Number of commands kept, oldest deleted first, 0 for no cap.
+            read_only (bool): Open for queries only, as the static server does.
+        """
+        self.db_file = db_file
+        self.retention_days = retention_days
+        self.max_commands = max_commands
+        self.read_only = read_only
+        self.lock = threading.Lock()  # One connection, shared by the executor threads
+        self.records = 0
+        self.pruned = 0
+
+        if read_only:
+            self.connection = sqlite3.connect(f"file:{db_file}?mode=ro", uri=True, check_same_thread=False, isolation_level=None)
+        else:
+            os.makedirs(os.path.dirname(db_file) or ".", exist_ok=True)
+            self.connection = sqlite3.connect(db_file, check_same_thread=False, isolation_level=None)
+            self.connection.execute("PRAGMA journal_mode=WAL")
+            self.connection.execute("PRAGMA synchronous=NORMAL")
+            self.connection.executescript(self.SCHEMA)
+        self.connection.execute("PRAGMA busy_timeout=5000")
+        self.connection.row_factory = sqlite3.Row
+
+    def record(self, session_id, stiffness_matrix, stiffness_matrix_ee, response=None, role=None, created_at=None):
+        """
+        Stores a stiffness command.
+
+        Parameters:
+            session_id (str): Session the command was sent for.
+            stiffness_matrix (list): The matrix in the camera frame, as produced by the LLM.
+            stiffness_matrix_ee (list): The matrix sent to the robot, in the end-effector frame.
+            response (str): The LLM response the matrix was extracted from.
+            role (str): Role of the request.
+            created_at (float): Unix time the command was sent; now by default.
+
+        Returns:
+            str: The id of the command.
+        """
+        command_id = uuid.uuid4().hex
+        with self.lock:
+            self.connection.execute(
+                f"INSERT INTO commands ({self.COLUMNS}) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (
+                    command_id,
+                    created_at if created_at is not None else time.time(),
+                    session_id,
+                    role,
+                    response,
+                    json.dumps(stiffness_matrix),
+                    json.dumps(stiffness_matrix_ee),
+                ),
+            )
+            self.records += 1
+        if self.records % self.PRUNE_EVERY == 0:
+            self.prune()
+        return command_id
+
+    def get(self, command_id):
+        """
+        Returns a command by id, or None.
+        """
+        return self.query_one(f"SELECT {self.COLUMNS} FROM commands WHERE command_id = ?", (command_id,))
+
+    def at(self, timestamp, session_id=None):
+        """
+        Returns the command in force at a time: the last one sent at or before it, or None.
+        """
+        if session_id is None:
+            return self.query_one(
+                f"SELECT {self.COLUMNS} FROM commands WHERE created_at <= ? ORDER BY created_at DESC, seq DESC LIMIT 1",
+                (timestamp,),
+            )
+        return self.query_one(
+            f"SELECT {self.COLUMNS} FROM commands WHERE session_id = ? AND created_at <= ? ORDER BY created_at DESC, seq DESC LIMIT 1",
+            (session_id, timestamp),
+        )
+
+    def latest(self, limit=10, session_id=None):
+        """
+        Returns the last commands, newest first.
+        """
+        limit = min(limit, self.MAX_QUERY_ROWS)
+        if session_id is None:
+            return self.query(f"SELECT {self.COLUMNS} FROM commands ORDER BY created_at DESC, seq DESC LIMIT ?", (limit,))
+        return self.query(
+            f"SELECT {self.COLUMNS} FROM commands WHERE session_id = ? ORDER BY created_at DESC, seq DESC LIMIT ?",
+            (session_id, limit),
+        )
+
+    def between(self, start=None, end=None, session_id=None, limit=MAX_QUERY_ROWS):
+        """
+        Returns the commands sent in [start, end), oldest first.
+        """
+        conditions, parameters = [], []
+        if session_id is not None:
+            conditions.append("session_id = ?")
+            parameters.append(session_id)
+        if start is not None:
+            conditions.append("created_at >= ?")
+            parameters.append(start)
+        if end is not None:
+            conditions.append("created_at < ?")
+            parameters.append(end)
+        where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+        parameters.append(min(limit, self.MAX_QUERY_ROWS))
+        return self.query(f"SELECT {self.COLUMNS} FROM commands {where} ORDER BY created_at, seq LIMIT ?", parameters)
+
+    def query(self, sql, parameters=()):
+        with self.lock:
+            rows = self.connection.execute(sql, parameters).fetchall()
+        return [self.row_to_command(row) for row in rows]
+
+    def query_one(self, sql, parameters=()):
+        rows = self.query(sql, parameters)
+        return rows[0] if rows else None
+
+    @staticmethod
+    def row_to_command(row):
+        command = dict(row)
+        command["matrix"] = json.loads(command["matrix"])
+        command["matrix_ee"] = json.loads(command["matrix_ee"])
+        return command
+
+    def prune(self, now=None):
+        """
+        Deletes commands older than the retention period and beyond the row cap.
+
+        Returns:
+            int: Number of deleted commands.
+        """
+        deleted = 0
+        with self.lock:
+            if self.retention_days > 0:
+                cutoff = (now if now is not None else time.time()) - self.retention_days * 86400
+                deleted += self.connection.execute("DELETE FROM commands WHERE created_at < ?", (cutoff,)).rowcount
+            if self.max_commands > 0:
+                deleted += self.connection.execute(
+                    "DELETE FROM commands WHERE seq <= (SELECT seq FROM commands ORDER BY seq DESC LIMIT 1 OFFSET ?)",
+                    (self.max_commands,),
+                ).rowcount
+        if deleted:
+            self.pruned += deleted
+            logging.info(f"Pruned {deleted} stiffness commands from {self.db_file}")
+        return deleted
+
+    def close(self):
+        with self.lock:
+            self.connection.close()
+
+    def get_stats(self):
+        """
+        Returns the number and time span of the stored commands and the retention settings.
+        """
+        with self.lock:
+            count, first, last = self.connection.execute("SELECT COUNT(*), MIN(created_at), MAX(created_at) FROM commands").fetchone()
+        return {
+            "db_file": self.db_file,
+            "commands": count,
+            "first_at": first,
+            "last_at": last,
+            "recorded": self.records,
+            "pruned": self.pruned,
+            "retention_days": self.retention_days,
+            "max_commands": self.max_commands,
+        }
@@ -0,0 +1,167 @@
+import time
+import struct
+import asyncio
+import logging
+from urllib.parse import urlparse
+
+
+class StiffnessPacket:
+    """
+    Fixed-layout binary encoding of a stiffness command.
+
+    Layout (little-endian, 84 bytes):
+        uint32   sequence number, per target, wrapping at 2**32
+        uint64   send time in nanoseconds since the epoch (time.time_ns())
+        9 x f64  the 3x3 stiffness matrix, row-major
+    """
+
+    FORMAT = struct.Struct("<IQ9d")
+    SIZE = FORMAT.size
+
+    @classmethod
+    def pack(cls, sequence, stiffness_matrix, send_time_ns=None):
+        """
+        Encodes a 3x3 stiffness matrix.
+
+        Parameters:
+            sequence (int): The sequence number of the packet.
+            stiffness_matrix (list): The 3x3 stiffness matrix.
+            send_time_ns (int): Send timestamp, defaults to now.
+
+        Returns:
+            bytes: The packet.
+        """
+        values = [float(value) for row in stiffness_matrix for value in row]
+        if len(values) != 9:
+            raise ValueError(f"Expected 9 stiffness values, got {len(values)}")
+        if send_time_ns is None:
+            send_time_ns = time.time_ns()
+        return cls.FORMAT.pack(sequence & 0xFFFFFFFF, send_time_ns, *values)
+
+    @classmethod
+    def unpack(cls, data):
+        """
+        Decodes a packet.
+
+        Returns:
+            tuple: (sequence, send_time_ns, stiffness_matrix as a 3x3 list)
+        """
+        sequence, send_time_ns, *values = cls.FORMAT.unpack(data)
+        return sequence, send_time_ns, [values[0:3], values[3:6], values[6:9]]
+
+
+class UdpStiffnessTarget:
+    """
+    Sends stiffness packets as single UDP datagrams; delivery is not acknowledged.
+    """
+
+    def __init__(self, url):
+        parsed = urlparse(url)
+        self.address = (parsed.hostname, parsed.port)
+        self.transport = None
+        self.sequence = 0
+
+    async def send(self, stiffness_matrix):
+        if self.transport is None or self.transport.is_closing():
+            loop = asyncio.get_running_loop()
+            # The address family follows the resolved host, so IPv6 subscribers work too
+            self.transport, _ = await loop.create_datagram_endpoint(asyncio.DatagramProtocol, remote_addr=self.address)
+        self.sequence += 1
+        self.transport.sendto(StiffnessPacket.pack(self.sequence, stiffness_matrix))
+
+    async def close(self):
+        if self.transport is not None:
+            self.transport.close()
+            self.transport = None
+
+
+class WebSocketStiffnessTarget:
+    """
+    Sends stiffness packets as binary messages over a persistent WebSocket, reconnecting
+    when the connection drops.
+    """
+
+    def __init__(self, url, http_client):
+        self.url = url
+        self.http_client = http_client
+        self.websocket = None
+        self.sequence = 0
+
+    async def send(self, stiffness_matrix):
+        if self.websocket is None or self.websocket.closed:
+            self.websocket = await self.http_client.session.ws_connect(self.url, heartbeat=30)
+            logging.info(f"Stiffness WebSocket connected to {self.url}")
+        self.sequence += 1
+        try:
+            await self.websocket.send_bytes(StiffnessPacket.pack(self.sequence, stiffness_matrix))
+        except Exception:
+            # Reconnect on the next attempt
+            await self.close()
+            raise
+
+    async def close(self):
+        if self.websocket is not None:
+            await self.websocket.close()
+            self.websocket = None
+
+
+class StiffnessTransportProcessor:
+    """
+    A class to hold the persistent binary transports to stiffness command subscribers.
+
+    Subscribers register like HTTP webhooks, with a udp://host:port or ws(s)://host:port/path
+    URL. Instead of a JSON POST per update, each command is sent as an 84-byte StiffnessPacket
+    over a socket that stays open between updates.
+    """
+
+    SCHEMES = ("udp", "ws", "wss")
+
+    def __init__(self, http_client):
+        """
+        Parameters:
+            http_client (HttpClientProcessor): Shared client whose session opens WebSockets.
+        """
+        self.http_client = http_client
+        self.targets = {}
+
+    @classmethod
+    def handles(cls, url):
+        """
+        Whether a subscriber URL uses a binary transport.
+        """
+        return urlparse(url).scheme in cls.SCHEMES
+
+    @classmethod
+    def validate_url(cls, url):
+        """
+        Checks that a binary subscriber URL can be opened.
+
+        Raises:
+            ValueError: If a udp:// URL has no port, or the port is out of range.
+        """
+        parsed = urlparse(url)
+        if parsed.scheme == "udp" and parsed.port is None:
+            raise ValueError(f"UDP subscriber URL needs a port: {url}")
+
+    async def send(self, url, stiffness_matrix):
+        """
+        Sends a stiffness command to a binary subscriber, opening its transport on first use.
+        """
+        target = self.targets.get(url)
+        if target is None:
+            if urlparse(url).scheme == "udp":
+                target = UdpStiffnessTarget(url)
+            else:
+                target = WebSocketStiffnessTarget(url, self.http_client)
+            self.targets[url] = target
+        await target.send(stiffness_matrix)
+
+    async def close(self, url=None):
+        """
+        Closes the transport of one subscriber, or of all subscribers.
+        """
+        urls = [url] if url is not None else list(self.targets)
+        for target_url in urls:
+            target = self.targets.pop(target_url, None)
+            if target is not None:
+                await target.close()
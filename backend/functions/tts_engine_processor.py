@@ -0,0 +1,237 @@
+import time
+import shutil
+import asyncio
+import logging
+import ffmpeg
+
+
+class TTSBackend:
+    """
+    Base class of a text-to-speech backend. Backends return MP3 audio so that responses
+    from different backends can be mixed within one audio stream.
+    """
+
+    name = "base"
+
+    def cache_identity(self):
+        """
+        Returns the (model, voice) pair under which this backend's audio is cached.
+        """
+        raise NotImplementedError
+
+    async def synthesize(self, text):
+        """
+        Synthesizes text.
+
+        Parameters:
+            text (str): The text to speak.
+
+        Returns:
+            bytes: The MP3 encoded speech.
+        """
+        raise NotImplementedError
+
+
+class OpenAITTSBackend(TTSBackend):
+    """
+    Text-to-speech through the OpenAI audio API.
+    """
+
+    name = "openai"
+
+    def __init__(self, client, model="tts-1", voice="alloy"):
+        self.client = client
+        self.model = model
+        self.voice = voice
+
+    def cache_identity(self):
+        return self.model, self.voice
+
+    async def synthesize(self, text):
+        response = await self.client.audio.speech.create(
+            model=self.model,
+            voice=self.voice,
+            input=text,
+        )
+        return response.content
+
+
+class LocalTTSBackend(TTSBackend):
+    """
+    Offline text-to-speech on the CPU using espeak-ng (or espeak), encoded to MP3 by ffmpeg.
+    """
+
+    name = "local"
+
+    def __init__(self, voice="en-us", words_per_minute=175):
+        self.voice = voice
+        self.words_per_minute = words_per_minute
+        self.executable = shutil.which("espeak-ng") or shutil.which("espeak")
+
+    @property
+    def available(self):
+        """
+        Whether an espeak executable was found.
+        """
+        return self.executable is not None
+
+    def cache_identity(self):
+        return f"espeak-{self.words_per_minute}wpm", self.voice
+
+    async def synthesize(self, text):
+        if not self.available:
+            raise RuntimeError("Local TTS needs espeak-ng or espeak on the PATH")
+
+        # The text goes on stdin, so that sentences starting with "-" are not read as options
+        espeak = await asyncio.create_subprocess_exec(
+            self.executable, "--stdout", "--stdin", "-v", self.voice, "-s", str(self.words_per_minute),
+            stdin=asyncio.subprocess.PIPE,
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.PIPE,
+        )
+        wav, stderr = await espeak.communicate(text.encode("utf-8"))
+        if espeak.returncode != 0:
+            raise RuntimeError(f"espeak failed: {stderr.decode(errors='replace')}")
+
+        ffmpeg_args = (
+            ffmpeg
+            .input("pipe:0", format="wav")
+            .output("pipe:1", format="mp3")
+            .global_args('-loglevel', 'error', '-hide_banner')
+            .compile()
+        )
+        encoder = await asyncio.create_subprocess_exec(
+            *ffmpeg_args,
+            stdin=asyncio.subprocess.PIPE,
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.PIPE,
+        )
+        mp3, stderr = await encoder.communicate(wav)
+        if encoder.returncode != 0:
+            raise ffmpeg.Error("ffmpeg", None, stderr)
+        return mp3
+
+
+class TTSEngineProcessor:
+    """
+    A class to select the text-to-speech backend per deployment.
+
+    The primary backend ("openai" or "local") handles every request. When the primary
+    is remote and a latency budget is set, requests that exceed the budget or fail are
+    spoken by the local backend instead; the remote result still lands in the cache.
+    Short texts can be routed to the local backend directly.
+    """
+
+    BACKENDS = ("openai", "local")
+
+    def __init__(self, remote_backend, local_backend, primary="openai", latency_budget=None, local_max_chars=0, audio_cache=None):
+        """
+        Initializes the engine.
+
+        Parameters:
+            remote_backend (OpenAITTSBackend): The remote backend.
+            local_backend (LocalTTSBackend): The offline backend.
+            primary (str): "openai" or "local".
+            latency_budget (float): Seconds to wait for the remote backend before falling back, None to never fall back.
+            local_max_chars (int): Texts up to this length are always spoken locally, 0 to disable.
+            audio_cache (AudioCacheProcessor): Optional cache of synthesized speech.
+        """
+        if primary not in self.BACKENDS:
+            raise ValueError(f"Unknown TTS backend: {primary}")
+
+        self.remote_backend = remote_backend
+        self.local_backend = local_backend
+        self.primary = primary
+        self.latency_budget = latency_budget
+        self.local_max_chars = local_max_chars
+        self.audio_cache = audio_cache
+
+        if not self.local_backend.available and (primary == "local" or latency_budget or local_max_chars):
+            logging.warning("Local TTS requested but espeak-ng/espeak was not found; local synthesis will fail.")
+
+        self.stats = {backend: {"requests": 0, "failures": 0, "total_seconds": 0.0} for backend in self.BACKENDS}
+        self.fallbacks = 0
+
+    async def synthesize(self, text):
+        """
+        Synthesizes text with the configured backend, falling back to the local backend
+        when the remote one is too slow or fails.
+
+        Parameters:
+            text (str): The text to speak.
+
+        Returns:
+            bytes: The MP3 encoded speech.
+        """
+        local_only = self.primary == "local" or len(text) <= self.local_max_chars
+        if local_only or not self.latency_budget or not self.local_backend.available:
+            return await self.synthesize_with(self.local_backend if local_only else self.remote_backend, text)
+
+        remote = asyncio.ensure_future(self.synthesize_with(self.remote_backend, text))
+        try:
+            # Shielded so that a late remote result still completes and fills the cache
+            return await asyncio.wait_for(asyncio.shield(remote), timeout=self.latency_budget)
+        except asyncio.TimeoutError:
+            logging.warning(f"Remote TTS exceeded its {self.latency_budget}s budget; speaking locally.")
+            # Nothing awaits the abandoned remote task any more; retrieve its outcome
+            remote.add_done_callback(self.log_abandoned_result)
+        except Exception as e:
+            logging.warning(f"Remote TTS failed ({e}); speaking locally.")
+
+        self.fallbacks += 1
+        return await self.synthesize_with(self.local_backend, text)
+
+    @staticmethod
+    def log_abandoned_result(task):
+        """
+        Logs the failure of a remote synthesis that finished after its request fell back.
+        """
+        if not task.cancelled() and task.exception() is not None:
+            logging.warning(f"Remote TTS failed after its request fell back: {task.exception()}")
+
+    async def synthesize_with(self, backend, text):
+        """
+        Synthesizes text with one backend, going through the audio cache when present.
+        """
+        cache_key = None
+        if self.audio_cache is not None:
+            model, voice = backend.cache_identity()
+            cache_key = self.audio_cache.make_key(text, model, voice)
+            audio = await self.audio_cache.get(cache_key)
+            if audio is not None:
+                return audio
+
+        stats = self.stats[backend.name]
+        stats["requests"] += 1
+        started = time.perf_counter()
+        try:
+            audio = await backend.synthesize(text)
+        except Exception:
+            stats["failures"] += 1
+            raise
+        finally:
+            stats["total_seconds"] += time.perf_counter() - started
+
+        if cache_key is not None:
+            await self.audio_cache.put(cache_key, audio)
+        return audio
+
+    def get_stats(self):
+        """
+        Returns per-backend request counts and mean latencies, and the number of fallbacks.
+        """
+        backends = {}
+        for name, stats in self.stats.items():
+            mean = stats["total_seconds"] / stats["requests"] if stats["requests"] else None
+            backends[name] = {
+                "requests": stats["requests"],
+                "failures": stats["failures"],
+                "mean_ms": round(mean * 1000.0, 2) if mean is not None else None,
+            }
+        return {
+            "primary": self.primary,
+            "latency_budget": self.latency_budget,
+            "local_available": self.local_backend.available,
+            "fallbacks": self.fallbacks,
+            "backends": backends,
+        }
@@ -2,21 +2,50 @@
 
 import os
 import json
+import time
+import asyncio
 import logging
 from urllib.parse import urlparse
 from fastapi import HTTPException
 
+from stiffness_transport_processor import StiffnessTransportProcessor
+
 
 class WebhookProcessor:
     """
-    A class to manage webhook URLs, including registration, unregistration, and listing.
+    A class to manage webhook URLs, including registration, unregistration, and listing,
+    and to deliver stiffness matrices to them.
+
+    Every target has its own delivery worker and a queue that holds only the newest
+    payload: a subscriber that falls behind skips stale matrices instead of receiving a
+    backlog, and a slow or dead subscriber never delays the others.
+
+    Targets registered with a udp:// or ws:// URL receive compact binary packets over a
+    persistent socket instead of a JSON POST, see StiffnessTransportProcessor.
     """
 
     WEBHOOKS_FILE = "webhooks/webhook_urls.json"
+    # Delivery attempts per payload, the back-off between them and the timeout of each attempt
+    MAX_ATTEMPTS = 3
+    RETRY_DELAY = 0.2  # seconds, doubled after every failed attempt
+    DELIVERY_TIMEOUT = 2.0  # seconds
+
+    def __init__(self, http_client=None, webhooks_file=WEBHOOKS_FILE):
+        """
+        Initializes the processor with the persisted webhook URLs.
 
-    def __init__(self):
-        self.webhooks_file = self.WEBHOOKS_FILE
+        Parameters:
+            http_client (HttpClientProcessor): Shared client used to deliver payloads.
+            webhooks_file (str): File in which the webhook URLs are persisted.
+        """
+        self.webhooks_file = webhooks_file
         self.webhook_urls = self.load_webhooks()
+        self.http_client = http_client
+        self.transports = StiffnessTransportProcessor(http_client)
+
+        self.queues = {}  # webhook URL -> asyncio.Queue(maxsize=1) holding the newest payload
+        self.workers = {}  # webhook URL -> delivery task
+        self.stats = {}  # webhook URL -> delivery counters
 
     def ensure_webhooks_file(self):
         """
@@ -79,6 +108,14 @@ class WebhookProcessor:
             str: Confirmation message about the registration status.
         """
         self.validate_webhook_url(webhook_url)
+        # Binary subscribers are checked here rather than on first delivery, where the error
+        # would only show up in the delivery stats (unregistering stays possible either way)
+        if self.transports.handles(webhook_url):
+            try:
+                self.transports.validate_url(webhook_url)
+            except ValueError as e:
+                logging.error(f"Invalid webhook URL: {webhook_url}: {e}")
+                raise HTTPException(status_code=400, detail=str(e))
         if webhook_url not in self.webhook_urls:
             self.webhook_urls.append(webhook_url)
             self.save_webhooks()
@@ -102,6 +139,9 @@ class WebhookProcessor:
         if webhook_url in self.webhook_urls:
             self.webhook_urls.remove(webhook_url)
             self.save_webhooks()
+            self.stop_worker(webhook_url)
+            if self.transports.handles(webhook_url):
+                asyncio.ensure_future(self.transports.close(webhook_url))
             logging.info(f"Webhook unregistered: {webhook_url}")
             return f"Webhook unregistered successfully: {webhook_url}"
         else:
@@ -117,3 +157,133 @@ class WebhookProcessor:
         """
         logging.info("Listing registered webhook URLs.")
         return self.webhook_urls
+
+    def dispatch(self, payload):
+        """
+        Queues a payload for every registered webhook and returns immediately. A payload
+        still waiting for delivery to a target is replaced by the newer one.
+
+        Parameters:
+            payload: JSON-serializable payload, e.g. the end-effector stiffness matrix.
+        """
+        for webhook_url in list(self.webhook_urls):
+            queue = self.queues.get(webhook_url)
+            if queue is None:
+                queue = self.queues[webhook_url] = asyncio.Queue(maxsize=1)
+                self.workers[webhook_url] = asyncio.ensure_future(self.deliver_forever(webhook_url, queue))
+
+            if queue.full():
+                queue.get_nowait()
+                self.stats_for(webhook_url)["coalesced"] += 1
+            queue.put_nowait(payload)
+
+    async def deliver_forever(self, webhook_url, queue):
+        """
+        Delivery worker of one target; sends queued payloads one at a time.
+        """
+        while True:
+            payload = await queue.get()
+            await self.deliver(webhook_url, payload, queue)
+
+    async def deliver(self, webhook_url, payload, queue):
+        """
+        Delivers a payload to one target, retrying with back-off. Retrying stops early when
+        a newer payload is waiting, as the old one would be stale by then.
+        """
+        stats = self.stats_for(webhook_url)
+        for attempt in range(1, self.MAX_ATTEMPTS + 1):
+            started = time.perf_counter()
+            try:
+                status = await asyncio.wait_for(self.send(webhook_url, payload), timeout=self.DELIVERY_TIMEOUT)
+                if status is None or status < 400:
+                    latency = time.perf_counter() - started
+                    stats["delivered"] += 1
+                    stats["total_seconds"] += latency
+                    stats["last_latency_ms"] = round(latency * 1000.0, 2)
+                    return
+                error = f"status {status}"
+                if status < 500:
+                    break  # The subscriber rejected the payload; retrying will not help
+            except Exception as e:
+                error = str(e) or type(e).__name__
+
+            logging.warning(f"[Attempt {attempt}/{self.MAX_ATTEMPTS}] Webhook {webhook_url} failed: {error}")
+            if attempt == self.MAX_ATTEMPTS or not queue.empty():
+                break
+            stats["retries"] += 1
+            await asyncio.sleep(self.RETRY_DELAY * (2 ** (attempt - 1)))
+
+        stats["failed"] += 1
+        stats["last_error"] = error
+        logging.error(f"Failed to notify webhook {webhook_url}: {error}")
+
+    async def send(self, webhook_url, payload):
+        """
+        Sends a payload to a target.
+
+        Returns:
+            int: The HTTP response status, or None for binary transports, which have none.
+        """
+        if self.transports.handles(webhook_url):
+            await self.transports.send(webhook_url, payload)
+            return None
+
+        async with self.http_client.request("POST", webhook_url, json=payload) as response:
+            await response.read()
+            return response.status
+
+    def stats_for(self, webhook_url):
+        """
+        Returns the delivery counters of a target, creating them on first use.
+        """
+        if webhook_url not in self.stats:
+            self.stats[webhook_url] = {
+                "delivered": 0,
+                "failed": 0,
+                "retries": 0,
+                "coalesced": 0,
+                "total_seconds": 0.0,
+                "last_latency_ms": None,
+                "last_error": None,
+            }
+        return self.stats[webhook_url]
+
+    def stop_worker(self, webhook_url):
+        """
+        Stops the delivery worker of a target and drops its pending payload.
+        """
+        worker = self.workers.pop(webhook_url, None)
+        if worker is not None:
+            worker.cancel()
+        self.queues.pop(webhook_url, None)
+
+    async def stop(self):
+        """
+        Stops all delivery workers and closes the binary transports.
+        """
+        workers = list(self.workers.values())
+        for webhook_url in list(self.workers):
+            self.stop_worker(webhook_url)
+        await asyncio.gather(*workers, return_exceptions=True)
+        await self.transports.close()
+
+    def get_stats(self):
+        """
+        Returns per-target delivery counters, mean latency and whether a payload is pending.
+        """
+        targets = {}
+        for webhook_url, stats in self.stats.items():
+            mean = stats["total_seconds"] / stats["delivered"] if stats["delivered"] else None
+            queue = self.queues.get(webhook_url)
+            targets[webhook_url] = {
+                "registered": webhook_url in self.webhook_urls,
+                "pending": queue.qsize() if queue is not None else 0,
+                "delivered": stats["delivered"],
+                "failed": stats["failed"],
+                "retries": stats["retries"],
+                "coalesced": stats["coalesced"],
+                "mean_latency_ms": round(mean * 1000.0, 2) if mean is not None else None,
+                "last_latency_ms": stats["last_latency_ms"],
+                "last_error": stats["last_error"],
+            }
+        return targets
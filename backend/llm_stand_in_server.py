@@ -0,0 +1,208 @@
+"""
+Local stand-in for the OpenAI chat completions API, for measuring the response pipeline
+offline with evaluate_pipeline.py, or for running the backend without the provider.
+
+    python llm_stand_in_server.py --port 8010 --first-token-ms 400 --token-ms 15
+    OPEN_AI_BASE_URL=http://localhost:8010/v1 uvicorn main:app
+
+It answers POST /v1/chat/completions, streamed or not. The reply to a request is the
+labelled reply of a turn in the --answers files (the ground-truth labels and recorded
+sessions by default): the turn named by the x-evaluation-case header ("<file>#<turn>",
+sent by evaluate_pipeline.py), or else the first turn with the same text and image file
+name. Unknown turns get a reply without a stiffness matrix. Latency and faults are configurable: the delay before the
+first token, the interval between chunks, the share of replies whose matrix is replaced
+by a wrong one, and the share of replies whose JSON block is malformed.
+"""
+import sys
+import glob
+import json
+import time
+import uuid
+import random
+import asyncio
+import logging
+import argparse
+from pathlib import Path
+
+from aiohttp import web
+
+# Ensure `functions/` is discoverable
+sys.path.append(str(Path(__file__).resolve().parent / "functions"))
+
+from functions.evaluation_processor import EvaluationProcessor
+
+logging.basicConfig(level="INFO", format="%(asctime)s - %(levelname)s - %(message)s")
+
+DEFAULT_ANSWERS = ["experiment_data/labels/ground_truth_messages_*.json", "messages/*.json"]
+UNKNOWN_REPLY = "I could not find the highlighted groove in this image. Could you send another picture?"
+WRONG_MATRIX = "[\n    [250, 0, 0],\n    [0, 250, 0],\n    [0, 0, 250]\n  ]"
+
+
+class StandInOptions:
+    def __init__(self, first_token_ms=300.0, token_ms=10.0, jitter_ms=0.0, chunk_chars=4, wrong_rate=0.0, malformed_rate=0.0, seed=None, model="gpt-4o"):
+        self.first_token_ms = first_token_ms
+        self.token_ms = token_ms
+        self.jitter_ms = jitter_ms
+        self.chunk_chars = chunk_chars
+        self.wrong_rate = wrong_rate
+        self.malformed_rate = malformed_rate
+        self.random = random.Random(seed)
+        self.model = model
+
+    def delay(self, milliseconds):
+        return max(0.0, milliseconds + self.random.uniform(-self.jitter_ms, self.jitter_ms)) / 1000.0
+
+
+def load_answers(patterns):
+    """
+    Indexes the labelled replies by source file and turn, and by text and image, where the
+    first file defining a text and image wins.
+
+    Returns:
+        dict: {"turns": {turn id: reply}, "texts": {case key: reply}}.
+    """
+    answers = {"turns": {}, "texts": {}}
+    for pattern in patterns:
+        for path in sorted(glob.glob(pattern)):
+            try:
+                cases = EvaluationProcessor.load_cases(path)
+            except (OSError, ValueError, KeyError, TypeError, AttributeError) as e:
+                logging.warning(f"Skipping {path}: {e}")
+                continue
+            for case in cases:
+                answers["turns"][case.turn_id] = case.reply
+                answers["texts"].setdefault(case.key, case.reply)
+    logging.info(f"Loaded {len(answers['turns'])} labelled replies.")
+    return answers
+
+
+def choose_reply(messages, answers, options, turn_id=None):
+    """
+    Returns the reply to the last user message, or to the named turn, with the configured
+    faults applied.
+    """
+    last_user = next((message for message in reversed(messages) if message.get("role") == "user"), None)
+    if last_user is None:
+        return UNKNOWN_REPLY
+    reply = answers["turns"].get(turn_id)
+    if reply is None:
+        reply = answers["texts"].get(EvaluationProcessor.case_key(*EvaluationProcessor.split_message(last_user)), UNKNOWN_REPLY)
+
+    fault = options.random.random()
+    if fault < options.malformed_rate:
+        reply = reply.replace('"stiffness_matrix"', '"stiffness_matrix": [', 1)
+    elif fault < options.malformed_rate + options.wrong_rate and "```json" in reply:
+        reply = reply.split("```json")[0] + "```json\n{\n  \"stiffness_matrix\": " + WRONG_MATRIX + "\n}\n```"
+    return reply
+
+
+def create_app(answers, options):
+    """
+    Builds the aiohttp application serving the chat completions endpoint.
+    """
+    stats = {"requests": 0, "streamed": 0}
+
+    async def chat_completions(request):
+        body = await request.json()
+        stats["requests"] += 1
+        reply = choose_reply(body.get("messages", []), answers, options, request.headers.get(EvaluationProcessor.CASE_HEADER))
+        completion_id = f"chatcmpl-{uuid.uuid4().hex}"
+        created = int(time.time())
+        chunks = [reply[i:i + options.chunk_chars] for i in range(0, len(reply), options.chunk_chars)] or [""]
+
+        await asyncio.sleep(options.delay(options.first_token_ms))
+        if not body.get("stream"):
+            await asyncio.sleep(options.delay(options.token_ms) * (len(chunks) - 1))
+            return web.json_response({
+                "id": completion_id,
+                "object": "chat.completion",
+                "created": created,
+                "model": options.model,
+                "choices": [{"index": 0, "message": {"role": "assistant", "content": reply}, "finish_reason": "stop"}],
+                "usage": {"prompt_tokens": 0, "completion_tokens": len(chunks), "total_tokens": len(chunks)},
+            })
+
+        stats["streamed"] += 1
+        response = web.StreamResponse(headers={"Content-Type": "text/event-stream", "Cache-Control": "no-cache"})
+        await response.prepare(request)
+
+        async def send(delta, finish_reason=None):
+            chunk = {
+                "id": completion_id,
+                "object": "chat.completion.chunk",
+                "created": created,
+                "model": options.model,
+                "choices": [{"index": 0, "delta": delta, "finish_reason": finish_reason}],
+            }
+            await response.write(f"data: {json.dumps(chunk)}\n\n".encode("utf-8"))
+
+        await send({"role": "assistant", "content": chunks[0]})
+        for chunk in chunks[1:]:
+            await asyncio.sleep(options.delay(options.token_ms))
+            await send({"content": chunk})
+        await send({}, finish_reason="stop")
+        await response.write(b"data: [DONE]\n\n")
+        await response.write_eof()
+        return response
+
+    async def stand_in_stats(request):
+        return web.json_response(stats)
+
+    app = web.Application()
+    app.router.add_post("/v1/chat/completions", chat_completions)
+    app.router.add_get("/stats", stand_in_stats)
+    return app
+
+
+async def start(host, port, answers, options):
+    """
+    Starts the stand-in server on the running event loop.
+
+    Returns:
+        web.AppRunner: Call cleanup() on it to stop the server.
+    """
+    runner = web.AppRunner(create_app(answers, options))
+    await runner.setup()
+    await web.TCPSite(runner, host, port).start()
+    logging.info(f"LLM stand-in listening on http://{host}:{port}/v1")
+    return runner
+
+
+def add_options_arguments(parser):
+    """
+    Adds the latency and fault options of the stand-in to an argument parser.
+    """
+    parser.add_argument("--answers", nargs="+", default=DEFAULT_ANSWERS, help="Conversation files (glob patterns) with the labelled replies")
+    parser.add_argument("--first-token-ms", type=float, default=300.0, help="Delay before the first chunk")
+    parser.add_argument("--token-ms", type=float, default=10.0, help="Interval between chunks")
+    parser.add_argument("--jitter-ms", type=float, default=0.0, help="Uniform jitter added to every delay")
+    parser.add_argument("--chunk-chars", type=int, default=4, help="Characters per streamed chunk")
+    parser.add_argument("--wrong-rate", type=float, default=0.0, help="Share of replies with a wrong stiffness matrix")
+    parser.add_argument("--malformed-rate", type=float, default=0.0, help="Share of replies with a malformed JSON block")
+    parser.add_argument("--seed", type=int, default=None, help="Seed of the jitter and faults")
+
+
+def options_from_arguments(args):
+    return StandInOptions(
+        first_token_ms=args.first_token_ms,
+        token_ms=args.token_ms,
+        jitter_ms=args.jitter_ms,
+        chunk_chars=args.chunk_chars,
+        wrong_rate=args.wrong_rate,
+        malformed_rate=args.malformed_rate,
+        seed=args.seed,
+    )
+
+
+async def main(args):
+    await start(args.host, args.port, load_answers(args.answers), options_from_arguments(args))
+    while True:
+        await asyncio.sleep(3600)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Serve an OpenAI-compatible chat completions stand-in.")
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=8010)
+    add_options_arguments(parser)
+    asyncio.run(main(parser.parse_args()))
@@ -2,11 +2,17 @@ import os
 from dotenv import load_dotenv, find_dotenv
 import logging
 import sys
-from fastapi import FastAPI
+from pathlib import Path
+from fastapi import FastAPI, HTTPException
 from fastapi.staticfiles import StaticFiles
-from fastapi.responses import HTMLResponse
+from fastapi.responses import HTMLResponse, FileResponse
 from fastapi.middleware.cors import CORSMiddleware
 
+# Ensure `functions/` is discoverable
+sys.path.append(str(Path(__file__).resolve().parent / "functions"))
+
+from functions.stiffness_store_processor import StiffnessStoreProcessor
+
 # Load environment variables from .env file if not already set
 dotenv_path = find_dotenv()
 if dotenv_path:
@@ -48,8 +54,44 @@ app.add_middleware(
 logging.info("CORS middleware successfully added.")
 
 
-# Mount static directories for matrices and ellipsoids
-app.mount("/matrices", StaticFiles(directory="matrices"), name="matrices")
+# Stiffness commands recorded by the backend, opened read-only once the backend has created the store
+stiffness_store = None
+
+
+def get_stiffness_store():
+    global stiffness_store
+    if stiffness_store is None and os.path.exists(StiffnessStoreProcessor.DB_FILE):
+        stiffness_store = StiffnessStoreProcessor(read_only=True)
+    return stiffness_store
+
+
+# Matrix URLs resolve through the stiffness command store; older matrix files are still served from disk
+@app.get("/matrices/{filename}")
+def get_matrix(filename: str):
+    """
+    Returns the camera-frame stiffness matrix of a recorded command, or a legacy matrix file.
+    """
+    if not filename.endswith(".json"):
+        raise HTTPException(status_code=404, detail="Not Found")
+
+    file_path = os.path.join("matrices", filename)
+    if os.path.isfile(file_path):
+        return FileResponse(file_path, media_type="application/json")
+
+    store = get_stiffness_store()
+    command = store.get(filename[:-len(".json")]) if store is not None else None
+    if command is None:
+        raise HTTPException(status_code=404, detail="Not Found")
+    return command["matrix"]
+
+
+@app.on_event("shutdown")
+def close_stiffness_store():
+    if stiffness_store is not None:
+        stiffness_store.close()
+
+
+# Mount the static directory for ellipsoids
 app.mount("/ellipsoids", StaticFiles(directory="ellipsoids"), name="ellipsoids")
 
 # Root endpoint for local server
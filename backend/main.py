@@ -1,16 +1,21 @@
 import os
 import sys
-import aiohttp
+import math
+import time
+import asyncio
 import logging
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
 from typing import List
 from dotenv import load_dotenv, find_dotenv
 from uuid import uuid4
-from fastapi import FastAPI, File, UploadFile, HTTPException, Form
-from fastapi.responses import StreamingResponse
+from fastapi import FastAPI, File, UploadFile, HTTPException, Form, Request, WebSocket, WebSocketDisconnect
+from fastapi.responses import StreamingResponse, Response
 from fastapi.responses import HTMLResponse
+from starlette.background import BackgroundTask
 from fastapi.middleware.cors import CORSMiddleware
 from typing import Optional
-import time
 
 
 from pathlib import Path
@@ -20,11 +25,22 @@ sys.path.append(str(Path(__file__).resolve().parent / "functions"))
 
 # Import necessary modules
 from functions.speech_processor import SpeechProcessor
-from functions.conversation_history_processor import ConversationHistoryProcessor
-from functions.stiffness_matrix_processor import StiffnessMatrixProcessor
+from functions.speech_stream_processor import SpeechStreamProcessor
+from functions.speech_engine_processor import SpeechEngineProcessor
+from functions.ellipsoid_renderer_processor import EllipsoidRendererProcessor
+from functions.ellipsoid_cache_processor import EllipsoidCacheProcessor
+from functions.response_stream_processor import ResponseStreamProcessor
+from functions.audio_cache_processor import AudioCacheProcessor
+from functions.response_cache_processor import ResponseCacheProcessor
+from functions.stiffness_matrix_processor import StiffnessMatrixProcessor, StiffnessMatrixStreamParser
+from functions.stiffness_batch_processor import StiffnessBatchProcessor
+from functions.stiffness_store_processor import StiffnessStoreProcessor
 from functions.image_processor import ImageProcessor
-from functions.webhook_processor import WebhookProcessor
+from functions.pre_knowledge_image_processor import PreKnowledgeImageProcessor
 from functions.eye_tracker_processor import EyeTrackerProcessor
+from functions.http_client_processor import HttpClientProcessor
+from functions.session_processor import SessionProcessor
+from functions.role_registry_processor import RoleRegistryProcessor
 
 # Environment variables
 from decouple import config, RepositoryEnv
@@ -41,6 +57,29 @@ try:
     # Other variables
     ENVIRONMENT = config("ENVIRONMENT", default="local")  # Default to local environment
     LOG_LEVEL = config("LOG_LEVEL", default="INFO")  # Logging level
+    BLOCKING_WORKERS = config("BLOCKING_WORKERS", default=4, cast=int)  # Threads for CPU-bound/blocking stages
+    STT_WORKERS = config("STT_WORKERS", default=2, cast=int)  # Speech-to-text worker processes (0 = in-process)
+    ELLIPSOID_WORKERS = config("ELLIPSOID_WORKERS", default=1, cast=int)  # Ellipsoid rendering worker processes (0 = in a thread)
+    ELLIPSOID_CACHE_MAX_ENTRIES = config("ELLIPSOID_CACHE_MAX_ENTRIES", default=256, cast=int)  # Ellipsoid plots kept per distinct matrix (0 = one file per request)
+    TTS_CACHE_MAX_MB = config("TTS_CACHE_MAX_MB", default=100, cast=int)  # Size cap of the TTS audio cache
+    TTS_BACKEND = config("TTS_BACKEND", default="openai")  # "openai" or "local" (espeak)
+    TTS_LATENCY_BUDGET = config("TTS_LATENCY_BUDGET", default=0, cast=float)  # Seconds before falling back to local TTS (0 = never)
+    TTS_LOCAL_MAX_CHARS = config("TTS_LOCAL_MAX_CHARS", default=0, cast=int)  # Texts up to this length are spoken locally
+    IMAGE_DELIVERY = config("IMAGE_DELIVERY", default="inline")  # "inline" (data URLs from images/) or "public" (ngrok URL)
+    HTTP_CONNECT_TIMEOUT = config("HTTP_CONNECT_TIMEOUT", default=2.0, cast=float)  # Seconds to connect to Sigma7/eye tracker/webhooks
+    HTTP_READ_TIMEOUT = config("HTTP_READ_TIMEOUT", default=10.0, cast=float)  # Seconds to wait for their responses
+    HTTP_POOL_PER_HOST = config("HTTP_POOL_PER_HOST", default=8, cast=int)  # Keep-alive connections per upstream
+    STIFFNESS_RAMP_SECONDS = config("STIFFNESS_RAMP_SECONDS", default=0, cast=float)  # Duration of stiffness transitions (0 = switch instantly)
+    STIFFNESS_RAMP_RATE_HZ = config("STIFFNESS_RAMP_RATE_HZ", default=200, cast=float)  # Rate at which transition samples are sent
+    STIFFNESS_STORE_RETENTION_DAYS = config("STIFFNESS_STORE_RETENTION_DAYS", default=30, cast=float)  # Days stiffness commands are kept (0 = forever)
+    STIFFNESS_STORE_MAX_COMMANDS = config("STIFFNESS_STORE_MAX_COMMANDS", default=100000, cast=int)  # Stiffness commands kept, oldest deleted first (0 = no cap)
+    PROMPT_TOKEN_BUDGET = config("PROMPT_TOKEN_BUDGET", default=24000, cast=int)  # Estimated prompt size above which old conversation is trimmed
+    PRE_KNOWLEDGE_DETAIL = config("PRE_KNOWLEDGE_DETAIL", default="auto")  # Vision detail of mirrored pre-knowledge images: auto, low or high
+    RESPONSE_CACHE_TTL = config("RESPONSE_CACHE_TTL", default=3600, cast=float)  # Seconds a cached LLM response stays valid
+    RESPONSE_CACHE_MAX_ENTRIES = config("RESPONSE_CACHE_MAX_ENTRIES", default=256, cast=int)  # Cached LLM responses (0 = disabled)
+    ROLES_FILE = config("ROLES_FILE", default="experiment_data/system_roles/roles.yaml")  # System roles, reloaded when the file changes
+    DEFAULT_ROLE = config("DEFAULT_ROLE", default=RoleRegistryProcessor.BUILTIN_ROLE)  # Role of requests that select none (the built-in prompt by default)
+    SESSION_IDLE_SECONDS = config("SESSION_IDLE_SECONDS", default=3600, cast=float)  # Idle time after which an operator session is evicted
 
 except KeyError as e:
     logging.error(f"Environment variable {e.args[0]} is not set.")
@@ -69,43 +108,209 @@ logging.info(f"Sigma7 Server URL: {SIGMA_SERVER_URL}")
 
 
 class TeleimpedanceBackend:
-    def __init__(self, environment: str, base_url: str, frontend_port: str, eye_tracker_url: str, sigma_server_url: str, log_level: str):
+    # Retries of the GPT call before any response text was produced
+    MAX_RETRIES = 3
+    RETRY_DELAY = 2  # seconds
+    # Sentences synthesized in parallel per streamed response
+    TTS_CONCURRENCY = 3
+    # Results of streamed responses kept for the follow-up request, and how long it may wait
+    STREAM_RESULTS_KEPT = 100
+    STREAM_RESULT_TIMEOUT = 120  # seconds
+
+    def __init__(self, environment: str, base_url: str, frontend_port: str, eye_tracker_url: str, sigma_server_url: str, log_level: str, blocking_workers: int = 4, stt_workers: int = 2, ellipsoid_workers: int = 1, ellipsoid_cache_max_entries: int = 256, tts_cache_max_mb: int = 100, tts_backend: str = "openai", tts_latency_budget: float = 0, tts_local_max_chars: int = 0, response_cache_ttl: float = 3600, response_cache_max_entries: int = 256, image_delivery: str = "inline", http_connect_timeout: float = 2.0, http_read_timeout: float = 10.0, http_pool_per_host: int = 8, stiffness_ramp_seconds: float = 0, stiffness_ramp_rate_hz: float = 200, stiffness_store_retention_days: float = 30, stiffness_store_max_commands: int = 100000, prompt_token_budget: int = 24000, pre_knowledge_detail: str = "auto", session_idle_seconds: float = 3600, roles_file: str = RoleRegistryProcessor.ROLES_FILE, default_role: str = RoleRegistryProcessor.BUILTIN_ROLE):
         """
         Initializes the backend with the specified environment and base URL.
 
         :param environment: The environment to use ("local", "public", etc.).
         :param base_url: The base URL for image and matrix services.
         :param config_path: Path to an optional JSON configuration file.
+        :param blocking_workers: Size of the thread pool that runs blocking stages (STT, plotting, file IO).
+        :param stt_workers: Number of speech-to-text worker processes, 0 to transcribe in-process.
+        :param ellipsoid_workers: Number of ellipsoid rendering worker processes, 0 to render in the blocking executor.
+        :param ellipsoid_cache_max_entries: Number of ellipsoid plots reused by matrix content, 0 to render every request.
+        :param tts_cache_max_mb: Size cap of the on-disk cache of synthesized speech.
+        :param tts_backend: Text-to-speech backend, "openai" or "local".
+        :param tts_latency_budget: Seconds to wait for remote TTS before speaking locally, 0 to never fall back.
+        :param tts_local_max_chars: Texts up to this length are always spoken by the local backend.
+        :param response_cache_ttl: Seconds a cached LLM response stays valid.
+        :param response_cache_max_entries: Number of cached LLM responses, 0 to disable the cache.
+        :param image_delivery: "inline" to send images from images/ as data URLs, "public" to send the public ngrok URL.
+        :param http_connect_timeout: Connect timeout of outbound requests to Sigma7, the eye tracker and webhooks.
+        :param http_read_timeout: Read timeout of those requests.
+        :param http_pool_per_host: Keep-alive connections kept per upstream.
+        :param stiffness_ramp_seconds: Duration of the interpolated transition to a new stiffness matrix, 0 to switch instantly.
+        :param stiffness_ramp_rate_hz: Rate at which transition samples are sent to the webhooks.
+        :param stiffness_store_retention_days: Days a stiffness command stays in the command store, 0 to keep it forever.
+        :param stiffness_store_max_commands: Number of stiffness commands kept, 0 for no cap.
+        :param prompt_token_budget: Estimated prompt size in tokens above which the oldest conversation is trimmed.
+        :param pre_knowledge_detail: Vision detail of the mirrored pre-knowledge images, "auto" to follow the mirror's manifest.
+        :param session_idle_seconds: Idle time after which an operator session is evicted from memory.
+        :param roles_file: YAML file of the system roles a request can select.
+        :param default_role: Role of requests that do not select one.
         """
 
         self.log_level = log_level.upper()
         self.environment = environment
         self.base_url = base_url
         self.origins = f"http://localhost:{frontend_port}"
+        if image_delivery not in ("inline", "public"):
+            raise ValueError(f"Unknown image delivery mode: {image_delivery}")
+        self.image_delivery = image_delivery
 
         self.eye_tracker_url = eye_tracker_url
         self.sigma_server_url = sigma_server_url  # Added this line
 
+        # Bounded executor so blocking stages never run on the event loop
+        self.executor = ThreadPoolExecutor(max_workers=blocking_workers, thread_name_prefix="blocking")
+
         # Initialize FastAPI app
         self.app = FastAPI()
+        self.app.on_event("startup")(self.startup)
+        self.app.on_event("shutdown")(self.shutdown)
 
         # Set up CORS
         self.setup_cors()
 
         # Initialize processors
-        self.speech_processor = SpeechProcessor()
-        self.conversation_history_processor = ConversationHistoryProcessor()
-        self.stiffness_matrix_processor = StiffnessMatrixProcessor(use_public_urls=False, local_static_server_port=LOCAL_STATIC_SERVER_PORT)
+        self.http_client = HttpClientProcessor(
+            connect_timeout=http_connect_timeout,
+            read_timeout=http_read_timeout,
+            limit_per_host=http_pool_per_host,
+        )
         self.image_processor = ImageProcessor()
-        self.webhook_processor = WebhookProcessor()
-        # Add this line so that self.webhook_urls references the same list:
-        self.webhook_urls = self.webhook_processor.webhook_urls
-        self.eye_tracker_processor = EyeTrackerProcessor(eye_tracker_url=eye_tracker_url)
+        self.pre_knowledge_images = PreKnowledgeImageProcessor(detail=pre_knowledge_detail)
+        # System roles with their compiled prompt prefixes, selected by the x-role header or role field
+        self.roles = RoleRegistryProcessor(
+            roles_file=roles_file,
+            default_role=default_role,
+            token_budget=prompt_token_budget,
+            image_resolver=self.resolve_prompt_image if image_delivery == "inline" else None,
+            pre_knowledge_images=self.pre_knowledge_images,
+        )
+        # Per-operator conversation history, webhooks and stiffness, selected by the x-session-id header
+        self.sessions = SessionProcessor(
+            self.http_client,
+            self.roles,
+            idle_timeout=session_idle_seconds,
+            stiffness_ramp_seconds=stiffness_ramp_seconds,
+            stiffness_ramp_rate_hz=stiffness_ramp_rate_hz,
+        )
+        self.audio_cache = AudioCacheProcessor(max_bytes=tts_cache_max_mb * 1024 * 1024)
+        self.speech_processor = SpeechProcessor(
+            audio_cache=self.audio_cache,
+            tts_backend=tts_backend,
+            tts_latency_budget=tts_latency_budget or None,
+            tts_local_max_chars=tts_local_max_chars,
+            image_resolver=self.inline_image_url if image_delivery == "inline" else None,
+            conversation_history_processor=self.sessions.default.conversation_history(self.roles.get()),
+            prompt_token_budget=prompt_token_budget,
+            pre_knowledge_images=self.pre_knowledge_images,
+            http_client=self.http_client,
+        )
+        self.speech_engine = SpeechEngineProcessor(SpeechProcessor.VOSK_MODEL_PATH, workers=stt_workers) if stt_workers > 0 else None
+        # Every dispatched stiffness command, queryable by time and session; matrix URLs resolve through it
+        self.stiffness_store = StiffnessStoreProcessor(
+            retention_days=stiffness_store_retention_days,
+            max_commands=stiffness_store_max_commands,
+        )
+        self.stiffness_matrix_processor = StiffnessMatrixProcessor(
+            use_public_urls=False,
+            local_static_server_port=LOCAL_STATIC_SERVER_PORT,
+            command_store=self.stiffness_store,
+        )
+        self.ellipsoid_renderer = EllipsoidRendererProcessor(
+            self.stiffness_matrix_processor.ellipsoids_dir,
+            self.stiffness_matrix_processor.ellipsoids_base_url,
+            workers=ellipsoid_workers,
+        ) if ellipsoid_workers > 0 else None
+        self.ellipsoid_cache = EllipsoidCacheProcessor(
+            self.stiffness_matrix_processor.ellipsoids_dir,
+            self.stiffness_matrix_processor.ellipsoids_base_url,
+            max_entries=ellipsoid_cache_max_entries,
+        ) if ellipsoid_cache_max_entries > 0 else None
+        self.response_cache = ResponseCacheProcessor(
+            ttl_seconds=response_cache_ttl,
+            max_entries=response_cache_max_entries,
+            images_dir=self.image_processor.images_dir,
+        ) if response_cache_max_entries > 0 else None
+        # Results of /post_audio_stream responses, keyed by their x-response-id header
+        self.stream_results = OrderedDict()
+        self.eye_tracker_processor = EyeTrackerProcessor(eye_tracker_url=eye_tracker_url, http_client=self.http_client)
 
         # Set up routes
         self.setup_routes()
 
             
+    async def run_blocking(self, func, *args, **kwargs):
+        """
+        Runs a blocking function in the bounded executor and awaits its result.
+        """
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.executor, partial(func, *args, **kwargs))
+
+    async def inline_image_url(self, image_url):
+        """
+        Returns the image behind an image URL as a downsized inline data URL, or None if the
+        image is not in the local images directory.
+        """
+        return await self.run_blocking(self.image_processor.encode_image_data_url, image_url)
+
+    async def resolve_prompt_image(self, image_url):
+        """
+        Returns the URL under which an image of a role's prompt is sent to the LLM.
+        """
+        return await self.speech_processor.resolve_history_image(image_url)
+
+    def get_session(self, request: Request):
+        """
+        Returns the session of a request, from its x-session-id header or session_id cookie.
+        """
+        try:
+            session_id = SessionProcessor.session_id_from(request.headers, request.cookies)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        return self.sessions.get(session_id)
+
+    def get_role(self, request: Request, role: Optional[str] = None):
+        """
+        Returns the role selected by a request's role field or x-role header, or the default role.
+        """
+        name = role or request.headers.get("x-role")
+        try:
+            return self.roles.get(name)
+        except KeyError:
+            raise HTTPException(status_code=400, detail=f"Unknown role: {name}")
+
+    async def startup(self):
+        """
+        Starts the outbound HTTP client, the session eviction and the speech-to-text and ellipsoid worker pools, loads the Vosk model and applies the stiffness store's retention, when the application starts.
+        """
+        await self.http_client.start()
+        await self.run_blocking(self.stiffness_store.prune)
+        # Load the Vosk model now rather than on the first transcription
+        await self.run_blocking(self.speech_processor.load_model)
+        self.sessions.start()
+        # Open a connection to the haptic device now, so that the first command does not pay for it
+        asyncio.ensure_future(self.http_client.warm_up(self.sigma_server_url))
+        if self.speech_engine is not None:
+            await self.speech_engine.start()
+        if self.ellipsoid_renderer is not None:
+            await self.ellipsoid_renderer.start()
+
+    async def shutdown(self):
+        """
+        Releases the worker pools, the sessions' schedulers and webhook workers, the HTTP connections, the blocking executor and the stiffness store when the application stops.
+        """
+        if self.speech_engine is not None:
+            await self.speech_engine.stop()
+        if self.ellipsoid_renderer is not None:
+            await self.ellipsoid_renderer.stop()
+        await self.sessions.stop()
+        await self.http_client.close()
+        self.executor.shutdown(wait=False)
+        logging.info("Blocking executor shut down.")
+        self.stiffness_store.close()
+
     def setup_cors(self):
         """
         Sets up CORS middleware.
@@ -116,7 +321,7 @@ class TeleimpedanceBackend:
             allow_credentials=True,
             allow_methods=["*"],
             allow_headers=["*"],
-            expose_headers=["x-matrix-url", "x-ellipsoid-url"],
+            expose_headers=["x-matrix-url", "x-ellipsoid-url", "x-ellipsoid-geometry-url", "x-response-id", "x-session-id", "x-vertex-count", "x-triangle-count"],
         )
 
     def setup_routes(self):
@@ -130,6 +335,29 @@ class TeleimpedanceBackend:
         self.app.get("/list_webhooks")(self.list_webhooks)
         self.app.post("/upload_image")(self.upload_image)
         self.app.post("/post_audio")(self.post_audio)
+        self.app.post("/post_audio_stream")(self.post_audio_stream)
+        self.app.get("/post_audio_stream/{response_id}")(self.get_stream_result)
+        self.app.websocket("/ws/speech_to_text")(self.stream_speech_to_text)
+        self.app.get("/ellipsoid/geometry")(self.get_ellipsoid_geometry)
+        self.app.get("/ellipsoid/mesh")(self.get_ellipsoid_mesh)
+        self.app.post("/stiffness/batch")(self.analyze_stiffness_batch)
+        self.app.post("/stiffness/batch/trial")(self.analyze_stiffness_trial)
+        self.app.get("/stiffness/commands")(self.get_stiffness_commands)
+        self.app.get("/stiffness/commands/at")(self.get_stiffness_command_at)
+        self.app.get("/stiffness/commands/{command_id}")(self.get_stiffness_command)
+        self.app.get("/stats/speech_engine")(self.speech_engine_stats)
+        self.app.get("/stats/ellipsoid_renderer")(self.ellipsoid_renderer_stats)
+        self.app.get("/stats/ellipsoid_cache")(self.ellipsoid_cache_stats)
+        self.app.get("/stats/stiffness_store")(self.stiffness_store_stats)
+        self.app.get("/stats/tts_cache")(self.tts_cache_stats)
+        self.app.get("/stats/tts")(self.tts_stats)
+        self.app.get("/stats/response_cache")(self.response_cache_stats)
+        self.app.get("/stats/http")(self.http_stats)
+        self.app.get("/stats/webhooks")(self.webhook_stats)
+        self.app.get("/stats/stiffness_scheduler")(self.stiffness_scheduler_stats)
+        self.app.get("/stats/prompt")(self.prompt_stats)
+        self.app.get("/stats/sessions")(self.session_stats)
+        self.app.get("/roles")(self.list_roles)
         self.app.get("/calibrate")(self.calibrate)
         self.app.get("/capture_snapshot")(self.capture_snapshot)
         self.app.get("/sigma/start")(self.start_sigma)
@@ -156,39 +384,44 @@ class TeleimpedanceBackend:
 
         return HTMLResponse(content=html_content)
 
-    async def reset(self):
+    async def reset(self, request: Request, role: Optional[str] = None):
         """
-        Resets the conversation history.
+        Resets the conversation history of the session under the selected role.
         """
-        return self.conversation_history_processor.reset_conversation_history()
+        session = self.get_session(request)
+        return session.conversation_history(self.get_role(request, role)).reset_conversation_history()
 
-    async def register_webhook(self, webhook_url: str):
+    async def register_webhook(self, webhook_url: str, request: Request):
         """
-        Registers a webhook URL.
+        Registers a webhook URL for the session.
         """
+        session = self.get_session(request)
         try:
-            message = self.webhook_processor.register_webhook(webhook_url)
+            message = session.webhook_processor.register_webhook(webhook_url)
             return {"message": message}
+        except HTTPException:
+            raise
         except Exception as e:
             logging.error(f"Error registering webhook: {str(e)}")
             raise HTTPException(status_code=500, detail=str(e))
 
-    async def unregister_webhook(self, webhook_url: str):
+    async def unregister_webhook(self, webhook_url: str, request: Request):
         """
-        Unregisters a webhook URL.
+        Unregisters a webhook URL of the session.
         """
+        session = self.get_session(request)
         try:
-            message = self.webhook_processor.unregister_webhook(webhook_url)
+            message = session.webhook_processor.unregister_webhook(webhook_url)
             return {"message": message}
         except Exception as e:
             logging.error(f"Error unregistering webhook: {str(e)}")
             raise HTTPException(status_code=500, detail=str(e))
 
-    async def list_webhooks(self):
+    async def list_webhooks(self, request: Request):
         """
-        Lists all currently registered webhook URLs.
+        Lists all webhook URLs currently registered for the session.
         """
-        webhooks = self.webhook_processor.list_webhooks()
+        webhooks = self.get_session(request).webhook_processor.list_webhooks()
         return {"registered_webhooks": webhooks}
 
     async def upload_image(self, file: UploadFile):
@@ -218,13 +451,12 @@ class TeleimpedanceBackend:
         Sends a start command to the Sigma7 server.
         """
         try:
-            async with aiohttp.ClientSession() as session:
-                async with session.post(f"{self.sigma_server_url}/control", data="start") as resp:
-                    if resp.status == 200:
-                        return {"message": "Sigma7 started successfully."}
-                    else:
-                        text = await resp.text()
-                        raise HTTPException(status_code=resp.status, detail=text)
+            async with self.http_client.request("POST", f"{self.sigma_server_url}/control", data="start", use_breaker=False) as resp:
+                if resp.status == 200:
+                    return {"message": "Sigma7 started successfully."}
+                else:
+                    text = await resp.text()
+                    raise HTTPException(status_code=resp.status, detail=text)
         except Exception as e:
             logging.error(f"Error starting Sigma7: {str(e)}")
             raise HTTPException(status_code=500, detail=str(e))
@@ -234,13 +466,12 @@ class TeleimpedanceBackend:
         Sends a stop command to the Sigma7 server.
         """
         try:
-            async with aiohttp.ClientSession() as session:
-                async with session.post(f"{self.sigma_server_url}/control", data="stop") as resp:
-                    if resp.status == 200:
-                        return {"message": "Sigma7 stopped successfully."}
-                    else:
-                        text = await resp.text()
-                        raise HTTPException(status_code=resp.status, detail=text)
+            async with self.http_client.request("POST", f"{self.sigma_server_url}/control", data="stop", use_breaker=False) as resp:
+                if resp.status == 200:
+                    return {"message": "Sigma7 stopped successfully."}
+                else:
+                    text = await resp.text()
+                    raise HTTPException(status_code=resp.status, detail=text)
         except Exception as e:
             logging.error(f"Error stopping Sigma7: {str(e)}")
             raise HTTPException(status_code=500, detail=str(e))
@@ -250,13 +481,12 @@ class TeleimpedanceBackend:
         Sends a set_zero command to the Sigma7 server.
         """
         try:
-            async with aiohttp.ClientSession() as session:
-                async with session.post(f"{self.sigma_server_url}/control", data="set_zero") as resp:
-                    if resp.status == 200:
-                        return {"message": "Sigma7 zero position set successfully."}
-                    else:
-                        text = await resp.text()
-                        raise HTTPException(status_code=resp.status, detail=text)
+            async with self.http_client.request("POST", f"{self.sigma_server_url}/control", data="set_zero", use_breaker=False) as resp:
+                if resp.status == 200:
+                    return {"message": "Sigma7 zero position set successfully."}
+                else:
+                    text = await resp.text()
+                    raise HTTPException(status_code=resp.status, detail=text)
         except Exception as e:
             logging.error(f"Error setting zero position on Sigma7: {str(e)}")
             raise HTTPException(status_code=500, detail=str(e))
@@ -266,13 +496,12 @@ class TeleimpedanceBackend:
         Sends a request to autoinit the Sigma7 server.
         """
         try:
-            async with aiohttp.ClientSession() as session:
-                async with session.get(f"{self.sigma_server_url}/autoinit") as resp:
-                    if resp.status == 200:
-                        return {"message": "Sigma7 autoinit completed successfully."}
-                    else:
-                        text = await resp.text()
-                        raise HTTPException(status_code=resp.status, detail=text)
+            async with self.http_client.request("GET", f"{self.sigma_server_url}/autoinit", use_breaker=False, read_timeout=self.http_client.LONG_READ_TIMEOUT) as resp:
+                if resp.status == 200:
+                    return {"message": "Sigma7 autoinit completed successfully."}
+                else:
+                    text = await resp.text()
+                    raise HTTPException(status_code=resp.status, detail=text)
         except Exception as e:
             logging.error(f"Error running autoinit on Sigma7: {str(e)}")
             raise HTTPException(status_code=500, detail=str(e))
@@ -282,97 +511,491 @@ class TeleimpedanceBackend:
         Sends an initialize command to the Sigma7 server.
         """
         try:
-            async with aiohttp.ClientSession() as session:
-                async with session.post(f"{self.sigma_server_url}/control", data="initialize") as resp:
-                    if resp.status == 200:
-                        return {"message": "Sigma7 initialized successfully."}
-                    else:
-                        text = await resp.text()
-                        raise HTTPException(status_code=resp.status, detail=text)
+            async with self.http_client.request("POST", f"{self.sigma_server_url}/control", data="initialize", use_breaker=False, read_timeout=self.http_client.LONG_READ_TIMEOUT) as resp:
+                if resp.status == 200:
+                    return {"message": "Sigma7 initialized successfully."}
+                else:
+                    text = await resp.text()
+                    raise HTTPException(status_code=resp.status, detail=text)
         except Exception as e:
             logging.error(f"Error initializing Sigma7: {type(e).__name__}: {str(e)}")
             raise HTTPException(status_code=500, detail=str(e))
 
-    async def post_audio(self, file: UploadFile, image_url: Optional[str] = Form(None)):
+    async def speech_engine_stats(self):
         """
-        Processes uploaded audio and generates a response.
+        Returns queue depth and per-job latency statistics of the speech-to-text worker pool.
+        """
+        if self.speech_engine is None:
+            return {"enabled": False}
+        return {"enabled": True, **self.speech_engine.get_stats()}
+
+    async def ellipsoid_renderer_stats(self):
+        """
+        Returns queue depth and per-render latency statistics of the ellipsoid worker pool.
+        """
+        if self.ellipsoid_renderer is None:
+            return {"enabled": False}
+        return {"enabled": True, **self.ellipsoid_renderer.get_stats()}
+
+    async def ellipsoid_cache_stats(self):
+        """
+        Returns the size, hit rate and evictions of the ellipsoid plot cache.
+        """
+        if self.ellipsoid_cache is None:
+            return {"enabled": False}
+        return {"enabled": True, **self.ellipsoid_cache.get_stats()}
+
+    async def stiffness_store_stats(self):
+        """
+        Returns the number, time span and retention of the recorded stiffness commands.
+        """
+        return await self.run_blocking(self.stiffness_store.get_stats)
+
+    async def tts_cache_stats(self):
+        """
+        Returns the size and hit rate of the text-to-speech audio cache.
+        """
+        return self.audio_cache.get_stats()
+
+    async def tts_stats(self):
+        """
+        Returns the selected text-to-speech backend, per-backend latencies and fallback count.
         """
-        MAX_RETRIES = 3
-        RETRY_DELAY = 2  # seconds
+        return self.speech_processor.tts_engine.get_stats()
 
-        converted_audio_file_path = None
+    async def prompt_stats(self, request: Request, role: Optional[str] = None):
+        """
+        Returns the prompt prefix size, token budget and the size of the last prompt of the selected role.
+        """
+        return self.get_role(request, role).prompt_processor.get_stats()
+
+    @staticmethod
+    def parse_matrix_query(matrix: str):
+        """
+        Parses a stiffness matrix given as nine comma-separated values in row-major order.
+        """
         try:
-            # Log received data for debugging
-            logging.info(f"Received audio file: {file.filename}, Content-Type: {file.content_type}")
-            logging.info(f"Received image URL: {image_url}")
+            values = [float(value) for value in matrix.split(",")]
+        except ValueError:
+            raise HTTPException(status_code=400, detail="The matrix must be comma-separated numbers")
+        if len(values) != 9:
+            raise HTTPException(status_code=400, detail=f"Expected 9 matrix values, found {len(values)}")
+        # float() accepts nan and inf, which would slip through the positive-definite check
+        if not all(math.isfinite(value) for value in values):
+            raise HTTPException(status_code=400, detail="The matrix values must be finite")
+        return [values[0:3], values[3:6], values[6:9]]
 
-            # Convert audio format
-            converted_audio_file_path = await self.speech_processor.convert_audio_format(file)
+    @staticmethod
+    def format_matrix_query(stiffness_matrix):
+        return ",".join(f"{float(value):g}" for row in stiffness_matrix for value in row)
 
-            # Convert local image url to public image url
-            if image_url:
-                image_url = self.speech_processor.convert_local_image_url_to_public(image_url)
+    async def get_ellipsoid_geometry(self, matrix: str):
+        """
+        Returns the principal stiffnesses and directions of a stiffness matrix, from which the
+        frontend draws the ellipsoid instead of loading the rendered plot.
+        """
+        stiffness_matrix = self.parse_matrix_query(matrix)
+        try:
+            return self.stiffness_matrix_processor.ellipsoid_geometry(stiffness_matrix)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
 
-            # Transcribe audio
-            transcript = self.speech_processor.speech_to_text(converted_audio_file_path)
-            if transcript is None:
-                raise HTTPException(status_code=500, detail="Error decoding audio")
+    async def get_ellipsoid_mesh(self, matrix: str, lod: int = 2):
+        """
+        Returns a triangle mesh of the ellipsoid of a stiffness matrix as a binary buffer: the
+        float32 vertex positions (x, y, z) followed by the uint16 triangle indices, little-endian.
+        """
+        stiffness_matrix = self.parse_matrix_query(matrix)
+        try:
+            vertices, triangles = self.stiffness_matrix_processor.ellipsoid_mesh(stiffness_matrix, lod)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        return Response(
+            content=vertices.astype("<f4").tobytes() + triangles.astype("<u2").tobytes(),
+            media_type="application/octet-stream",
+            headers={
+                "x-vertex-count": str(len(vertices)),
+                "x-triangle-count": str(len(triangles)),
+                "Cache-Control": "public, max-age=86400",
+            },
+        )
 
-            # Retry logic for OpenAI image access
-            response = None
-            for attempt in range(1, MAX_RETRIES + 1):
-                try:
-                    if image_url:
-                        response = self.speech_processor.get_gpt_response_vlm(transcript, image_url)
-                    else:
-                        response = self.speech_processor.get_gpt_response_vlm(transcript)
+    def stiffness_batch_report(self, matrices, frame, details, sample_rate_hz=None):
+        """
+        Analyses a batch of stiffness matrices and builds the response of the batch endpoints.
+        """
+        analysis = StiffnessBatchProcessor.analyze(matrices, rotate_to_ee=(frame == "camera"))
+        report = {"frame": "ee", "summary": StiffnessBatchProcessor.summarize(analysis, sample_rate_hz)}
+        if details:
+            report.update(StiffnessBatchProcessor.to_json(analysis))
+        return report
 
-                    if response:
-                        break  # If successful, exit retry loop
+    async def analyze_stiffness_batch(self, request: Request, frame: str = "camera", details: bool = True):
+        """
+        Validates N stiffness matrices and returns their end-effector-frame matrices, principal
+        axes and anisotropy in one vectorized pass.
 
-                except Exception as e:
-                    logging.warning(f"[Attempt {attempt}/{MAX_RETRIES}] OpenAI API error: {e}")
-                    
-                    if attempt < MAX_RETRIES:
-                        wait_time = RETRY_DELAY * (2 ** (attempt - 1))
-                        logging.info(f"Retrying in {wait_time} seconds...")
-                        time.sleep(wait_time)
-                    else:
-                        logging.error("Max retries reached. Proceeding without image.")
-
-            if response is None:
-                raise HTTPException(status_code=500, detail="Failed to get a valid response from GPT")
-
-            # Process stiffness matrix
-            result = self.stiffness_matrix_processor.extract_stiffness_matrix_2(response)
-            stiffness_matrix, matrix_file_url, ellipsoid_plot_url = None, None, None
-
-            if result is not None:
-                stiffness_matrix, matrix_file_url = result
-                if stiffness_matrix and len(stiffness_matrix) == 3 and all(len(row) == 3 for row in stiffness_matrix):
-                    stiffness_matrix_ee = self.stiffness_matrix_processor.rotate_stiffness_camera_to_ee(stiffness_matrix)
-                    logging.info(f"Stiffness matrix to send (transformed camera to ee): {stiffness_matrix_ee}")
-                    
-                    # Notify webhooks
-                    async with aiohttp.ClientSession() as session:
-                        for webhook_url in self.webhook_urls:
-                            try:
-                                await session.post(webhook_url, json=stiffness_matrix_ee)
-                            except Exception as e:
-                                logging.error(f"Failed to notify webhook {webhook_url}: {str(e)}")
-
-                    ellipsoid_plot_url = self.stiffness_matrix_processor.generate_ellipsoid_plot(stiffness_matrix)
-                else:
-                    logging.info("No valid stiffness matrix found. Skipping rotation and webhook notification.")
+        The JSON body holds "matrices": a list of 3x3 matrices or of rows of 9 row-major values.
+        Camera-frame matrices (frame=camera, as produced by the LLM) are rotated to the
+        end-effector frame first; frame=ee takes them as they are.
+        """
+        if frame not in ("camera", "ee"):
+            raise HTTPException(status_code=400, detail=f"Unknown frame: {frame}")
+        try:
+            body = await request.json()
+            matrices = body["matrices"]
+        except (ValueError, KeyError, TypeError):
+            raise HTTPException(status_code=400, detail='The body must be a JSON object with "matrices"')
+        try:
+            return await self.run_blocking(self.stiffness_batch_report, matrices, frame, details)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+
+    async def analyze_stiffness_trial(self, file: UploadFile = File(...), frame: str = "ee", details: bool = False):
+        """
+        Analyses the stiffness matrices of an uploaded HRI trial log (columns 9-17 of every
+        200 Hz row), reporting when the commanded stiffness changed.
+        """
+        if frame not in ("camera", "ee"):
+            raise HTTPException(status_code=400, detail=f"Unknown frame: {frame}")
+        try:
+            matrices = await self.run_blocking(StiffnessBatchProcessor.load_trial, file.file)
+            return await self.run_blocking(self.stiffness_batch_report, matrices, frame, details, StiffnessBatchProcessor.TRIAL_SAMPLE_RATE_HZ)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=f"Invalid trial log: {e}")
+
+    async def get_stiffness_commands(self, since: Optional[float] = None, until: Optional[float] = None, session: Optional[str] = None, limit: int = 100):
+        """
+        Returns recorded stiffness commands. With since and/or until (Unix times) the commands
+        sent in [since, until) are returned oldest first; otherwise the last `limit` commands,
+        newest first. session restricts them to one x-session-id.
+        """
+        if limit < 1:
+            raise HTTPException(status_code=400, detail="limit must be positive")
+        if since is None and until is None:
+            commands = await self.run_blocking(self.stiffness_store.latest, limit, session)
+        else:
+            commands = await self.run_blocking(self.stiffness_store.between, since, until, session, limit)
+        return {"count": len(commands), "commands": commands}
+
+    async def get_stiffness_command_at(self, t: float, session: Optional[str] = None):
+        """
+        Returns the stiffness command in force at Unix time t: the last one sent at or before it.
+        """
+        command = await self.run_blocking(self.stiffness_store.at, t, session)
+        if command is None:
+            raise HTTPException(status_code=404, detail="No stiffness command before this time")
+        return command
+
+    async def get_stiffness_command(self, command_id: str):
+        """
+        Returns a recorded stiffness command by the id in its matrix URL.
+        """
+        command = await self.run_blocking(self.stiffness_store.get, command_id)
+        if command is None:
+            raise HTTPException(status_code=404, detail="Unknown stiffness command")
+        return command
+
+    async def list_roles(self):
+        """
+        Returns the defined roles, the default role and when the roles were last reloaded.
+        """
+        return self.roles.get_stats()
+
+    async def stiffness_scheduler_stats(self, request: Request):
+        """
+        Returns the commanded stiffness and the transition counters of the session's stiffness scheduler.
+        """
+        stiffness_scheduler = self.get_session(request).stiffness_scheduler
+        if stiffness_scheduler is None:
+            return {"enabled": False}
+        return {"enabled": True, **stiffness_scheduler.get_stats()}
+
+    async def webhook_stats(self, request: Request):
+        """
+        Returns per-target webhook delivery counters and latencies of the session.
+        """
+        return self.get_session(request).webhook_processor.get_stats()
+
+    async def session_stats(self):
+        """
+        Returns the active operator sessions and the number of idle sessions evicted.
+        """
+        return self.sessions.get_stats()
 
-            # Update conversation history
-            if image_url:
-                self.conversation_history_processor.update_conversation_history(transcript, response, image_url)
+    async def http_stats(self):
+        """
+        Returns the circuit breaker state and request counters of every outbound upstream.
+        """
+        return self.http_client.get_stats()
+
+    async def response_cache_stats(self):
+        """
+        Returns the size and hit rate of the LLM response cache.
+        """
+        if self.response_cache is None:
+            return {"enabled": False}
+        return {"enabled": True, **self.response_cache.get_stats()}
+
+    async def stream_speech_to_text(self, websocket: WebSocket, audio_format: str = "pcm", sample_rate: int = 16000):
+        """
+        Streams speech recognition over a WebSocket.
+
+        The client sends binary audio frames while the operator is talking and a text
+        message "end" at end-of-speech. The server answers with
+        {"type": "partial", "text": ...} updates and a final {"type": "final", "text": ...}.
+        The connection can be reused for the next utterance after each final transcript.
+        """
+        await websocket.accept()
+
+        async def send_partial(text):
+            await websocket.send_json({"type": "partial", "text": text})
+
+        try:
+            stream = SpeechStreamProcessor(
+                self.speech_processor.model,
+                on_partial=send_partial,
+                audio_format=audio_format,
+                sample_rate=sample_rate,
+                executor=self.executor,
+            )
+        except ValueError as e:
+            await websocket.send_json({"type": "error", "detail": str(e)})
+            await websocket.close(code=1003)
+            return
+
+        try:
+            await stream.start()
+            while True:
+                message = await websocket.receive()
+                if message["type"] == "websocket.disconnect":
+                    break
+                if message.get("bytes") is not None:
+                    await stream.feed(message["bytes"])
+                elif message.get("text") == "end":
+                    transcript = await stream.finish()
+                    await websocket.send_json({"type": "final", "text": transcript})
+                    await stream.start()
+        except WebSocketDisconnect:
+            pass
+        except Exception as e:
+            logging.error(f"Error in speech stream: {str(e)}")
+            await websocket.send_json({"type": "error", "detail": str(e)})
+        finally:
+            await stream.close()
+            logging.info("Speech stream closed.")
+
+    async def transcribe_request(self, file: Optional[UploadFile], transcript: Optional[str]):
+        """
+        Returns the transcript of a request, transcribing the uploaded audio unless the
+        transcript was already streamed.
+        """
+        if transcript is not None:
+            return transcript
+
+        # Keep the upload in memory; it is decoded by an ffmpeg pipe during transcription
+        audio_bytes = await file.read()
+        if self.speech_engine is not None:
+            transcript = await self.speech_engine.transcribe(audio_bytes)
+        else:
+            transcript = await self.run_blocking(self.speech_processor.speech_to_text_from_bytes, audio_bytes)
+        if transcript is None:
+            raise HTTPException(status_code=500, detail="Error decoding audio")
+        return transcript
+
+    async def stream_response_with_retries(self, session, role, transcript, image_url=None):
+        """
+        Streams the GPT response, retrying with exponential back-off as long as no text
+        has been produced yet.
+        """
+        for attempt in range(1, self.MAX_RETRIES + 1):
+            produced = False
+            try:
+                async for token in self.speech_processor.stream_gpt_response_vlm(transcript, image_url, session.conversation_history(role), role.prompt_processor):
+                    produced = True
+                    yield token
+                return
+            except Exception as e:
+                if produced:
+                    raise
+                logging.warning(f"[Attempt {attempt}/{self.MAX_RETRIES}] OpenAI API error: {e}")
+                if attempt < self.MAX_RETRIES:
+                    wait_time = self.RETRY_DELAY * (2 ** (attempt - 1))
+                    logging.info(f"Retrying in {wait_time} seconds...")
+                    await asyncio.sleep(wait_time)
+
+        raise RuntimeError("Failed to get a valid response from GPT")
+
+    async def stream_cached_response(self, session, role, transcript, image_url=None):
+        """
+        Streams the GPT response, or replays a cached response to the same question about
+        the same scene without calling the LLM. Complete responses are added to the cache.
+
+        Only questions with an image are cached: the answer to a text-only follow-up such as
+        "make it stiffer" depends on the session's conversation, not on the question alone.
+        """
+        if self.response_cache is None:
+            async for token in self.stream_response_with_retries(session, role, transcript, image_url):
+                yield token
+            return
+
+        context = role.context_hash
+        question = ResponseCacheProcessor.normalize_transcript(transcript)
+        image_hash = await self.run_blocking(self.response_cache.image_hash, image_url) if image_url else None
+        cacheable = image_hash is not None
+
+        if cacheable:
+            cached_response = self.response_cache.get(context, question, image_hash)
+            if cached_response is not None:
+                logging.info(f"Response cache hit for: {question}")
+                yield cached_response
+                return
+
+        response = ""
+        async for token in self.stream_response_with_retries(session, role, transcript, image_url):
+            response += token
+            yield token
+        # Truncated or malformed replies would be replayed on every hit; keep only valid matrices
+        if cacheable and self.stiffness_matrix_processor.extract_stiffness_matrix_2(response)[0] is not None:
+            self.response_cache.put(context, question, image_hash, response)
+
+    async def stream_and_dispatch(self, session, role, transcript, image_url, outcome):
+        """
+        Streams the GPT response and dispatches the stiffness matrix to the robot the moment
+        its JSON block is complete, instead of after the whole response has arrived.
+
+        Parameters:
+            outcome (dict): Receives "stiffness_matrix", "ellipsoid_task" and the fields of
+                dispatch_stiffness_matrix() once dispatched.
+
+        Yields:
+            str: The streamed response tokens.
+        """
+        parser = StiffnessMatrixStreamParser(self.stiffness_matrix_processor)
+        async for token in self.stream_cached_response(session, role, transcript, image_url):
+            stiffness_matrix = parser.feed(token)
+            if stiffness_matrix is not None:
+                outcome["stiffness_matrix"] = stiffness_matrix
+                outcome["ellipsoid_task"] = self.dispatch_stiffness_matrix(session, stiffness_matrix, outcome)
+            yield token
+
+    def dispatch_stiffness_matrix(self, session, stiffness_matrix, outcome):
+        """
+        Rotates a validated camera-frame stiffness matrix to the end-effector frame, sends it
+        (or a smooth transition to it) to the session's webhooks in the background and starts
+        rendering its ellipsoid.
+
+        Parameters:
+            outcome (dict): Receives "stiffness_matrix_ee" and "dispatched_at", the Unix time
+                the command was sent, for the command store.
+
+        Returns:
+            asyncio.Future: Resolves to the ellipsoid plot URL.
+        """
+        stiffness_matrix_ee = self.stiffness_matrix_processor.rotate_stiffness_camera_to_ee(stiffness_matrix)
+        logging.info(f"Stiffness matrix to send (transformed camera to ee): {stiffness_matrix_ee}")
+        session.stiffness_matrix = stiffness_matrix_ee
+        outcome["stiffness_matrix_ee"] = stiffness_matrix_ee
+        outcome["dispatched_at"] = time.time()
+        if session.stiffness_scheduler is not None:
+            session.stiffness_scheduler.set_target(stiffness_matrix_ee)
+        else:
+            session.webhook_processor.dispatch(stiffness_matrix_ee)
+
+        # Reuse the plot of an equal matrix, or render the ellipsoid on a worker process, off the audio path
+        if self.ellipsoid_cache is not None:
+            return asyncio.ensure_future(self.ellipsoid_cache.get_url(stiffness_matrix, self.render_ellipsoid))
+        return asyncio.ensure_future(self.render_ellipsoid(stiffness_matrix))
+
+    async def render_ellipsoid(self, stiffness_matrix, filename=None):
+        """
+        Renders the ellipsoid plot of a stiffness matrix and returns its URL, or None on error.
+        """
+        if self.ellipsoid_renderer is not None:
+            return await self.ellipsoid_renderer.render(stiffness_matrix, filename)
+        return await self.run_blocking(self.stiffness_matrix_processor.generate_ellipsoid_plot, stiffness_matrix, filename)
+
+    async def process_response(self, session, role, transcript, response, image_url, outcome):
+        """
+        Completes a GPT response: dispatches the stiffness matrix if the stream parser did not
+        already do so, records it in the command store and updates the conversation history.
+
+        Returns:
+            tuple: (stiffness_matrix, matrix_file_url, ellipsoid_task), where ellipsoid_task
+            resolves to the ellipsoid plot URL or is None.
+        """
+        stiffness_matrix = outcome.get("stiffness_matrix")
+        ellipsoid_task = outcome.get("ellipsoid_task")
+        matrix_file_url = None
+
+        if stiffness_matrix is None:
+            # Fall back to the full-response extraction
+            stiffness_matrix, matrix_file_url = self.stiffness_matrix_processor.extract_stiffness_matrix_2(response)
+            if stiffness_matrix is not None:
+                ellipsoid_task = self.dispatch_stiffness_matrix(session, stiffness_matrix, outcome)
             else:
-                self.conversation_history_processor.update_conversation_history(transcript, response)
+                logging.info("No valid stiffness matrix found. Skipping rotation and webhook notification.")
+
+        if stiffness_matrix is not None:
+            command_id = await self.run_blocking(
+                self.stiffness_store.record,
+                session.session_id,
+                stiffness_matrix,
+                outcome["stiffness_matrix_ee"],
+                response=response,
+                role=role.name,
+                created_at=outcome["dispatched_at"],
+            )
+            matrix_file_url = self.stiffness_matrix_processor.matrix_url(command_id)
+
+        # Update the session's conversation history
+        history = session.conversation_history(role)
+        if image_url:
+            await self.run_blocking(history.update_conversation_history, transcript, response, image_url)
+        else:
+            await self.run_blocking(history.update_conversation_history, transcript, response)
+
+        return stiffness_matrix, matrix_file_url, ellipsoid_task
+
+    async def post_audio(self, request: Request, file: Optional[UploadFile] = File(None), image_url: Optional[str] = Form(None), transcript: Optional[str] = Form(None), role: Optional[str] = Form(None)):
+        """
+        Processes uploaded audio and generates a response.
+
+        A client that already streamed its audio to /ws/speech_to_text can send the
+        final transcript instead of the audio file to skip transcription.
+        """
+        if file is None and transcript is None:
+            raise HTTPException(status_code=400, detail="Either an audio file or a transcript is required")
+        session = self.get_session(request)
+        role = self.get_role(request, role)
+
+        try:
+            # Log received data for debugging
+            if file is not None:
+                logging.info(f"Received audio file: {file.filename}, Content-Type: {file.content_type}")
+            logging.info(f"Received image URL: {image_url}")
+
+            # Convert local image url to public image url, unless images are sent inline
+            if image_url and self.image_delivery == "public":
+                image_url = self.speech_processor.convert_local_image_url_to_public(image_url)
+
+            # Transcribe audio, unless the transcript was already streamed
+            transcript = await self.transcribe_request(file, transcript)
+
+            # Stream the GPT response; the stiffness matrix is dispatched as soon as it is complete
+            outcome = {}
+            response = ""
+            async for token in self.stream_and_dispatch(session, role, transcript, image_url, outcome):
+                response += token
+            logging.info(f"GPT response received: {response}")
+
+            stiffness_matrix, matrix_file_url, ellipsoid_task = await self.process_response(session, role, transcript, response, image_url, outcome)
+            ellipsoid_plot_url = None
 
             # Generate TTS audio
-            audio_file_path = self.speech_processor.text_to_speech(response)
+            audio_file_path = await self.speech_processor.text_to_speech(response)
+            if ellipsoid_task is not None:
+                ellipsoid_plot_url = await ellipsoid_task
             if not audio_file_path or not os.path.exists(audio_file_path):
                 raise HTTPException(status_code=500, detail="Failed to generate audio")
 
@@ -385,16 +1008,117 @@ class TeleimpedanceBackend:
                 headers["x-matrix-url"] = matrix_file_url
             if ellipsoid_plot_url:
                 headers["x-ellipsoid-url"] = ellipsoid_plot_url
+            if stiffness_matrix is not None:
+                headers["x-ellipsoid-geometry-url"] = f"/ellipsoid/geometry?matrix={self.format_matrix_query(stiffness_matrix)}"
 
-            return StreamingResponse(iterfile(), media_type="audio/mpeg", headers=headers)
+            # The audio file belongs to this request only; remove it once it has been sent
+            return StreamingResponse(iterfile(), media_type="audio/mpeg", headers=headers, background=BackgroundTask(os.remove, audio_file_path))
 
         except Exception as e:
             logging.error(f"Error occurred: {str(e)}")
             raise HTTPException(status_code=500, detail=str(e))
 
-        finally:
-            if converted_audio_file_path and os.path.exists(converted_audio_file_path):
-                os.remove(converted_audio_file_path)
+    async def post_audio_stream(self, request: Request, file: Optional[UploadFile] = File(None), image_url: Optional[str] = Form(None), transcript: Optional[str] = Form(None), role: Optional[str] = Form(None)):
+        """
+        Processes uploaded audio and streams the spoken response back sentence by sentence.
+
+        Each sentence of the GPT response is synthesized as soon as it is complete, so the
+        first audio arrives while the LLM is still generating. Because the stiffness matrix
+        is only known at the end, the matrix and ellipsoid URLs are fetched afterwards from
+        GET /post_audio_stream/{response_id}, using the x-response-id header.
+        """
+        if file is None and transcript is None:
+            raise HTTPException(status_code=400, detail="Either an audio file or a transcript is required")
+        session = self.get_session(request)
+        role = self.get_role(request, role)
+
+        try:
+            if file is not None:
+                logging.info(f"Received audio file: {file.filename}, Content-Type: {file.content_type}")
+            logging.info(f"Received image URL: {image_url}")
+
+            if image_url and self.image_delivery == "public":
+                image_url = self.speech_processor.convert_local_image_url_to_public(image_url)
+            transcript = await self.transcribe_request(file, transcript)
+
+        except Exception as e:
+            logging.error(f"Error occurred: {str(e)}")
+            raise HTTPException(status_code=500, detail=str(e))
+
+        response_id = str(uuid4())
+        result = asyncio.get_running_loop().create_future()
+        self.stream_results[response_id] = result
+        while len(self.stream_results) > self.STREAM_RESULTS_KEPT:
+            self.stream_results.popitem(last=False)
+
+        # Ordered queue of TTS tasks, one per sentence; None marks the end of the response
+        audio_tasks = asyncio.Queue()
+        asyncio.ensure_future(self.produce_streamed_response(session, role, transcript, image_url, audio_tasks, result))
+
+        async def iter_audio():
+            while True:
+                task = await audio_tasks.get()
+                if task is None:
+                    break
+                try:
+                    yield await task
+                except Exception as e:
+                    logging.error(f"Failed to synthesize sentence: {str(e)}")
+
+        return StreamingResponse(iter_audio(), media_type="audio/mpeg", headers={"x-response-id": response_id})
+
+    async def produce_streamed_response(self, session, role, transcript, image_url, audio_tasks, result):
+        """
+        Runs the GPT stream of a /post_audio_stream request, queueing a TTS task for every
+        complete sentence, and resolves the request's result once the response is processed.
+        """
+        sentences = ResponseStreamProcessor(SpeechProcessor.STIFFNESS_HEADER, SpeechProcessor.FALLBACK_SPEECH)
+        tts_slots = asyncio.Semaphore(self.TTS_CONCURRENCY)
+
+        async def speak(sentence):
+            async with tts_slots:
+                return await self.speech_processor.synthesize_speech(sentence)
+
+        def enqueue(new_sentences):
+            for sentence in new_sentences:
+                audio_tasks.put_nowait(asyncio.ensure_future(speak(sentence)))
+
+        try:
+            outcome = {}
+            async for token in self.stream_and_dispatch(session, role, transcript, image_url, outcome):
+                enqueue(sentences.feed(token))
+            enqueue(sentences.flush())
+            audio_tasks.put_nowait(None)
+            logging.info(f"GPT response received: {sentences.text}")
+
+            stiffness_matrix, matrix_file_url, ellipsoid_task = await self.process_response(session, role, transcript, sentences.text, image_url, outcome)
+            ellipsoid_plot_url = await ellipsoid_task if ellipsoid_task is not None else None
+            result.set_result({
+                "transcript": transcript,
+                "response": sentences.text,
+                "stiffness_matrix": stiffness_matrix,
+                "matrix_url": matrix_file_url,
+                "ellipsoid_url": ellipsoid_plot_url,
+            })
+
+        except Exception as e:
+            logging.error(f"Error in streamed response: {str(e)}")
+            audio_tasks.put_nowait(None)
+            if not result.done():
+                result.set_result({"transcript": transcript, "error": str(e)})
+
+    async def get_stream_result(self, response_id: str):
+        """
+        Returns the transcript, response text, stiffness matrix and ellipsoid URL of a
+        /post_audio_stream response, waiting until it has been processed.
+        """
+        result = self.stream_results.get(response_id)
+        if result is None:
+            raise HTTPException(status_code=404, detail="Unknown response id")
+        try:
+            return await asyncio.wait_for(asyncio.shield(result), timeout=self.STREAM_RESULT_TIMEOUT)
+        except asyncio.TimeoutError:
+            raise HTTPException(status_code=504, detail="Response is still being processed")
 
 backend = TeleimpedanceBackend(
     environment=ENVIRONMENT,
@@ -402,6 +1126,29 @@ backend = TeleimpedanceBackend(
     frontend_port=FRONTEND_PORT,
     eye_tracker_url=EYE_TRACKER_URL,
     sigma_server_url=SIGMA_SERVER_URL,  # Added this line
-    log_level=LOG_LEVEL
+    log_level=LOG_LEVEL,
+    blocking_workers=BLOCKING_WORKERS,
+    stt_workers=STT_WORKERS,
+    ellipsoid_workers=ELLIPSOID_WORKERS,
+    ellipsoid_cache_max_entries=ELLIPSOID_CACHE_MAX_ENTRIES,
+    tts_cache_max_mb=TTS_CACHE_MAX_MB,
+    tts_backend=TTS_BACKEND,
+    tts_latency_budget=TTS_LATENCY_BUDGET,
+    tts_local_max_chars=TTS_LOCAL_MAX_CHARS,
+    response_cache_ttl=RESPONSE_CACHE_TTL,
+    response_cache_max_entries=RESPONSE_CACHE_MAX_ENTRIES,
+    image_delivery=IMAGE_DELIVERY,
+    http_connect_timeout=HTTP_CONNECT_TIMEOUT,
+    http_read_timeout=HTTP_READ_TIMEOUT,
+    http_pool_per_host=HTTP_POOL_PER_HOST,
+    stiffness_ramp_seconds=STIFFNESS_RAMP_SECONDS,
+    stiffness_ramp_rate_hz=STIFFNESS_RAMP_RATE_HZ,
+    stiffness_store_retention_days=STIFFNESS_STORE_RETENTION_DAYS,
+    stiffness_store_max_commands=STIFFNESS_STORE_MAX_COMMANDS,
+    prompt_token_budget=PROMPT_TOKEN_BUDGET,
+    pre_knowledge_detail=PRE_KNOWLEDGE_DETAIL,
+    session_idle_seconds=SESSION_IDLE_SECONDS,
+    roles_file=ROLES_FILE,
+    default_role=DEFAULT_ROLE
 )
 app = backend.app
\ No newline at end of file
@@ -0,0 +1,122 @@
+"""
+Mirrors the images of the pre-knowledge (few-shot) messages locally, shrunk and
+re-encoded, so that the backend can inline them into the prompt prefix instead of having
+the provider fetch them through the public tunnel on every request.
+
+    python mirror_pre_knowledge_images.py
+    python mirror_pre_knowledge_images.py --messages experiment_data/labels/ground_truth_messages_home.json --max-side 768
+
+Each image is taken from the local images/ directory when it is there, and downloaded
+from its URL otherwise. The shrunk JPEGs and a manifest.json mapping every original URL
+to its file and vision detail level are written to the output directory, which
+PreKnowledgeImageProcessor loads at startup. Running it again adds to the manifest.
+
+Check labelling accuracy at the chosen --max-side with the evaluation harness before
+lowering it further.
+"""
+import os
+import io
+import sys
+import json
+import logging
+import argparse
+import hashlib
+import urllib.request
+from urllib.parse import urlparse
+from pathlib import Path
+
+from PIL import Image
+
+# Ensure `functions/` is discoverable
+sys.path.append(str(Path(__file__).resolve().parent / "functions"))
+
+from functions.pre_knowledge_image_processor import PreKnowledgeImageProcessor
+
+logging.basicConfig(level="INFO", format="%(asctime)s - %(levelname)s - %(message)s")
+
+DEFAULT_MESSAGES_FILE = os.path.join("experiment_data", "labels", "ground_truth_messages_lab.json")
+
+
+def read_source_image(url, local_images_dir):
+    """
+    Returns the bytes of an image, preferring the copy in the local images directory.
+    """
+    local_path = os.path.join(local_images_dir, os.path.basename(urlparse(url).path))
+    if os.path.exists(local_path):
+        logging.info(f"Using local copy {local_path}")
+        with open(local_path, "rb") as f:
+            return f.read()
+
+    logging.info(f"Downloading {url}")
+    request = urllib.request.Request(url, headers={"ngrok-skip-browser-warning": "1"})
+    with urllib.request.urlopen(request, timeout=30) as response:
+        return response.read()
+
+
+def shrink(image_bytes, max_side, quality):
+    """
+    Downsizes an image to fit max_side and re-encodes it as JPEG.
+
+    Returns:
+        tuple: (JPEG bytes, width, height)
+    """
+    with Image.open(io.BytesIO(image_bytes)) as img:
+        img = img.convert("RGB")
+        img.thumbnail((max_side, max_side), Image.LANCZOS)
+        buffer = io.BytesIO()
+        img.save(buffer, format="JPEG", quality=quality, optimize=True)
+        return buffer.getvalue(), img.width, img.height
+
+
+def main(args):
+    with open(args.messages, "r", encoding="utf-8") as f:
+        messages = json.load(f)
+
+    urls = []
+    for message in messages:
+        for part in message.get("content", []):
+            if isinstance(part, dict) and part.get("type") == "image_url" and part["image_url"]["url"] not in urls:
+                urls.append(part["image_url"]["url"])
+
+    os.makedirs(args.output_dir, exist_ok=True)
+    manifest_path = os.path.join(args.output_dir, PreKnowledgeImageProcessor.MANIFEST_FILE)
+    manifest = {}
+    if os.path.exists(manifest_path):
+        with open(manifest_path, "r", encoding="utf-8") as f:
+            manifest = json.load(f)
+
+    original_bytes = shrunk_bytes = 0
+    for url in urls:
+        try:
+            source = read_source_image(url, args.local_images_dir)
+        except Exception as e:
+            logging.error(f"Cannot read {url}: {e}")
+            continue
+
+        image_bytes, width, height = shrink(source, args.max_side, args.quality)
+        stem = os.path.splitext(os.path.basename(urlparse(url).path))[0]
+        filename = f"{stem}-{hashlib.sha256(url.encode('utf-8')).hexdigest()[:8]}.jpg"
+        with open(os.path.join(args.output_dir, filename), "wb") as f:
+            f.write(image_bytes)
+
+        detail = PreKnowledgeImageProcessor.choose_detail(width, height) if args.detail == "auto" else args.detail
+        manifest[url] = {"file": filename, "width": width, "height": height, "detail": detail}
+        original_bytes += len(source)
+        shrunk_bytes += len(image_bytes)
+        logging.info(f"{url} -> {filename} ({width}x{height}, {len(source)} -> {len(image_bytes)} bytes, detail {detail})")
+
+    with open(manifest_path, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=2)
+    logging.info(f"Mirrored {len(urls)} images ({original_bytes} -> {shrunk_bytes} bytes); manifest written to {manifest_path}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Mirror and shrink the images of the pre-knowledge messages.")
+    parser.add_argument("--messages", default=DEFAULT_MESSAGES_FILE, help="Pre-knowledge messages JSON file")
+    parser.add_argument("--output-dir", default=PreKnowledgeImageProcessor.IMAGES_DIR)
+    parser.add_argument("--local-images-dir", default="images", help="Directory checked for the images before downloading")
+    parser.add_argument("--max-side", type=int, default=512, help="Longest side of the mirrored images in pixels")
+    parser.add_argument("--quality", type=int, default=80, help="JPEG quality")
+    parser.add_argument("--detail", choices=PreKnowledgeImageProcessor.DETAIL_POLICIES, default="auto",
+                        help="Vision detail level; auto picks low for images that fit 512 x 512")
+    main(parser.parse_args())
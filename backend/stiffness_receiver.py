@@ -0,0 +1,148 @@
+"""
+Stand-in for the Sigma7 controller that receives binary stiffness commands and reports
+delivery latency and packet loss, for testing the udp:// and ws:// webhook transports
+without the device.
+
+Register it with the backend, e.g.
+    curl -X POST "http://localhost:8000/register_webhook?webhook_url=udp://localhost:9870"
+    curl -X POST "http://localhost:8000/register_webhook?webhook_url=ws://localhost:9871/stiffness"
+and run
+    python stiffness_receiver.py --udp-port 9870 --ws-port 9871
+
+Latency is measured against the send timestamp in each packet, so sender and receiver
+must share a clock (same host, or NTP/PTP-synchronized hosts).
+"""
+import sys
+import time
+import asyncio
+import logging
+import argparse
+from pathlib import Path
+
+import numpy as np
+from aiohttp import web
+
+# Ensure `functions/` is discoverable
+sys.path.append(str(Path(__file__).resolve().parent / "functions"))
+
+from functions.stiffness_transport_processor import StiffnessPacket
+
+logging.basicConfig(level="INFO", format="%(asctime)s - %(levelname)s - %(message)s")
+
+
+class ReceiverStats:
+    """
+    Latency and loss statistics of one transport.
+    """
+
+    # Packets at most this far behind the last sequence count as reordered; further back
+    # means the sender restarted or re-registered and counts from 1 again
+    REORDER_WINDOW = 64
+
+    def __init__(self, name):
+        self.name = name
+        self.received = 0
+        self.lost = 0
+        self.reordered = 0
+        self.malformed = 0
+        self.resyncs = 0
+        self.last_sequence = None
+        self.latencies_ms = []
+
+    def record(self, data):
+        receive_time_ns = time.time_ns()
+        if len(data) != StiffnessPacket.SIZE:
+            self.malformed += 1
+            return
+
+        sequence, send_time_ns, stiffness_matrix = StiffnessPacket.unpack(data)
+        self.received += 1
+        self.latencies_ms.append((receive_time_ns - send_time_ns) / 1e6)
+
+        if self.last_sequence is not None:
+            gap = (sequence - self.last_sequence) & 0xFFFFFFFF
+            if gap == 0 or gap > 0x7FFFFFFF:
+                behind = (self.last_sequence - sequence) & 0xFFFFFFFF
+                if behind <= self.REORDER_WINDOW:
+                    self.reordered += 1
+                    return
+                # Resynchronize on the new sequence instead of counting every later packet as reordered
+                self.resyncs += 1
+            else:
+                self.lost += gap - 1
+        self.last_sequence = sequence
+        logging.debug(f"[{self.name}] #{sequence}: {stiffness_matrix}")
+
+    def report(self):
+        """
+        Logs the statistics of the packets received since the previous report.
+        """
+        if not self.received and not self.malformed:
+            return
+        summary = f"[{self.name}] received={self.received} lost={self.lost} reordered={self.reordered} resyncs={self.resyncs} malformed={self.malformed}"
+        if self.latencies_ms:
+            latencies = np.array(self.latencies_ms)
+            summary += (
+                f" latency_ms p50={np.percentile(latencies, 50):.3f}"
+                f" p95={np.percentile(latencies, 95):.3f} max={latencies.max():.3f}"
+            )
+        logging.info(summary)
+        self.received = self.lost = self.reordered = self.resyncs = self.malformed = 0
+        self.latencies_ms = []
+
+
+class UdpReceiver(asyncio.DatagramProtocol):
+    def __init__(self, stats):
+        self.stats = stats
+
+    def datagram_received(self, data, addr):
+        self.stats.record(data)
+
+
+async def main(args):
+    loop = asyncio.get_running_loop()
+    all_stats = []
+
+    if args.udp_port:
+        udp_stats = ReceiverStats("udp")
+        all_stats.append(udp_stats)
+        await loop.create_datagram_endpoint(lambda: UdpReceiver(udp_stats), local_addr=(args.host, args.udp_port))
+        logging.info(f"Listening for UDP stiffness packets on {args.host}:{args.udp_port}")
+
+    if args.ws_port:
+        ws_stats = ReceiverStats("ws")
+        all_stats.append(ws_stats)
+
+        async def stiffness_websocket(request):
+            websocket = web.WebSocketResponse()
+            await websocket.prepare(request)
+            logging.info(f"WebSocket sender connected from {request.remote}")
+            async for message in websocket:
+                if message.type == web.WSMsgType.BINARY:
+                    ws_stats.record(message.data)
+            logging.info("WebSocket sender disconnected")
+            return websocket
+
+        app = web.Application()
+        app.router.add_get("/stiffness", stiffness_websocket)
+        runner = web.AppRunner(app)
+        await runner.setup()
+        await web.TCPSite(runner, args.host, args.ws_port).start()
+        logging.info(f"Listening for WebSocket stiffness packets on ws://{args.host}:{args.ws_port}/stiffness")
+
+    if not all_stats:
+        raise SystemExit("Nothing to listen on; pass --udp-port and/or --ws-port")
+
+    while True:
+        await asyncio.sleep(args.report_interval)
+        for stats in all_stats:
+            stats.report()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Receive binary stiffness commands and report latency and loss.")
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--udp-port", type=int, default=9870, help="UDP port, 0 to disable")
+    parser.add_argument("--ws-port", type=int, default=9871, help="WebSocket port, 0 to disable")
+    parser.add_argument("--report-interval", type=float, default=5.0, help="Seconds between reports")
+    asyncio.run(main(parser.parse_args()))
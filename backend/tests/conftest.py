@@ -0,0 +1,7 @@
+import sys
+from pathlib import Path
+
+# Ensure the backend and `functions/` are discoverable, as main.py does
+backend_dir = Path(__file__).resolve().parent.parent
+sys.path.append(str(backend_dir))
+sys.path.append(str(backend_dir / "functions"))
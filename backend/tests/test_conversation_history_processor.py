@@ -0,0 +1,56 @@
+import json
+
+import pytest
+
+from conversation_history_processor import ConversationHistoryProcessor
+
+
+def exchange(number):
+    return [
+        {"role": "user", "content": [{"type": "text", "text": f"question {number}"}]},
+        {"role": "assistant", "content": f"answer {number}"},
+    ]
+
+
+@pytest.fixture
+def journal_file(tmp_path):
+    return str(tmp_path / "messages" / "conversation_history.jsonl")
+
+
+def test_replay_skips_torn_last_line(journal_file):
+    history = ConversationHistoryProcessor(journal_file=journal_file, legacy_file=None)
+    history.append_to_journal(exchange(1))
+    history.append_to_journal(exchange(2))
+    with open(journal_file, "a", encoding="utf-8") as f:
+        f.write(json.dumps({"messages": exchange(3)})[:25])  # Crash in the middle of a write
+
+    replayed = ConversationHistoryProcessor(journal_file=journal_file, legacy_file=None)
+    assert list(replayed.history) == exchange(1) + exchange(2)
+
+    # Replay compacts the journal, dropping the torn line
+    with open(journal_file, encoding="utf-8") as f:
+        lines = f.read().splitlines()
+    assert [json.loads(line) for line in lines] == [{"messages": exchange(1) + exchange(2)}]
+
+
+def test_replay_keeps_the_last_messages(journal_file):
+    history = ConversationHistoryProcessor(journal_file=journal_file, legacy_file=None)
+    for number in range(ConversationHistoryProcessor.HISTORY_LENGTH):
+        history.append_to_journal(exchange(number))
+
+    replayed = ConversationHistoryProcessor(journal_file=journal_file, legacy_file=None)
+    assert len(replayed.history) == ConversationHistoryProcessor.HISTORY_LENGTH
+    assert list(replayed.history)[-2:] == exchange(ConversationHistoryProcessor.HISTORY_LENGTH - 1)
+
+
+def test_replay_imports_legacy_history(tmp_path, journal_file):
+    legacy_file = tmp_path / "conversation_history.json"
+    legacy_file.write_text(json.dumps(exchange(1)))
+
+    history = ConversationHistoryProcessor(journal_file=journal_file, legacy_file=str(legacy_file))
+    assert list(history.history) == exchange(1)
+    assert list(ConversationHistoryProcessor(journal_file=journal_file, legacy_file=None).history) == exchange(1)
+
+
+def test_empty_journal(journal_file):
+    assert list(ConversationHistoryProcessor(journal_file=journal_file, legacy_file=None).history) == []
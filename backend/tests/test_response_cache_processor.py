@@ -0,0 +1,95 @@
+import pytest
+from PIL import Image, ImageDraw
+
+from response_cache_processor import ResponseCacheProcessor
+
+CONTEXT = ResponseCacheProcessor.context_hash("system role", [])
+TRANSCRIPT = ResponseCacheProcessor.normalize_transcript("What is the stiffness here?")
+DHASH = 0x0F0F_F0F0_3C3C_C3C3
+MARKER = (5, 7)
+
+
+def flip_bits(value, count):
+    for bit in range(count):
+        value ^= 1 << (bit * 7)
+    return value
+
+
+@pytest.fixture
+def cache():
+    cache = ResponseCacheProcessor()
+    cache.put(CONTEXT, TRANSCRIPT, (DHASH, MARKER), "cached response")
+    return cache
+
+
+@pytest.mark.parametrize("distance", range(ResponseCacheProcessor.HASH_DISTANCE + 1))
+def test_hit_within_hamming_distance(cache, distance):
+    assert cache.get(CONTEXT, TRANSCRIPT, (flip_bits(DHASH, distance), MARKER)) == "cached response"
+
+
+def test_miss_beyond_hamming_distance(cache):
+    assert cache.get(CONTEXT, TRANSCRIPT, (flip_bits(DHASH, ResponseCacheProcessor.HASH_DISTANCE + 1), MARKER)) is None
+    assert cache.get_stats()["misses"] == 1
+
+
+def test_miss_for_another_marker_cell(cache):
+    assert cache.get(CONTEXT, TRANSCRIPT, (DHASH, (5, 8))) is None
+    assert cache.get(CONTEXT, TRANSCRIPT, (DHASH, None)) is None
+
+
+def test_miss_without_image(cache):
+    cache.put(CONTEXT, TRANSCRIPT, None, "text-only response")
+    assert cache.get(CONTEXT, TRANSCRIPT, None) is None
+
+
+def test_miss_for_another_transcript_or_context(cache):
+    assert cache.get(CONTEXT, "what is the damping here", (DHASH, MARKER)) is None
+    assert cache.get(ResponseCacheProcessor.context_hash("edited role", []), TRANSCRIPT, (DHASH, MARKER)) is None
+
+
+def test_normalized_transcripts_match(cache):
+    transcript = ResponseCacheProcessor.normalize_transcript("  what IS the stiffness, here  ")
+    assert cache.get(CONTEXT, transcript, (DHASH, MARKER)) == "cached response"
+
+
+def test_expired_entries_miss(cache):
+    cache.ttl_seconds = -1
+    assert cache.get(CONTEXT, TRANSCRIPT, (DHASH, MARKER)) is None
+    assert cache.get_stats()["expired"] == 1
+    assert cache.get_stats()["entries"] == 0
+
+
+def test_least_recently_used_entry_is_evicted(cache):
+    cache.max_entries = 2
+    cache.put(CONTEXT, "second", (DHASH, MARKER), "second response")
+    assert cache.get(CONTEXT, TRANSCRIPT, (DHASH, MARKER)) == "cached response"
+    cache.put(CONTEXT, "third", (DHASH, MARKER), "third response")
+    assert cache.get(CONTEXT, "second", (DHASH, MARKER)) is None
+    assert cache.get(CONTEXT, TRANSCRIPT, (DHASH, MARKER)) == "cached response"
+    assert cache.get_stats()["evictions"] == 1
+
+
+def draw_groove(path, marker_center):
+    image = Image.new("RGB", (640, 480), (200, 200, 200))
+    draw = ImageDraw.Draw(image)
+    draw.rectangle((100, 220, 540, 260), fill=(60, 60, 60))
+    x, y = marker_center
+    draw.ellipse((x - 30, y - 30, x + 30, y + 30), outline=(230, 20, 20), width=6)
+    image.save(path)
+
+
+def test_image_hash_tells_marker_positions_apart(tmp_path):
+    cache = ResponseCacheProcessor(images_dir=str(tmp_path))
+    draw_groove(tmp_path / "left.png", (150, 240))
+    draw_groove(tmp_path / "right.png", (490, 240))
+
+    left = cache.image_hash("http://localhost:8001/images/left.png")
+    right = cache.image_hash("http://localhost:8001/images/right.png")
+    assert left[1] is not None and right[1] is not None
+    assert left[1] != right[1]
+    assert not cache.images_match(left, right)
+    assert cache.images_match(left, left)
+
+
+def test_image_hash_of_missing_image(tmp_path):
+    assert ResponseCacheProcessor(images_dir=str(tmp_path)).image_hash("http://localhost:8001/images/missing.png") is None
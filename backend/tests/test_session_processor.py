@@ -0,0 +1,28 @@
+import pytest
+
+from session_processor import SessionProcessor
+
+
+@pytest.mark.parametrize("headers, cookies, session_id", [
+    ({"x-session-id": "station-1"}, {}, "station-1"),
+    ({}, {"session_id": "station_2"}, "station_2"),
+    ({"x-session-id": "from-header"}, {"session_id": "from-cookie"}, "from-header"),
+    ({}, {}, SessionProcessor.DEFAULT_SESSION),
+    ({"x-session-id": ""}, {}, SessionProcessor.DEFAULT_SESSION),
+    ({"x-session-id": "a" * 64}, {}, "a" * 64),
+])
+def test_session_id_from(headers, cookies, session_id):
+    assert SessionProcessor.session_id_from(headers, cookies) == session_id
+
+
+@pytest.mark.parametrize("session_id", [
+    "a" * 65,
+    "../webhooks",
+    "station 1",
+    "station.1",
+    "station/1",
+    "station-1\n",
+])
+def test_session_id_from_rejects_malformed_ids(session_id):
+    with pytest.raises(ValueError):
+        SessionProcessor.session_id_from({"x-session-id": session_id}, {})
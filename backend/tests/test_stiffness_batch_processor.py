@@ -0,0 +1,56 @@
+import numpy as np
+
+from stiffness_batch_processor import StiffnessBatchProcessor
+
+STIFF_Z = [[100, 0, 0], [0, 100, 0], [0, 0, 250]]
+STIFF_X = [[250, 0, 0], [0, 100, 0], [0, 0, 100]]
+ISOTROPIC = [[100, 0, 0], [0, 100, 0], [0, 0, 100]]
+ASYMMETRIC = [[100, 5, 0], [0, 100, 0], [0, 0, 100]]
+INDEFINITE = [[100, 0, 0], [0, -100, 0], [0, 0, 100]]
+NOT_FINITE = [[np.nan, 0, 0], [0, 100, 0], [0, 0, 100]]
+
+
+def test_analyze_validity_masks():
+    analysis = StiffnessBatchProcessor.analyze([STIFF_Z, ASYMMETRIC, INDEFINITE, NOT_FINITE])
+
+    assert analysis["finite"].tolist() == [True, True, True, False]
+    assert analysis["symmetric"].tolist() == [True, False, True, False]
+    assert analysis["positive_definite"].tolist() == [True, False, False, False]
+    assert analysis["valid"].tolist() == [True, False, False, False]
+
+    # Invalid matrices have no principal axes or metrics
+    assert np.isnan(analysis["eigenvalues"][1:]).all()
+    assert np.isnan(analysis["eigenvectors"][1:]).all()
+    assert np.isnan(analysis["condition_number"][1:]).all()
+
+
+def test_analyze_principal_axes():
+    analysis = StiffnessBatchProcessor.analyze(STIFF_Z)
+
+    np.testing.assert_allclose(analysis["eigenvalues"], [[250, 100, 100]])
+    eigenvectors = analysis["eigenvectors"][0]
+    np.testing.assert_allclose(eigenvectors[:, 0], [0, 0, 1])  # Stiffest axis along +Z
+    assert np.linalg.det(eigenvectors) > 0  # Right-handed
+    np.testing.assert_allclose(analysis["condition_number"], [2.5])
+
+
+def test_analyze_isotropic_metrics():
+    analysis = StiffnessBatchProcessor.analyze(ISOTROPIC)
+
+    np.testing.assert_allclose(analysis["fractional_anisotropy"], [0.0])
+    np.testing.assert_allclose(analysis["sphericity"], [1.0])
+    total = analysis["linearity"] + analysis["planarity"] + analysis["sphericity"]
+    np.testing.assert_allclose(total, [1.0])
+
+
+def test_analyze_rotates_to_end_effector_frame():
+    # Rz(90°) maps the camera X axis onto the end-effector Y axis
+    analysis = StiffnessBatchProcessor.analyze(STIFF_X, rotate_to_ee=True)
+    np.testing.assert_allclose(analysis["matrices"][0], [[100, 0, 0], [0, 250, 0], [0, 0, 100]])
+
+
+def test_analyze_accepts_rows_of_nine_values():
+    rows = np.array([STIFF_Z, STIFF_X], dtype=float).reshape(2, 9)
+    analysis = StiffnessBatchProcessor.analyze(rows)
+    assert analysis["matrices"].shape == (2, 3, 3)
+    assert analysis["valid"].all()
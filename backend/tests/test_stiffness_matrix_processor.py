@@ -0,0 +1,83 @@
+import json
+
+import pytest
+
+from stiffness_matrix_processor import StiffnessMatrixProcessor, StiffnessMatrixStreamParser
+
+MATRIX = [[250, 0, 0], [0, 100, 0], [0, 0, 100]]
+RESPONSE = (
+    "The groove runs left to right.\n\n"
+    "### Stiffness Matrix\n"
+    "```json\n"
+    + json.dumps({"stiffness_matrix": MATRIX}, indent=2)
+    + "\n```\n\nThe stiffness is high along X."
+)
+
+
+@pytest.fixture
+def processor(tmp_path):
+    return StiffnessMatrixProcessor(matrices_dir=str(tmp_path / "matrices"), ellipsoids_dir=str(tmp_path / "ellipsoids"))
+
+
+def test_parse_stiffness_json_returns_matrix(processor):
+    assert processor.parse_stiffness_json(json.dumps({"stiffness_matrix": MATRIX})) == MATRIX
+
+
+@pytest.mark.parametrize("json_code", [
+    '{"stiffness_matrix": [[1, 0, 0], [0, 1, 0]]}',  # Two rows
+    '{"stiffness_matrix": [[1, 0], [0, 1, 0], [0, 0, 1]]}',  # Short row
+    '{"stiffness_matrix": 5}',  # Not a matrix
+    '{"matrix": [[1, 0, 0], [0, 1, 0], [0, 0, 1]]}',  # Wrong key
+    '[[1, 0, 0], [0, 1, 0], [0, 0, 1]]',  # Not an object
+    '{"stiffness_matrix": [[1, 0, 0], [0, 1, 0], [0, 0, 1]]',  # Truncated
+    '',
+])
+def test_parse_stiffness_json_rejects_invalid_blocks(processor, json_code):
+    assert processor.parse_stiffness_json(json_code) is None
+
+
+def feed_all(parser, tokens):
+    """
+    Feeds tokens and returns (index of the token that completed the matrix, matrix).
+    """
+    completed = [(index, matrix) for index, token in enumerate(tokens) if (matrix := parser.feed(token)) is not None]
+    assert len(completed) <= 1, "a matrix is returned at most once"
+    return completed[0] if completed else (None, None)
+
+
+def test_stream_parser_whole_response(processor):
+    assert feed_all(StiffnessMatrixStreamParser(processor), [RESPONSE]) == (0, MATRIX)
+
+
+@pytest.mark.parametrize("chunk_size", [1, 2, 3, 5, 7, 16])
+def test_stream_parser_chunk_boundaries(processor, chunk_size):
+    tokens = [RESPONSE[i:i + chunk_size] for i in range(0, len(RESPONSE), chunk_size)]
+    index, matrix = feed_all(StiffnessMatrixStreamParser(processor), tokens)
+
+    # The matrix completes with the token that holds the last character of the closing fence
+    close_end = RESPONSE.index("```", RESPONSE.index("```json") + len("```json")) + len("```")
+    assert matrix == MATRIX
+    assert index == (close_end - 1) // chunk_size
+
+
+@pytest.mark.parametrize("split", ["`", "``", "```", "```j", "```js", "```jso"])
+def test_stream_parser_split_fences(processor, split):
+    block = "```json\n" + json.dumps({"stiffness_matrix": MATRIX}) + "\n```"
+    parser = StiffnessMatrixStreamParser(processor)
+    assert parser.feed("Matrix:\n" + split) is None
+    assert parser.feed(block[len(split):-2]) is None
+    assert parser.feed("``") == MATRIX
+
+
+def test_stream_parser_skips_invalid_block(processor):
+    response = (
+        "```json\n{\"stiffness_matrix\": [[1, 0], [0, 1]]}\n```\n"
+        "Corrected:\n```json\n" + json.dumps({"stiffness_matrix": MATRIX}) + "\n```"
+    )
+    assert feed_all(StiffnessMatrixStreamParser(processor), list(response))[1] == MATRIX
+
+
+def test_stream_parser_without_block(processor):
+    parser = StiffnessMatrixStreamParser(processor)
+    assert feed_all(parser, list("No matrix here, only ``` a stray fence.")) == (None, None)
+    assert parser.stiffness_matrix is None
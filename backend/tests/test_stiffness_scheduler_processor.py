@@ -0,0 +1,65 @@
+import asyncio
+
+import numpy as np
+import pytest
+
+from stiffness_scheduler_processor import StiffnessSchedulerProcessor
+
+SOFT = [[100.0, 0.0, 0.0], [0.0, 100.0, 0.0], [0.0, 0.0, 100.0]]
+STIFF_X = [[250.0, 0.0, 0.0], [0.0, 100.0, 0.0], [0.0, 0.0, 100.0]]
+COUPLED = [[100.0, 0.0, 0.0], [0.0, 175.0, -75.0], [0.0, -75.0, 175.0]]
+
+
+@pytest.mark.parametrize("start, target", [(SOFT, STIFF_X), (STIFF_X, COUPLED), (COUPLED, SOFT)])
+def test_interpolate_endpoints(start, target):
+    steps = 200
+    ramp = StiffnessSchedulerProcessor.interpolate(start, target, steps)
+
+    assert ramp.shape == (steps, 3, 3)
+    np.testing.assert_allclose(ramp[-1], target, rtol=1e-9)
+    # The minimum-jerk profile starts at rest: the first sample barely leaves the start
+    np.testing.assert_allclose(ramp[0], start, atol=1e-3)
+
+
+def test_interpolate_stays_symmetric_positive_definite():
+    ramp = StiffnessSchedulerProcessor.interpolate(STIFF_X, COUPLED, 50)
+    np.testing.assert_allclose(ramp, np.swapaxes(ramp, 1, 2), atol=1e-9)
+    assert np.all(np.linalg.eigvalsh(ramp) > 0)
+
+
+def test_interpolate_single_step_is_target():
+    np.testing.assert_allclose(StiffnessSchedulerProcessor.interpolate(SOFT, STIFF_X, 1)[0], STIFF_X)
+
+
+def test_interpolate_rejects_indefinite_matrix():
+    with pytest.raises(ValueError):
+        StiffnessSchedulerProcessor.interpolate(SOFT, [[1.0, 0.0, 0.0], [0.0, -1.0, 0.0], [0.0, 0.0, 1.0]], 10)
+
+
+def test_ramp_publishes_start_to_exact_target():
+    async def ramp():
+        published = []
+        scheduler = StiffnessSchedulerProcessor(published.append, rate_hz=1000.0, duration=0.02)
+        scheduler.set_target(SOFT)
+        scheduler.set_target(STIFF_X)
+        await scheduler.task
+        return scheduler, published
+
+    scheduler, published = asyncio.run(ramp())
+
+    # The first target is sent at once, the transition ends on the target object itself
+    assert published[0] is SOFT
+    assert published[-1] is STIFF_X
+    assert scheduler.current is STIFF_X
+    assert scheduler.transitions == 1
+    assert scheduler.samples_sent + scheduler.samples_skipped == 1 + 20
+    assert all(SOFT[0][0] <= sample[0][0] <= STIFF_X[0][0] for sample in published)
+
+
+def test_zero_duration_switches_directly():
+    published = []
+    scheduler = StiffnessSchedulerProcessor(published.append, duration=0)
+    scheduler.set_target(SOFT)
+    scheduler.set_target(STIFF_X)
+    assert published == [SOFT, STIFF_X]
+    assert scheduler.task is None
@@ -0,0 +1,42 @@
+import pytest
+
+from stiffness_transport_processor import StiffnessPacket, StiffnessTransportProcessor
+
+MATRIX = [[100.0, 0.0, 0.0], [0.0, 175.0, -75.5], [0.0, -75.5, 175.0]]
+
+
+def test_packet_size():
+    assert StiffnessPacket.SIZE == 84
+    assert len(StiffnessPacket.pack(1, MATRIX)) == 84
+
+
+def test_packet_round_trip():
+    data = StiffnessPacket.pack(42, MATRIX, send_time_ns=1_700_000_000_123_456_789)
+    assert StiffnessPacket.unpack(data) == (42, 1_700_000_000_123_456_789, MATRIX)
+
+
+def test_packet_layout_is_little_endian():
+    data = StiffnessPacket.pack(1, MATRIX, send_time_ns=2)
+    assert data[:4] == b"\x01\x00\x00\x00"
+    assert data[4:12] == b"\x02" + b"\x00" * 7
+
+
+def test_packet_sequence_wraps():
+    sequence, _, _ = StiffnessPacket.unpack(StiffnessPacket.pack(2 ** 32 + 5, MATRIX))
+    assert sequence == 5
+
+
+def test_packet_rejects_wrong_value_count():
+    with pytest.raises(ValueError):
+        StiffnessPacket.pack(1, [[1.0, 0.0], [0.0, 1.0]])
+
+
+@pytest.mark.parametrize("url", ["udp://localhost:9870", "udp://[::1]:9870", "ws://localhost:9871/stiffness"])
+def test_validate_url_accepts(url):
+    StiffnessTransportProcessor.validate_url(url)
+
+
+@pytest.mark.parametrize("url", ["udp://localhost", "udp://localhost:70000"])
+def test_validate_url_rejects(url):
+    with pytest.raises(ValueError):
+        StiffnessTransportProcessor.validate_url(url)